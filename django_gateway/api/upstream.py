@@ -0,0 +1,174 @@
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+from django.conf import settings
+import threading
+import asyncio
+import atexit
+import weakref
+import httpx
+
+
+""" pooled keep-alive async http clients for upstream services """
+
+
+# one long-lived event loop thread owning every pool when views run on throwaway loops
+# (runserver/wsgi gives each request a fresh loop, pools bound to it would never be reused)
+class SharedLoop:
+    def __init__(self):
+        self.loop = None
+        self.lock = threading.Lock()
+
+    def get(self):
+        with self.lock:
+            if self.loop is None:
+                self.loop = asyncio.new_event_loop()
+                threading.Thread(target=self.loop.run_forever, name="upstream-loop", daemon=True).start()
+                atexit.register(self.stop)
+        return self.loop
+
+    # run a coroutine on the shared loop and wait for it from the calling loop
+    async def run(self, coro):
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, self.get()))
+
+    def stop(self):
+        if self.loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(aclose_all(), self.loop).result(timeout=5)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+shared_loop = SharedLoop()
+
+# pools live on the server loop under asgi, on the shared loop under any other server
+def _use_shared_loop():
+    return settings.configured and settings.GATEWAY_SERVER != "asgi"
+
+
+_END = object()
+
+# streamed response opened on the shared loop, read from the request loop
+class SharedLoopResponse:
+    def __init__(self, response: httpx.Response):
+        self.response = response
+
+    def __getattr__(self, name):
+        return getattr(self.response, name)
+
+    async def aread(self):
+        return await shared_loop.run(self.response.aread())
+
+    async def aiter_raw(self):
+        iterator = self.response.aiter_raw()
+
+        async def next_chunk():
+            try:
+                return await iterator.__anext__()
+            except StopAsyncIteration:
+                return _END
+
+        while True:
+            chunk = await shared_loop.run(next_chunk())
+            if chunk is _END:
+                return
+            yield chunk
+
+    async def aclose(self):
+        await shared_loop.run(self.response.aclose())
+
+
+# one httpx connection pool per upstream service and event loop, so every view reuses open tcp connections
+class UpstreamClient:
+    def __init__(self, name: str, timeout: float = None, max_connections: int = None, max_keepalive: int = None):
+        self.name = name
+        self._timeout = timeout
+        self._max_connections = max_connections
+        self._max_keepalive = max_keepalive
+
+        # httpx pools are bound to the loop that opened them (the server loop under asgi, the shared loop otherwise)
+        self._clients = weakref.WeakKeyDictionary()
+
+    @property
+    def timeout(self):
+        if self._timeout is None:
+            self._timeout = settings.UPSTREAM_TIMEOUTS.get(self.name, settings.UPSTREAM_DEFAULT_TIMEOUT)
+        return self._timeout
+
+    # pooled client of the running event loop (built on first use after django settings are loaded)
+    @property
+    def client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            client = self._build_client()
+            self._clients[loop] = client
+        return client
+
+    def _build_client(self):
+        limits = httpx.Limits(
+            max_connections=self._max_connections or settings.UPSTREAM_MAX_CONNECTIONS,
+            max_keepalive_connections=self._max_keepalive or settings.UPSTREAM_MAX_KEEPALIVE,
+        )
+
+        return httpx.AsyncClient(
+            timeout=self.timeout,
+            limits=limits,
+            # upstream routes answer trailing slash mismatches with redirects (followed by requests before)
+            follow_redirects=True,
+            # gateway is shared between users, never keep upstream cookies between requests
+            cookies=CookieJar(policy=DefaultCookiePolicy(allowed_domains=[])),
+        )
+
+    async def _request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        return await self.client.request(method, url, **kwargs)
+
+    async def _stream(self, method: str, url: str, **kwargs) -> httpx.Response:
+        request = self.client.build_request(method, url, **kwargs)
+        return await self.client.send(request, stream=True)
+
+    # responses are read completely, so they are usable from any loop
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        if _use_shared_loop():
+            return await shared_loop.run(self._request(method, url, **kwargs))
+        return await self._request(method, url, **kwargs)
+
+    # open a streamed response (the caller reads it with aiter_raw and closes it with aclose)
+    async def stream(self, method: str, url: str, **kwargs) -> httpx.Response:
+        if _use_shared_loop():
+            return SharedLoopResponse(await shared_loop.run(self._stream(method, url, **kwargs)))
+        return await self._stream(method, url, **kwargs)
+
+    async def get(self, url: str, **kwargs):
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs):
+        return await self.request("POST", url, **kwargs)
+
+    async def put(self, url: str, **kwargs):
+        return await self.request("PUT", url, **kwargs)
+
+    async def patch(self, url: str, **kwargs):
+        return await self.request("PATCH", url, **kwargs)
+
+    async def delete(self, url: str, **kwargs):
+        return await self.request("DELETE", url, **kwargs)
+
+    # close the pool of the running loop
+    async def aclose(self):
+        loop = asyncio.get_running_loop()
+        client = self._clients.pop(loop, None)
+        if client is not None:
+            await client.aclose()
+
+
+# shared clients (one connection pool per upstream service)
+user_service = UpstreamClient("user_service")
+post_service = UpstreamClient("post_service")
+comment_service = UpstreamClient("comment_service")
+media_service = UpstreamClient("media_service")
+notification_service = UpstreamClient("notification_service")
+email_service = UpstreamClient("email_service")
+
+clients = (user_service, post_service, comment_service, media_service, notification_service, email_service)
+
+# close every upstream pool of the running loop (server shutdown)
+async def aclose_all():
+    await asyncio.gather(*(client.aclose() for client in clients))
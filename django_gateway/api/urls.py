@@ -11,12 +11,17 @@ urlpatterns = [
     path("posts/", views.read_posts),
     path("posts/me", views.read_my_posts),
     path("posts/<int:post_id>", views.read_post),
+    path("posts/<int:post_id>/page", views.read_post_page),
     path("posts/create/", views.create_post),
     path("posts/update/<int:post_id>", views.update_post),
     path("posts/delete/<int:post_id>", views.delete_post),
+    path("feed/", views.read_feed),
+    path("follow/<int:user_id>", views.follow_user),
+    path("unfollow/<int:user_id>", views.unfollow_user),
 
     # comments urls
     path("comments/<int:post_id>", views.read_comments),
+    path("comments/<int:post_id>/tree", views.read_comment_tree),
     path("comments/replies/<int:comment_id>", views.read_replies),
     path("comments/create/", views.create_comment),
     path("comments/reply/", views.create_reply),
@@ -26,6 +31,8 @@ urlpatterns = [
     # notifications urls
     path("notifications/",views.read_my_notifications),
     path("notifications/<int:notification_id>", views.read_notification),
+    path("notifications/unread_count", views.read_unread_count),
+    path("notifications/stream", views.stream_notifications),
 
     # avatar urls
     path("avatar/id=<owner_id>", views.read_avatar),
@@ -42,6 +49,7 @@ urlpatterns = [
     path("login/", views.login),
     path("users/", views.read_users),
     path("users/id=<int:user_id>", views.read_user),
+    path("users/batch", views.read_users_batch),
     path("users/profile/", views.profile),
     path("users/register/", views.create_user),
     path("users/delete_profile", views.delete_profile),
@@ -1,14 +1,17 @@
 from django.conf import settings
+from django.http import StreamingHttpResponse, JsonResponse
 from rest_framework import status
-from rest_framework.decorators import api_view, permission_classes, parser_classes
+from rest_framework.decorators import permission_classes, parser_classes
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from drf_spectacular.utils import extend_schema
+from adrf.decorators import api_view
 from decouple import config
-import requests
+import asyncio
+import httpx
 
-from . import serializers
+from . import serializers, upstream, identity
 
 
 """ gateway views (Microservice API Mapping) """
@@ -25,21 +28,23 @@ EMAIL_SERVICE_URL = config("EMAIL_SERVICE_URL")
 # internal_service_token config
 INTERNAL_SERVICE_TOKEN = config("INTERNAL_SERVICE_TOKEN")
 
+# max ids per user_service /users/batch call
+USERS_BATCH_MAX = 100
+
 
 
 """ posts views """
 # get all posts limited list
 @api_view(["GET"])
-def read_posts(request):
+async def read_posts(request):
     url = f"{settings.POST_SERVICE_URL}/posts/"
 
     try:
-        resp = requests.get(
+        resp = await upstream.post_service.get(
             url,
-            params=request.query_params,
-            timeout=5,
+            params=request.query_params
         )
-    except requests.RequestException as e:
+    except httpx.RequestError as e:
         return Response(
             {"error": "post_service is unreachable", "detail": str(e)},
             status=502,
@@ -57,34 +62,39 @@ def read_posts(request):
             status=502,
         )
 
+    if resp.status_code == 200:
+        await _attach_comments_preview(request, data)
+
     return Response(data, status=resp.status_code)
 
 # get all my posts limited list
 @api_view(["GET"])
-def read_my_posts(request):
+async def read_my_posts(request):
     url = f"{settings.POST_SERVICE_URL}/myposts/"
 
-    token = request.session.get("access_token")
-    if not token:
+    auth = await identity.authenticate(request)
+    if auth is None:
         return Response({"detail": "Not logged in"}, status=401)
 
     headers = {
-        "Authorization": f"Bearer {token}"
+        **auth
     }
 
     params = {
-        "skip": "0",
-        "limit": "10"
+        "limit": request.query_params.get("limit", "10")
     }
 
+    # keyset pagination, next page is requested with the previous page next_cursor
+    if request.query_params.get("cursor"):
+        params["cursor"] = request.query_params["cursor"]
+
     try:
-        resp = requests.get(
+        resp = await upstream.post_service.get(
             url,
             params=params,
-            headers=headers,
-            timeout=5,
+            headers=headers
         )
-    except requests.RequestException as e:
+    except httpx.RequestError as e:
         return Response(
             {"error": "post_service is unreachable", "detail": str(e)},
             status=502,
@@ -102,16 +112,19 @@ def read_my_posts(request):
             status=502,
         )
 
+    if resp.status_code == 200:
+        await _attach_comments_preview(request, data)
+
     return Response(data, status=resp.status_code)
 
 # get one post by id
 @api_view(["GET"])
-def read_post(request, post_id):
+async def read_post(request, post_id):
     url = f"{settings.POST_SERVICE_URL}/posts/{post_id}/"
 
     try:
-        resp = requests.get(url, timeout=5)
-    except requests.RequestException as error:
+        resp = await upstream.post_service.get(url)
+    except httpx.RequestError as error:
         return Response(
             {
                 "error": "post_service is unreachable",
@@ -149,28 +162,27 @@ def read_post(request, post_id):
 )
 @parser_classes([MultiPartParser, FormParser])
 @api_view(["POST"])
-def create_post(request):
+async def create_post(request):
     url = f"{POST_SERVICE_URL}/posts/"
 
-    token = request.session.get("access_token")
-    if not token:
+    auth = await identity.authenticate(request)
+    if auth is None:
         return Response({"detail": "Not logged in"}, status=401)
 
     serializer = serializers.CreatePostSerializer(data=request.data)
     serializer.is_valid(raise_exception=True)
 
     headers = {
-        "Authorization": f"Bearer {token}"
+        **auth
     }
 
-    resp = requests.post(
+    resp = await upstream.post_service.post(
         url,
         json={
             "title": serializer.validated_data["title"],
             "content": serializer.validated_data["content"],
         },
-        headers=headers,
-        timeout=5
+        headers=headers
     )
     if resp.status_code != 201 and resp.status_code != 200:
         return Response(resp.json(), status=resp.status_code)
@@ -185,16 +197,16 @@ def create_post(request):
         files_payload = [("files", (f.name, f, f.content_type)) for f in files]
 
         # file storage
-        media_response = requests.post(
+        media_response = await upstream.media_service.post(
             f"{MEDIA_SERVICE_URL}/files/upload",
             params={"post_id": post_id},
             files=files_payload,
-            headers={"Internal-Token": INTERNAL_SERVICE_TOKEN, "Authorization": f"Bearer {token}"}
+            headers={"Internal-Token": INTERNAL_SERVICE_TOKEN, **auth}
         )
 
         # delete post record if file storage failed!
         if media_response.status_code != 200:
-            requests.delete(f"{POST_SERVICE_URL}/posts/{post_id}", headers=headers)
+            await upstream.post_service.delete(f"{POST_SERVICE_URL}/posts/{post_id}", headers=headers)
             return Response({"error": "Media upload failed"}, status=500)
 
         media_urls = media_response.json().get("urls", [])
@@ -202,11 +214,10 @@ def create_post(request):
         media_urls = []
 
     # update post urls
-    requests.patch(
+    await upstream.post_service.patch(
         f"{POST_SERVICE_URL}/posts/{post_id}",
         json={"media_urls": media_urls},
-        headers=headers,
-        timeout=5
+        headers=headers
     )
 
     post_data["media_urls"] = media_urls
@@ -215,25 +226,24 @@ def create_post(request):
 # update one of my posts by id
 @extend_schema(request=serializers.UpdatePostSerializer,)
 @api_view(["PATCH"])
-def update_post(request, post_id):
+async def update_post(request, post_id):
     url = f"{POST_SERVICE_URL}/posts/{post_id}/"
 
-    token = request.session.get("access_token")
-    if not token:
+    auth = await identity.authenticate(request)
+    if auth is None:
         return Response({"detail": "Not logged in"}, status=401)
 
     serializer = serializers.UpdatePostSerializer(data=request.data)
     serializer.is_valid(raise_exception=True)
 
     headers = {
-        "Authorization": f"Bearer {token}"
+        **auth
     }
 
-    resp = requests.patch(
+    resp = await upstream.post_service.patch(
         url,
         json=serializer.validated_data,
-        headers=headers,
-        timeout=5
+        headers=headers
     )
     try:
         response_data = resp.json()
@@ -243,21 +253,20 @@ def update_post(request, post_id):
 
 # delete one of my posts
 @api_view(["DELETE"])
-def delete_post(request, post_id):
+async def delete_post(request, post_id):
     url = f"{POST_SERVICE_URL}/posts/{post_id}/"
 
-    token = request.session.get("access_token")
-    if not token:
+    auth = await identity.authenticate(request)
+    if auth is None:
         return Response({"detail": "Not logged in"}, status=401)
 
     headers = {
-        "Authorization": f"Bearer {token}"
+        **auth
     }
 
-    resp = requests.delete(
+    resp = await upstream.post_service.delete(
         url,
-        headers=headers,
-        timeout=5
+        headers=headers
     )
     try:
         response_data = resp.json()
@@ -265,21 +274,264 @@ def delete_post(request, post_id):
         response_data = {"detail": "Invalid response from post service", "text": resp.text}
     return Response(response_data, status=resp.status_code)
 
+# get my home feed (posts of followed users, newest first)
+@api_view(["GET"])
+async def read_feed(request):
+    url = f"{settings.POST_SERVICE_URL}/feed"
+
+    auth = await identity.authenticate(request)
+    if auth is None:
+        return Response({"detail": "Not logged in"}, status=401)
+
+    headers = {
+        **auth
+    }
+
+    params = {
+        "limit": request.query_params.get("limit", "10")
+    }
+
+    # next page is requested with the previous page next_cursor
+    if request.query_params.get("cursor"):
+        params["cursor"] = request.query_params["cursor"]
+
+    try:
+        resp = await upstream.post_service.get(
+            url,
+            params=params,
+            headers=headers
+        )
+    except httpx.RequestError as e:
+        return Response(
+            {"error": "post_service is unreachable", "detail": str(e)},
+            status=502,
+        )
+
+    try:
+        data = resp.json()
+    except ValueError:
+        return Response(
+            {
+                "error": "Invalid response from post_service",
+                "status_code": resp.status_code,
+                "raw": resp.text,
+            },
+            status=502,
+        )
+
+    if resp.status_code == 200:
+        await _attach_comments_preview(request, data)
+
+    return Response(data, status=resp.status_code)
+
+# follow one user
+@api_view(["POST"])
+async def follow_user(request, user_id):
+    return await _follow_request(request, "POST", user_id)
+
+# unfollow one user
+@api_view(["DELETE"])
+async def unfollow_user(request, user_id):
+    return await _follow_request(request, "DELETE", user_id)
+
+# forward follow/unfollow to post_service as the session user
+async def _follow_request(request, method, user_id):
+    url = f"{settings.POST_SERVICE_URL}/follows/{user_id}"
+
+    auth = await identity.authenticate(request)
+    if auth is None:
+        return Response({"detail": "Not logged in"}, status=401)
+
+    headers = {
+        **auth
+    }
+
+    try:
+        resp = await upstream.post_service.request(method, url, headers=headers)
+    except httpx.RequestError as e:
+        return Response(
+            {"error": "post_service is unreachable", "detail": str(e)},
+            status=502,
+        )
+
+    try:
+        response_data = resp.json()
+    except ValueError:  # JSONDecodeError
+        response_data = {"detail": "Invalid response from post service", "text": resp.text}
+    return Response(response_data, status=resp.status_code)
+
+# get one post page (post, first comments page, medias and authors avatars) in one call
+@api_view(["GET"])
+async def read_post_page(request, post_id):
+    comments_params = {
+        "skip": "0",
+        "limit": request.query_params.get("comments_limit", "10")
+    }
+
+    # post, comments and medias are independent, fetch them concurrently
+    (post_status, post, post_error), (_, comments, comments_error), (media_status, medias, media_error) = await asyncio.gather(
+        _fetch_section(
+            upstream.post_service.get(f"{POST_SERVICE_URL}/posts/{post_id}"),
+            "post_service",
+        ),
+        _fetch_section(
+            upstream.comment_service.get(f"{COMMENT_SERVICE_URL}/comments/{post_id}", params=comments_params),
+            "comment_service",
+        ),
+        _fetch_section(
+            upstream.media_service.get(f"{MEDIA_SERVICE_URL}/files/post={post_id}"),
+            "media_service",
+        ),
+    )
+
+    if post_status == 404:
+        return Response({"detail": "Post not found"}, status=404)
+
+    # media_service answers 404 when a post simply has no media
+    if media_status == 404:
+        medias, media_error = [], None
+
+    errors = {}
+    if post_error:
+        errors["post"] = post_error
+    if comments_error:
+        errors["comments"] = comments_error
+    if media_error:
+        errors["media"] = media_error
+
+    # authors of the post and of the loaded comments, avatars from their profiles with one /users/batch call
+    # (user_service mirrors every avatar url in image_url)
+    owner_ids = []
+    if post:
+        owner_ids.append(post["owner_id"])
+    for comment in comments or []:
+        if comment["owner_id"] not in owner_ids:
+            owner_ids.append(comment["owner_id"])
+
+    avatars, avatars_error = await _fetch_avatars(owner_ids)
+    if avatars_error:
+        errors["avatars"] = avatars_error
+
+    return Response(
+        {
+            "post": post,
+            "comments": comments,
+            "media": medias,
+            "avatars": avatars,
+            "errors": errors,
+        },
+        status=200
+    )
+
+# avatars of many users as {user id: {"owner_id", "url"}} and an error, one /users/batch call per USERS_BATCH_MAX ids
+async def _fetch_avatars(user_ids):
+    if not user_ids:
+        return {}, None
+
+    results = await asyncio.gather(*(
+        _fetch_section(
+            upstream.user_service.get(
+                f"{USER_SERVICE_URL}/users/batch",
+                headers={"X-Internal-Token": INTERNAL_SERVICE_TOKEN},
+                params={"ids": user_ids[start:start + USERS_BATCH_MAX]}
+            ),
+            "user_service",
+        )
+        for start in range(0, len(user_ids), USERS_BATCH_MAX)
+    ))
+
+    avatars = {}
+    for _, batch, error in results:
+        if error:
+            return avatars, error
+        for user in batch["users"]:
+            avatars[str(user["id"])] = {"owner_id": user["id"], "url": user["image_url"]}
+    return avatars, None
+
+# await one upstream call of a composite view and return (status, data, error) instead of failing the whole page
+async def _fetch_section(call, service_name):
+    try:
+        resp = await call
+    except httpx.RequestError as e:
+        return None, None, {"error": f"{service_name} is unreachable", "detail": str(e)}
+
+    try:
+        data = resp.json()
+    except ValueError:
+        return resp.status_code, None, {
+            "error": f"Invalid response from {service_name}",
+            "status_code": resp.status_code,
+        }
+
+    if resp.status_code >= 400:
+        return resp.status_code, None, {
+            "error": f"{service_name} request failed",
+            "status_code": resp.status_code,
+            "detail": data,
+        }
+
+    return resp.status_code, data, None
+
+
+# add the first comments of every listed post to a post page with one comment_service batch call
+async def _attach_comments_preview(request, data):
+    posts = data.get("items") or []
+    if not posts:
+        return
+
+    params = {
+        "post_ids": [post["id"] for post in posts],
+        "k": request.query_params.get("comments_preview", "3")
+    }
+
+    _, previews, error = await _fetch_section(
+        upstream.comment_service.get(f"{COMMENT_SERVICE_URL}/comments/batch", params=params),
+        "comment_service",
+    )
+
+    # the post list is still served when previews are unavailable
+    if error:
+        data["errors"] = {"comments_preview": error}
+        previews = {}
+
+    for post in posts:
+        post["comments_preview"] = previews.get(str(post["id"]), [])
 
 
 """ comments views """
 # get all comments
 @api_view(["GET"])
-def read_comments(request, post_id):
+async def read_comments(request, post_id):
     url = f"{COMMENT_SERVICE_URL}/comments/{post_id}/"
 
     try:
-        resp = requests.get(
+        resp = await upstream.comment_service.get(
             url,
-            params=request.query_params,
-            timeout=5,
+            params=request.query_params
         )
-    except requests.RequestException as e:
+    except httpx.RequestError as e:
+        return Response(
+            {"error": "comment_service is unreachable", "detail": str(e)},
+            status=502,
+        )
+
+    try:
+        response_data = resp.json()
+    except ValueError:  # JSONDecodeError
+        response_data = {"detail": "Invalid response from comment service", "text": resp.text}
+    return Response(response_data, status=resp.status_code)
+
+# get one post nested comment tree in one call
+@api_view(["GET"])
+async def read_comment_tree(request, post_id):
+    url = f"{COMMENT_SERVICE_URL}/comments/tree/{post_id}"
+
+    try:
+        resp = await upstream.comment_service.get(
+            url,
+            params=request.query_params
+        )
+    except httpx.RequestError as e:
         return Response(
             {"error": "comment_service is unreachable", "detail": str(e)},
             status=502,
@@ -293,16 +545,15 @@ def read_comments(request, post_id):
 
 # get one comment all replies
 @api_view(["GET"])
-def read_replies(request, comment_id):
+async def read_replies(request, comment_id):
     url = f"{COMMENT_SERVICE_URL}/comments/replies/{comment_id}/"
 
     try:
-        resp = requests.get(
+        resp = await upstream.comment_service.get(
             url,
-            params=request.query_params,
-            timeout=5,
+            params=request.query_params
         )
-    except requests.RequestException as e:
+    except httpx.RequestError as e:
         return Response(
             {"error": "comment_service is unreachable", "detail": str(e)},
             status=502,
@@ -317,11 +568,11 @@ def read_replies(request, comment_id):
 # create one comment for one post
 @extend_schema(request=serializers.CreateCommentSerializer,)
 @api_view(["POST"])
-def create_comment(request):
+async def create_comment(request):
     url = f"{COMMENT_SERVICE_URL}/comments/"
 
-    token = request.session.get("access_token")
-    if not token:
+    auth = await identity.authenticate(request)
+    if auth is None:
         return Response({"detail": "Not logged in"}, status=401)
 
     serializer = serializers.CreateCommentSerializer(data=request.data)
@@ -330,22 +581,18 @@ def create_comment(request):
     post_id = serializer.validated_data["post_id"]
 
     headers = {
-        "Authorization": f"Bearer {token}"
+        **auth
     }
 
-    resp = requests.get(
-        f"{POST_SERVICE_URL}/posts/{post_id}",
-        timeout=5
-    )
+    resp = await upstream.post_service.get(f"{POST_SERVICE_URL}/posts/{post_id}")
 
     if resp.status_code == 404:
         return Response({"detail": "post not found"}, status=404)
 
-    resp = requests.post(
+    resp = await upstream.comment_service.post(
         url,
         json=serializer.validated_data,
-        headers=headers,
-        timeout=5
+        headers=headers
     )
     try:
         response_data = resp.json()
@@ -356,11 +603,11 @@ def create_comment(request):
 # create one reply for one comment
 @extend_schema(request=serializers.CreateReplySerializer,)
 @api_view(["POST"])
-def create_reply(request):
+async def create_reply(request):
     url = f"{COMMENT_SERVICE_URL}/comments/reply/"
 
-    token = request.session.get("access_token")
-    if not token:
+    auth = await identity.authenticate(request)
+    if auth is None:
         return Response({"detail": "Not logged in"}, status=401)
 
     serializer = serializers.CreateReplySerializer(data=request.data)
@@ -369,22 +616,18 @@ def create_reply(request):
     post_id = serializer.validated_data["post_id"]
 
     headers = {
-        "Authorization": f"Bearer {token}"
+        **auth
     }
 
-    resp = requests.get(
-        f"{POST_SERVICE_URL}/posts/{post_id}",
-        timeout=5
-    )
+    resp = await upstream.post_service.get(f"{POST_SERVICE_URL}/posts/{post_id}")
 
     if resp.status_code == 404:
         return Response({"detail": "post not found"}, status=404)
 
-    resp = requests.post(
+    resp = await upstream.comment_service.post(
         url,
         json=serializer.validated_data,
-        headers=headers,
-        timeout=5
+        headers=headers
     )
     try:
         response_data = resp.json()
@@ -395,25 +638,24 @@ def create_reply(request):
 # update one of my comments/replies by id
 @extend_schema(request=serializers.UpdateCommentSerializer,)
 @api_view(["PATCH"])
-def update_comment(request, comment_id):
+async def update_comment(request, comment_id):
     url = f"{COMMENT_SERVICE_URL}/comments/{comment_id}/"
 
-    token = request.session.get("access_token")
-    if not token:
+    auth = await identity.authenticate(request)
+    if auth is None:
         return Response({"detail": "Not logged in"}, status=401)
 
     serializer = serializers.UpdateCommentSerializer(data=request.data)
     serializer.is_valid(raise_exception=True)
 
     headers = {
-        "Authorization": f"Bearer {token}"
+        **auth
     }
 
-    resp = requests.patch(
+    resp = await upstream.comment_service.patch(
         url,
         json=serializer.validated_data,
-        headers=headers,
-        timeout=5
+        headers=headers
     )
     try:
         response_data = resp.json()
@@ -423,21 +665,20 @@ def update_comment(request, comment_id):
 
 # delete one of my comments and its replies by id
 @api_view(["DELETE"])
-def delete_comment(request, comment_id):
+async def delete_comment(request, comment_id):
     url = f"{COMMENT_SERVICE_URL}/comments/delete/id={comment_id}/"
 
-    token = request.session.get("access_token")
-    if not token:
+    auth = await identity.authenticate(request)
+    if auth is None:
         return Response({"detail": "Not logged in"}, status=401)
 
     headers = {
-        "Authorization": f"Bearer {token}"
+        **auth
     }
 
-    resp = requests.delete(
+    resp = await upstream.comment_service.delete(
         url,
-        headers=headers,
-        timeout=5
+        headers=headers
     )
     try:
         response_data = resp.json()
@@ -450,15 +691,15 @@ def delete_comment(request, comment_id):
 """ notification views """
 # get my notifications
 @api_view(["GET"])
-def read_my_notifications(request):
+async def read_my_notifications(request):
     url = f"{settings.NOTIFICATIONS_SERVICE_URL}/notifications/"
 
-    token = request.session.get("access_token")
-    if not token:
+    auth = await identity.authenticate(request)
+    if auth is None:
         return Response({"detail": "Not logged in"}, status=401)
 
     headers = {
-        "Authorization": f"Bearer {token}"
+        **auth
     }
 
     params = {
@@ -466,11 +707,10 @@ def read_my_notifications(request):
         "limit": "10"
     }
 
-    resp = requests.get(
+    resp = await upstream.notification_service.get(
         url,
         params=params,
-        headers=headers,
-        timeout=5,
+        headers=headers
     )
 
     try:
@@ -481,24 +721,107 @@ def read_my_notifications(request):
 
 # get one of my notification
 @api_view(["GET"])
-def read_notification(request, notification_id):
+async def read_notification(request, notification_id):
     url = f"{settings.NOTIFICATIONS_SERVICE_URL}/notifications/{notification_id}/"
 
-    token = request.session.get("access_token")
-    if not token:
+    auth = await identity.authenticate(request)
+    if auth is None:
         return Response({"detail": "Not logged in"}, status=401)
 
     headers = {
-        "Authorization": f"Bearer {token}"
+        **auth
+    }
+
+    try:
+        resp = await upstream.notification_service.get(
+            url,
+            headers=headers
+        )
+    except httpx.RequestError as e:
+        return Response(
+            {"error": "notification_service is unreachable", "detail": str(e)},
+            status=502,
+        )
+
+    try:
+        response_data = resp.json()
+    except ValueError:  # JSONDecodeError
+        response_data = {"detail": "Invalid response from notification service", "text": resp.text}
+    return Response(response_data, status=resp.status_code)
+
+# stream my new notifications as server-sent events (plain async django view, needs GATEWAY_SERVER=asgi to stream)
+async def stream_notifications(request):
+    url = f"{settings.NOTIFICATIONS_SERVICE_URL}/notifications/stream"
+
+    auth = await identity.authenticate(request)
+    if auth is None:
+        return JsonResponse({"detail": "Not logged in"}, status=401)
+
+    headers = {
+        **auth,
+        "Accept": "text/event-stream",
     }
 
+    # browsers resend the last received id on reconnect, the query param covers the first connect
+    last_event_id = request.headers.get("Last-Event-ID") or request.GET.get("last_event_id")
+    if last_event_id:
+        headers["Last-Event-ID"] = last_event_id
+
     try:
-        resp = requests.get(
+        resp = await upstream.notification_service.stream(
+            "GET",
             url,
             headers=headers,
-            timeout=5,
+            # the stream stays open, upstream heartbeats keep it alive
+            timeout=httpx.Timeout(upstream.notification_service.timeout, read=None)
+        )
+    except httpx.RequestError as e:
+        return JsonResponse(
+            {"error": "notification_service is unreachable", "detail": str(e)},
+            status=502,
+        )
+
+    if resp.status_code != 200:
+        body = await resp.aread()
+        await resp.aclose()
+        return JsonResponse(
+            {"detail": "Invalid response from notification service", "text": body.decode(errors="replace")},
+            status=resp.status_code,
+        )
+
+    async def events():
+        try:
+            async for chunk in resp.aiter_raw():
+                yield chunk
+        except httpx.HTTPError as e:
+            print("Notification stream error:", e)
+        finally:
+            await resp.aclose()
+
+    response = StreamingHttpResponse(events(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+# get my unread notifications count
+@api_view(["GET"])
+async def read_unread_count(request):
+    url = f"{settings.NOTIFICATIONS_SERVICE_URL}/notifications/unread_count"
+
+    auth = await identity.authenticate(request)
+    if auth is None:
+        return Response({"detail": "Not logged in"}, status=401)
+
+    headers = {
+        **auth
+    }
+
+    try:
+        resp = await upstream.notification_service.get(
+            url,
+            headers=headers
         )
-    except requests.RequestException as e:
+    except httpx.RequestError as e:
         return Response(
             {"error": "notification_service is unreachable", "detail": str(e)},
             status=502,
@@ -515,17 +838,16 @@ def read_notification(request, notification_id):
 """ avatar views """
 # get avatar
 @api_view(["GET"])
-def read_avatar(request, owner_id):
+async def read_avatar(request, owner_id):
     url = f"{MEDIA_SERVICE_URL}/avatar/id={owner_id}/"
 
     headers = {
         "X-Internal-Token": INTERNAL_SERVICE_TOKEN
     }
 
-    resp = requests.get(
+    resp = await upstream.media_service.get(
         url,
-        headers=headers,
-        timeout=5
+        headers=headers
     )
 
     try:
@@ -536,21 +858,20 @@ def read_avatar(request, owner_id):
 
 # set one avatar record and user.avatar to default avatar
 @api_view(["PUT"])
-def set_default(request):
+async def set_default(request):
     url = f"{MEDIA_SERVICE_URL}/avatar/set_default/"
 
-    token = request.session.get("access_token")
-    if not token:
+    auth = await identity.authenticate(request)
+    if auth is None:
         return Response({"detail": "Not logged in"}, status=401)
 
     headers = {
-        "Authorization": f"Bearer {token}"
+        **auth
     }
 
-    resp = requests.put(
+    resp = await upstream.media_service.put(
         url,
-        headers=headers,
-        timeout=5,
+        headers=headers
     )
 
     try:
@@ -572,23 +893,23 @@ def set_default(request):
         }})
 @api_view(["PUT"])
 @parser_classes([MultiPartParser, FormParser])
-def update_avatar(request):
+async def update_avatar(request):
     url = f"{MEDIA_SERVICE_URL}/avatar/"
 
-    token = request.session.get("access_token")
-    if not token:
+    auth = await identity.authenticate(request)
+    if auth is None:
         return Response({"detail": "Not logged in"}, status=401)
 
     serializer = serializers.UpdateAvatarSerializer(data=request.data)
     serializer.is_valid(raise_exception=True)
 
     headers = {
-        "Authorization": f"Bearer {token}"
+        **auth
     }
 
     file_obj = request.FILES.get("file")
 
-    resp = requests.put(
+    resp = await upstream.media_service.put(
         url,
         headers=headers,
         files={
@@ -597,8 +918,7 @@ def update_avatar(request):
                 file_obj,
                 file_obj.content_type
             )
-        },
-        timeout = 5
+        }
     )
 
     try:
@@ -612,13 +932,10 @@ def update_avatar(request):
 """ files views """
 # get one post medias
 @api_view(["GET"])
-def read_medias(request, post_id):
+async def read_medias(request, post_id):
     url = f"{MEDIA_SERVICE_URL}/files/post={post_id}/"
 
-    resp = requests.get(
-        url,
-        timeout=5
-    )
+    resp = await upstream.media_service.get(url)
 
     try:
         response_data = resp.json()
@@ -628,14 +945,11 @@ def read_medias(request, post_id):
 
 # get one media
 @api_view(["GET"])
-def read_media(request, media_id):
+async def read_media(request, media_id):
     url = f"{MEDIA_SERVICE_URL}/files/media={media_id}/"
 
 
-    resp = requests.get(
-        url,
-        timeout=5
-    )
+    resp = await upstream.media_service.get(url)
 
     try:
         response_data = resp.json()
@@ -656,24 +970,24 @@ def read_media(request, media_id):
         }})
 @parser_classes([MultiPartParser, FormParser])
 @api_view(["PATCH"])
-def update_media(request, media_id):
+async def update_media(request, media_id):
     url = f"{MEDIA_SERVICE_URL}/files/media={media_id}/"
 
-    token = request.session.get("access_token")
-    if not token:
+    auth = await identity.authenticate(request)
+    if auth is None:
         return Response({"detail": "Not logged in"}, status=401)
 
     serializer = serializers.UpdateAvatarSerializer(data=request.data)
     serializer.is_valid(raise_exception=True)
 
     headers = {
-        "Authorization": f"Bearer {token}",
+        **auth,
         "X-Internal-Token": INTERNAL_SERVICE_TOKEN
     }
 
     file_obj = request.FILES.get("file")
 
-    resp = requests.patch(
+    resp = await upstream.media_service.patch(
         url,
         headers=headers,
         files={
@@ -682,8 +996,7 @@ def update_media(request, media_id):
                 file_obj,
                 file_obj.content_type
             )
-        },
-        timeout=5
+        }
     )
 
     try:
@@ -694,22 +1007,21 @@ def update_media(request, media_id):
 
 # delete one media (hard delete)
 @api_view(["DELETE"])
-def delete_media(request, media_id):
+async def delete_media(request, media_id):
     url = f"{MEDIA_SERVICE_URL}/files/media={media_id}/"
 
-    token = request.session.get("access_token")
-    if not token:
+    auth = await identity.authenticate(request)
+    if auth is None:
         return Response({"detail": "Not logged in"}, status=401)
 
     headers = {
-        "Authorization": f"Bearer {token}",
+        **auth,
         "X-Internal-Token": INTERNAL_SERVICE_TOKEN
     }
 
-    resp = requests.delete(
+    resp = await upstream.media_service.delete(
         url,
-        headers=headers,
-        timeout=5
+        headers=headers
     )
 
     try:
@@ -725,7 +1037,7 @@ def delete_media(request, media_id):
 @extend_schema(request=serializers.LoginSerializer,responses={200: None},)
 @api_view(["POST"])
 @permission_classes([AllowAny])
-def login(request):
+async def login(request):
     url = f"{USER_SERVICE_URL}/auth/token/"
 
     serializer = serializers.LoginSerializer(data=request.data)
@@ -733,22 +1045,21 @@ def login(request):
 
     data = serializer.validated_data
 
-    resp = requests.post(
+    resp = await upstream.user_service.post(
         url,
         data=data,
-        headers={"Content-Type": "application/x-www-form-urlencoded"},
-        timeout=5
+        headers={"Content-Type": "application/x-www-form-urlencoded"}
     )
 
     if resp.status_code != 200:
         return Response(resp.json(), status=resp.status_code)
 
-    request.session["access_token"] = resp.json()["access_token"]
+    await request.session.aset("access_token", resp.json()["access_token"])
     return Response({"message": "logged in"})
 
 # get all users limited list
 @api_view(["GET"])
-def read_users(request):
+async def read_users(request):
     url = f"{USER_SERVICE_URL}/users/"
 
     headers = {
@@ -760,11 +1071,10 @@ def read_users(request):
         "limit": "10"
     }
 
-    resp = requests.get(
+    resp = await upstream.user_service.get(
         url,
         headers=headers,
-        params=params,
-        timeout=5
+        params=params
     )
 
     try:
@@ -775,17 +1085,16 @@ def read_users(request):
 
 # get one user by id
 @api_view(["GET"])
-def read_user(request, user_id):
+async def read_user(request, user_id):
     url = f"{USER_SERVICE_URL}/users/id={user_id}/"
 
     headers = {
         "X-Internal-Token": INTERNAL_SERVICE_TOKEN
     }
 
-    resp = requests.get(
+    resp = await upstream.user_service.get(
         url,
-        headers=headers,
-        timeout=5
+        headers=headers
     )
 
     try:
@@ -794,23 +1103,53 @@ def read_user(request, user_id):
         response_data = {"detail": "Invalid response from user service", "text": resp.text}
     return Response(response_data, status=resp.status_code)
 
+# get many users by id in one call (?ids=1&ids=2, requested order, unknown ids listed in missing)
+@api_view(["GET"])
+async def read_users_batch(request):
+    url = f"{USER_SERVICE_URL}/users/batch"
+
+    headers = {
+        "X-Internal-Token": INTERNAL_SERVICE_TOKEN
+    }
+
+    ids = request.query_params.getlist("ids")
+    if not ids:
+        return Response({"detail": "ids is required"}, status=400)
+
+    try:
+        resp = await upstream.user_service.get(
+            url,
+            headers=headers,
+            params={"ids": ids}
+        )
+    except httpx.RequestError as e:
+        return Response(
+            {"error": "user_service is unreachable", "detail": str(e)},
+            status=502,
+        )
+
+    try:
+        response_data = resp.json()
+    except ValueError:  # JSONDecodeError
+        response_data = {"detail": "Invalid response from user service", "text": resp.text}
+    return Response(response_data, status=resp.status_code)
+
 # get my profile
 @api_view(["GET"])
-def profile(request):
+async def profile(request):
     url = f"{USER_SERVICE_URL}/users/profile/"
 
-    token = request.session.get("access_token")
-    if not token:
+    auth = await identity.authenticate(request)
+    if auth is None:
         return Response({"detail": "Not logged in"}, status=401)
 
     headers = {
-        "Authorization": f"Bearer {token}"
+        **auth
     }
 
-    resp = requests.get(
+    resp = await upstream.user_service.get(
         url,
-        headers=headers,
-        timeout=5
+        headers=headers
     )
 
     try:
@@ -822,16 +1161,15 @@ def profile(request):
 # register
 @extend_schema(request=serializers.CreateUserSerializer,)
 @api_view(["POST"])
-def create_user(request):
+async def create_user(request):
     url = f"{USER_SERVICE_URL}/users/"
 
     serializer = serializers.CreateUserSerializer(data=request.data)
     serializer.is_valid(raise_exception=True)
 
-    resp = requests.post(
+    resp = await upstream.user_service.post(
         url,
-        json=serializer.validated_data,
-        timeout=5
+        json=serializer.validated_data
     )
     try:
         response_data = resp.json()
@@ -841,21 +1179,20 @@ def create_user(request):
 
 # delete my profile
 @api_view(["DELETE"])
-def delete_profile(request):
+async def delete_profile(request):
     url = f"{USER_SERVICE_URL}/users/me/"
 
-    token = request.session.get("access_token")
-    if not token:
+    auth = await identity.authenticate(request)
+    if auth is None:
         return Response({"detail": "Not logged in"}, status=401)
 
     headers = {
-        "Authorization": f"Bearer {token}"
+        **auth
     }
 
-    resp = requests.delete(
+    resp = await upstream.user_service.delete(
         url,
-        headers=headers,
-        timeout=5,
+        headers=headers
     )
 
     try:
@@ -878,11 +1215,11 @@ def delete_profile(request):
 )
 @parser_classes([MultiPartParser, FormParser])
 @api_view(["PATCH"])
-def update_profile(request):
+async def update_profile(request):
     url = f"{USER_SERVICE_URL}/users/me/"
 
-    token = request.session.get("access_token")
-    if not token:
+    auth = await identity.authenticate(request)
+    if auth is None:
         return Response({"detail": "Not logged in"}, status=401)
 
     serializer = serializers.UpdateUserSerializer(data=request.data)
@@ -894,24 +1231,22 @@ def update_profile(request):
         del payload['image']
 
     headers = {
-        "Authorization": f"Bearer {token}",
+        **auth,
         "X-Internal-Token": INTERNAL_SERVICE_TOKEN
     }
 
-    # update avatar image if it"s exist
+    # update avatar image first, a failed upload leaves the profile untouched
     if "image" in request.FILES:
         image_file = request.FILES["image"]
 
-        media_resp = requests.put(
+        media_resp = await upstream.media_service.put(
             f"{MEDIA_SERVICE_URL}/avatar/",
             headers=headers,
-            files={"file": (image_file.name, image_file, image_file.content_type)},
-            timeout=10
+            files={"file": (image_file.name, image_file, image_file.content_type)}
         )
 
         if media_resp.status_code == 200:
-            image_url = media_resp.json().get("url")
-            payload["image_url"] = image_url
+            payload["image_url"] = media_resp.json().get("url")
         else:
             return Response(
                 {"detail": "Failed to upload image to media service"},
@@ -919,11 +1254,10 @@ def update_profile(request):
             )
 
     # update user record
-    resp = requests.patch(
+    resp = await upstream.user_service.patch(
         url,
         json=payload,
-        headers=headers,
-        timeout=5
+        headers=headers
     )
 
     try:
@@ -950,10 +1284,9 @@ def update_profile(request):
     )
 
     if jwt_fields_changed:
-        refresh_resp = requests.post(
+        refresh_resp = await upstream.user_service.post(
             f"{USER_SERVICE_URL}/auth/refresh-user-token/",
-            headers=headers,
-            timeout=5
+            headers=headers
         )
 
         try:
@@ -970,7 +1303,7 @@ def update_profile(request):
             )
 
         # save new access token in to user session
-        request.session["access_token"] = new_access_token
+        await request.session.aset("access_token", new_access_token)
 
     return Response(
         response_data,
@@ -983,11 +1316,11 @@ def update_profile(request):
 # change my email (and resend verification link to new email)
 @extend_schema(request=serializers.EmailSerializer)
 @api_view(["POST"])
-def change_email(request):
+async def change_email(request):
     url = f"{USER_SERVICE_URL}/settings/change-email/"
 
-    token = request.session.get("access_token")
-    if not token:
+    auth = await identity.authenticate(request)
+    if auth is None:
         return Response(
             {"detail": "Not logged in"},
             status=status.HTTP_401_UNAUTHORIZED
@@ -997,16 +1330,15 @@ def change_email(request):
     serializer.is_valid(raise_exception=True)
 
     headers = {
-        "Authorization": f"Bearer {token}",
+        **auth,
         "X-Internal-Token": INTERNAL_SERVICE_TOKEN,
     }
 
     # Send change-email request to user service
-    resp = requests.post(
+    resp = await upstream.user_service.post(
         url,
         json=serializer.validated_data,
-        headers=headers,
-        timeout=5
+        headers=headers
     )
 
     if resp.status_code != status.HTTP_200_OK:
@@ -1027,22 +1359,21 @@ def change_email(request):
 
 # resend verification link to my email
 @api_view(["GET"])
-def resend_verify(request):
+async def resend_verify(request):
     url = f"{EMAIL_SERVICE_URL}/emails/resend-verify/"
 
-    token = request.session.get("access_token")
-    if not token:
+    auth = await identity.authenticate(request)
+    if auth is None:
         return Response({"detail": "Not logged in"}, status=401)
 
     headers = {
-        "Authorization": f"Bearer {token}",
+        **auth,
         "X-Internal-Token": INTERNAL_SERVICE_TOKEN
     }
 
-    resp = requests.post(
+    resp = await upstream.email_service.post(
         url,
-        headers=headers,
-        timeout=5
+        headers=headers
     )
 
     if resp.status_code != 200:
@@ -1051,32 +1382,30 @@ def resend_verify(request):
 
 # verify verification link trigger
 @api_view(["get"])
-def verify_email(request, token):
+async def verify_email(request, token):
     url = f"{EMAIL_SERVICE_URL}/emails/verify/"
 
-    resp = requests.get(
+    resp = await upstream.email_service.get(
         url,
-        params={"token": token},
-        timeout=5
+        params={"token": token}
     )
     if resp.status_code != 200:
         return Response(resp.json(), status=resp.status_code)
 
-    # get current access token from session
-    access_token = request.session.get("access_token")
+    # get current user auth headers from session
+    auth = await identity.authenticate(request)
 
     # If user is logged in, refresh their token
-    if access_token:
+    if auth is not None:
 
         headers = {
-            "Authorization": f"Bearer {access_token}",
+            **auth,
             "X-Internal-Token": INTERNAL_SERVICE_TOKEN
         }
 
-        refresh_resp = requests.post(
+        refresh_resp = await upstream.user_service.post(
             f"{USER_SERVICE_URL}/auth/refresh-user-token/",
-            headers=headers,
-            timeout=5
+            headers=headers
         )
 
         if refresh_resp.status_code != 200:
@@ -1088,7 +1417,8 @@ def verify_email(request, token):
             )
 
         # save new access token in user session
-        request.session["access_token"] = (
+        await request.session.aset(
+            "access_token",
             refresh_resp.json()["access_token"]
         )
 
@@ -1102,15 +1432,15 @@ def verify_email(request, token):
 """ admin panel urls """
 # get admin notifications
 @api_view(["GET"])
-def read_admin_notifications(request):
+async def read_admin_notifications(request):
     url = f"{settings.NOTIFICATIONS_SERVICE_URL}/admin/notifications/"
 
-    token = request.session.get("access_token")
-    if not token:
+    auth = await identity.authenticate(request)
+    if auth is None:
         return Response({"detail": "Not logged in"}, status=401)
 
     headers = {
-        "Authorization": f"Bearer {token}"
+        **auth
     }
 
     params = {
@@ -1118,11 +1448,10 @@ def read_admin_notifications(request):
         "limit": "10"
     }
 
-    resp = requests.get(
+    resp = await upstream.notification_service.get(
         url,
         params=params,
-        headers=headers,
-        timeout=5,
+        headers=headers
     )
 
     try:
@@ -1135,11 +1464,11 @@ def read_admin_notifications(request):
 # promote to admin by id (superadmin only)
 @extend_schema(request=serializers.IdSerializer)
 @api_view(["POST"])
-def create_admin(request):
+async def create_admin(request):
     url = f"{USER_SERVICE_URL}/settings/admins/"
 
-    token = request.session.get("access_token")
-    if not token:
+    auth = await identity.authenticate(request)
+    if auth is None:
         return Response({"detail": "Not logged in"}, status=401)
 
     serializer = serializers.IdSerializer(data=request.data)
@@ -1148,14 +1477,13 @@ def create_admin(request):
     user_id = serializer.validated_data["user_id"]
 
     headers = {
-        "Authorization": f"Bearer {token}"
+        **auth
     }
 
-    resp = requests.post(
+    resp = await upstream.user_service.post(
         url,
         params={"user_id": user_id},
-        headers=headers,
-        timeout=5
+        headers=headers
     )
 
     if resp.status_code != 200:
@@ -1165,25 +1493,24 @@ def create_admin(request):
 # create notification by admin
 @extend_schema(request=serializers.CreateNotificationSerializer,)
 @api_view(["POST"])
-def create_notification(request):
+async def create_notification(request):
     url = f"{NOTIFICATIONS_SERVICE_URL}/admin/notifications/"
 
-    token = request.session.get("access_token")
-    if not token:
+    auth = await identity.authenticate(request)
+    if auth is None:
         return Response({"detail": "Not logged in"}, status=401)
 
     serializer = serializers.CreateNotificationSerializer(data=request.data)
     serializer.is_valid(raise_exception=True)
 
     headers = {
-        "Authorization": f"Bearer {token}"
+        **auth
     }
 
-    resp = requests.post(
+    resp = await upstream.notification_service.post(
         url,
         json=serializer.validated_data,
-        headers=headers,
-        timeout=5
+        headers=headers
     )
     try:
         response_data = resp.json()
@@ -1193,21 +1520,20 @@ def create_notification(request):
 
 # admin delete_user by id (admin and superadmin only)
 @api_view(["DELETE"])
-def admin_delete_user(request, user_id):
+async def admin_delete_user(request, user_id):
     url = f"{USER_SERVICE_URL}/users/admin/users/{user_id}/"
 
-    token = request.session.get("access_token")
-    if not token:
+    auth = await identity.authenticate(request)
+    if auth is None:
         return Response({"detail": "Not logged in"}, status=401)
 
     headers = {
-        "Authorization": f"Bearer {token}"
+        **auth
     }
 
-    resp = requests.delete(
+    resp = await upstream.user_service.delete(
         url,
-        headers=headers,
-        timeout=5
+        headers=headers
     )
 
     try:
@@ -1222,24 +1548,23 @@ def admin_delete_user(request, user_id):
 # admin update_user by id (admin and superadmin only)
 @extend_schema(request=serializers.UpdateUserSerializer,)
 @api_view(["PATCH"])
-def admin_update_user(request, user_id):
+async def admin_update_user(request, user_id):
     url = f"{USER_SERVICE_URL}/users/admin/users/{user_id}/"
-    token = request.session.get("access_token")
-    if not token:
+    auth = await identity.authenticate(request)
+    if auth is None:
         return Response({"detail": "Not logged in"}, status=401)
 
     serializer = serializers.UpdateUserSerializer(data=request.data)
     serializer.is_valid(raise_exception=True)
 
     headers = {
-        "Authorization": f"Bearer {token}"
+        **auth
     }
 
-    resp = requests.patch(
+    resp = await upstream.user_service.patch(
         url,
         json=serializer.validated_data,
-        headers=headers,
-        timeout=5
+        headers=headers
     )
     try:
         response_data = resp.json()
@@ -1250,25 +1575,24 @@ def admin_update_user(request, user_id):
 # admin update_user by id (admin and superadmin only)
 @extend_schema(request=serializers.UpdateNotificationSerializer,)
 @api_view(["PATCH"])
-def admin_update_notification(request, notification_id):
+async def admin_update_notification(request, notification_id):
     url = f"{NOTIFICATIONS_SERVICE_URL}/admin/notifications/{notification_id}/"
 
-    token = request.session.get("access_token")
-    if not token:
+    auth = await identity.authenticate(request)
+    if auth is None:
         return Response({"detail": "Not logged in"}, status=401)
 
     serializer = serializers.UpdateNotificationSerializer(data=request.data)
     serializer.is_valid(raise_exception=True)
 
     headers = {
-        "Authorization": f"Bearer {token}"
+        **auth
     }
 
-    resp = requests.patch(
+    resp = await upstream.notification_service.patch(
         url,
         json=serializer.validated_data,
-        headers=headers,
-        timeout=5
+        headers=headers
     )
     try:
         response_data = resp.json()
@@ -1278,21 +1602,20 @@ def admin_update_notification(request, notification_id):
 
 # admin delete_post by id (admin and superadmin only)
 @api_view(["DELETE"])
-def admin_delete_post(request, post_id):
+async def admin_delete_post(request, post_id):
     url = f"{POST_SERVICE_URL}/admin/posts/{post_id}/"
 
-    token = request.session.get("access_token")
-    if not token:
+    auth = await identity.authenticate(request)
+    if auth is None:
         return Response({"detail": "Not logged in"}, status=401)
 
     headers = {
-        "Authorization": f"Bearer {token}"
+        **auth
     }
 
-    resp = requests.delete(
+    resp = await upstream.post_service.delete(
         url,
-        headers=headers,
-        timeout=5
+        headers=headers
     )
 
     try:
@@ -1306,21 +1629,20 @@ def admin_delete_post(request, post_id):
 
 # admin delete_notification by id (admin and superadmin only)
 @api_view(["DELETE"])
-def admin_delete_notification(request, notification_id):
+async def admin_delete_notification(request, notification_id):
     url = f"{NOTIFICATIONS_SERVICE_URL}/admin/notifications/{notification_id}/"
 
-    token = request.session.get("access_token")
-    if not token:
+    auth = await identity.authenticate(request)
+    if auth is None:
         return Response({"detail": "Not logged in"}, status=401)
 
     headers = {
-        "Authorization": f"Bearer {token}"
+        **auth
     }
 
-    resp = requests.delete(
+    resp = await upstream.notification_service.delete(
         url,
-        headers=headers,
-        timeout=5
+        headers=headers
     )
 
     try:
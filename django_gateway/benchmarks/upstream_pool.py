@@ -0,0 +1,104 @@
+"""
+benchmark upstream calls: a fresh http client per call (new tcp connection per call)
+against the pooled keep-alive api.upstream client, on a local stub upstream
+
+usage (from django_gateway/):
+    python -m benchmarks.upstream_pool --requests 5000 --concurrency 32
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import statistics
+import threading
+import asyncio
+import time
+import sys
+import os
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.upstream import UpstreamClient
+
+
+# stub upstream that answers like a tiny fastapi json endpoint (http/1.1 keep-alive)
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    body = b'{"id": 1, "title": "stub", "content": "stub"}'
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stub():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run(label, call, url, total, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def timed():
+        async with semaphore:
+            start = time.perf_counter()
+            await call(url)
+            return (time.perf_counter() - start) * 1000
+
+    started = time.perf_counter()
+    samples = await asyncio.gather(*(timed() for _ in range(total)))
+    elapsed = time.perf_counter() - started
+
+    print(
+        f"{label:<24} p50={percentile(samples, 50):7.2f}ms "
+        f"p99={percentile(samples, 99):7.2f}ms "
+        f"mean={statistics.mean(samples):7.2f}ms "
+        f"rps={total / elapsed:9.1f}"
+    )
+
+
+# the pre-pool behaviour: every upstream call opens and closes its own connection
+async def unpooled_get(url):
+    async with httpx.AsyncClient(timeout=5) as client:
+        return await client.get(url)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+
+    server = start_stub()
+    url = f"http://127.0.0.1:{server.server_address[1]}/posts/1"
+
+    client = UpstreamClient("stub", timeout=5, max_connections=args.concurrency, max_keepalive=args.concurrency)
+
+    # warm up both paths once so imports and pool setup are not measured
+    await unpooled_get(url)
+    await client.get(url)
+
+    await run("new client (no pool)", unpooled_get, url, args.requests, args.concurrency)
+    await run("UpstreamClient (pool)", client.get, url, args.requests, args.concurrency)
+
+    await client.aclose()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
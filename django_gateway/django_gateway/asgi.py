@@ -13,4 +13,22 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'django_gateway.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from api import upstream
+
+
+# django ignores lifespan events, close the upstream connection pools on server shutdown here
+async def application(scope, receive, send):
+    if scope["type"] != "lifespan":
+        await django_application(scope, receive, send)
+        return
+
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await upstream.aclose_all()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
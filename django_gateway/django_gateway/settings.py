@@ -1,5 +1,6 @@
 from pathlib import Path
 from decouple import config, Csv
+from django.core.exceptions import ImproperlyConfigured
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -70,6 +71,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'django_gateway.wsgi.application'
+ASGI_APPLICATION = 'django_gateway.asgi.application'
 
 
 # Database
@@ -122,4 +124,33 @@ POST_SERVICE_URL = "http://post_service:8000"
 COMMENT_SERVICE_URL = "http://comment_service:8000"
 MEDIA_SERVICE_URL = "http://media_service:8000"
 NOTIFICATIONS_SERVICE_URL = "http://notification_service:8000"
-EMAIL_SERVICE_URL = "http://email_service:8000"
\ No newline at end of file
+EMAIL_SERVICE_URL = "http://email_service:8000"
+
+# server running the gateway (asgi: uvicorn, anything else: django development server, see Dockerfile)
+GATEWAY_SERVER = config("GATEWAY_SERVER", default="asgi")
+
+# upstream http clients (connection pool size and timeout per service)
+UPSTREAM_MAX_CONNECTIONS = config("UPSTREAM_MAX_CONNECTIONS", default=200, cast=int)
+UPSTREAM_MAX_KEEPALIVE = config("UPSTREAM_MAX_KEEPALIVE", default=50, cast=int)
+UPSTREAM_DEFAULT_TIMEOUT = config("UPSTREAM_DEFAULT_TIMEOUT", default=5, cast=float)
+UPSTREAM_TIMEOUTS = {
+    "user_service": config("USER_SERVICE_TIMEOUT", default=UPSTREAM_DEFAULT_TIMEOUT, cast=float),
+    "post_service": config("POST_SERVICE_TIMEOUT", default=UPSTREAM_DEFAULT_TIMEOUT, cast=float),
+    "comment_service": config("COMMENT_SERVICE_TIMEOUT", default=UPSTREAM_DEFAULT_TIMEOUT, cast=float),
+    "media_service": config("MEDIA_SERVICE_TIMEOUT", default=30, cast=float),
+    "notification_service": config("NOTIFICATIONS_SERVICE_TIMEOUT", default=UPSTREAM_DEFAULT_TIMEOUT, cast=float),
+    "email_service": config("EMAIL_SERVICE_TIMEOUT", default=UPSTREAM_DEFAULT_TIMEOUT, cast=float),
+}
+
+# trusted identity headers: the gateway verifies the session access token once and sends a signed identity
+# (X-Identity) instead of it, services check the hmac instead of decoding the jwt (off: bearer tokens are forwarded)
+IDENTITY_HEADERS = config("IDENTITY_HEADERS", default=False, cast=bool)
+IDENTITY_SECRET = config("IDENTITY_SECRET", default="")
+IDENTITY_MAX_AGE = config("IDENTITY_MAX_AGE", default=300, cast=int)
+
+# access token verification at the gateway (same secret key and algorithm as the services)
+JWT_SECRET_KEY = config("JWT_SECRET_KEY", default="")
+JWT_ALGORITHM = config("JWT_ALGORITHM", default="HS256")
+
+if IDENTITY_HEADERS and not (IDENTITY_SECRET and JWT_SECRET_KEY):
+    raise ImproperlyConfigured("IDENTITY_HEADERS needs IDENTITY_SECRET and JWT_SECRET_KEY")
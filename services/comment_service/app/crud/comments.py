@@ -1,5 +1,6 @@
 from fastapi import HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select, update, func, literal_column
+from sqlalchemy.orm import Session, aliased
 
 from .. import models, schemas
 
@@ -11,10 +12,93 @@ from .. import models, schemas
 def read_comments(db: Session, post_id, skip: int = 0, limit: int = 10):
     return db.query(models.Comment).filter(models.Comment.post_id == post_id).offset(skip).limit(limit).all()
 
+# get the first k comments of every post in post_ids with one window function query, grouped by post_id
+def read_comments_for_posts(db: Session, post_ids: list[int], k: int = 3):
+    ranked = select(
+        models.Comment,
+        func.row_number().over(
+            partition_by=models.Comment.post_id,
+            order_by=(models.Comment.created_at, models.Comment.id)
+        ).label("post_rank")
+    ).where(models.Comment.post_id.in_(post_ids)).subquery()
+
+    comment = aliased(models.Comment, ranked)
+    rows = db.execute(
+        select(comment)
+        .where(ranked.c.post_rank <= k)
+        .order_by(ranked.c.post_id, ranked.c.post_rank)
+    ).scalars().all()
+
+    # every requested post gets a list, empty when it has no comments
+    grouped = {post_id: [] for post_id in post_ids}
+    for row in rows:
+        grouped[row.post_id].append(row)
+    return grouped
+
 # get one comment all replies
 def read_replies(db: Session, comment_id, skip: int = 0, limit: int = 10):
     return db.query(models.Comment).filter(models.Comment.parent_id == comment_id).offset(skip).limit(limit).all()
 
+# get one post comment tree (or the subtree under parent_id) in one recursive query:
+# skip/limit page the first level, every deeper level keeps its first `breadth` replies down to `depth` levels
+def read_comment_tree(db: Session, post_id: int, parent_id: int = None, skip: int = 0, limit: int = 10, depth: int = 3, breadth: int = 5):
+    comments_table = models.Comment.__table__
+
+    # position of every comment between its siblings (oldest first)
+    ranked = select(
+        comments_table,
+        func.row_number().over(
+            partition_by=comments_table.c.parent_id,
+            order_by=(comments_table.c.created_at, comments_table.c.id)
+        ).label("sibling_rank")
+    ).where(comments_table.c.post_id == post_id).cte("ranked")
+
+    first_level = (
+        ranked.c.parent_id.is_(None) if parent_id is None else ranked.c.parent_id == parent_id
+    )
+
+    tree = select(ranked, literal_column("1").label("depth")).where(
+        first_level,
+        ranked.c.sibling_rank > skip,
+        ranked.c.sibling_rank <= skip + limit
+    ).cte("tree", recursive=True)
+
+    parent = tree.alias("parent")
+    tree = tree.union_all(
+        select(ranked, (parent.c.depth + 1).label("depth"))
+        .join(parent, ranked.c.parent_id == parent.c.id)
+        .where(parent.c.depth < depth, ranked.c.sibling_rank <= breadth)
+    )
+
+    # reply_count is stored on every comment, so each level can be paged further
+    rows = db.execute(
+        select(tree).order_by(tree.c.depth, tree.c.sibling_rank)
+    ).mappings().all()
+
+    # rows come level by level in sibling order, so parents exist before their replies
+    nodes = {}
+    roots = []
+    for row in rows:
+        node = {
+            "id": row["id"],
+            "owner_id": row["owner_id"],
+            "nickname": row["nickname"],
+            "post_id": row["post_id"],
+            "content": row["content"],
+            "parent_id": row["parent_id"],
+            "created_at": row["created_at"],
+            "reply_count": row["reply_count"],
+            "replies": [],
+        }
+        nodes[node["id"]] = node
+
+        if row["depth"] == 1:
+            roots.append(node)
+        else:
+            nodes[row["parent_id"]]["replies"].append(node)
+
+    return roots
+
 # create one comment for one post
 def create_comment(db: Session, comment: schemas.CreateComment, user_id:int, user_nickname:str):
     db_comment = models.Comment(
@@ -47,6 +131,13 @@ def create_reply_comment(db: Session, reply: schemas.CreateReply, user:int, user
         parent_id=reply.parent_id,
     )
     db.add(db_reply)
+
+    # parent reply counter is updated in the same transaction as the reply insert
+    db.query(models.Comment).filter(models.Comment.id == reply.parent_id).update(
+        {models.Comment.reply_count: models.Comment.reply_count + 1},
+        synchronize_session=False
+    )
+
     db.commit()
     db.refresh(db_reply)
 
@@ -83,18 +174,38 @@ def update_comments_nickname(db: Session, owner_id: int, new_nickname: str):
     db.commit()
     return True
 
-# delete one comment and all of its replies by id
+# delete one comment and all of its replies by id, return its post_id and the number of deleted comments
 def delete_my_comment(db: Session, comment_id: int, owner_id:int):
-    db_user = db.query(models.Comment).filter(models.Comment.id == comment_id).first()
-    if not db_user:
+    db_comment = db.query(models.Comment).filter(models.Comment.id == comment_id).first()
+    if not db_comment:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                             detail="comment not found")
-    if not db_user.owner_id == owner_id:
+    if not db_comment.owner_id == owner_id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
                             detail="only comment owner can delete that")
-    db.delete(db_user)
+
+    post_id, parent_id = db_comment.post_id, db_comment.parent_id
+
+    # the comment and every reply under it in one recursive delete
+    subtree = select(models.Comment.id).where(models.Comment.id == comment_id).cte("subtree", recursive=True)
+    replies = aliased(models.Comment)
+    subtree = subtree.union_all(
+        select(replies.id).join(subtree, replies.parent_id == subtree.c.id)
+    )
+
+    deleted_count = db.query(models.Comment).filter(
+        models.Comment.id.in_(select(subtree.c.id))
+    ).delete(synchronize_session=False)
+
+    if parent_id is not None:
+        db.query(models.Comment).filter(models.Comment.id == parent_id).update(
+            {models.Comment.reply_count: func.greatest(models.Comment.reply_count - 1, 0)},
+            synchronize_session=False
+        )
+
     db.commit()
-    return {"detail": "Your comment has been deleted"}
+    db.expunge_all()
+    return post_id, deleted_count
 
 # delete one post all comments and its replies by post_id
 def delete_post_comments(db: Session, post_id: int):
@@ -104,3 +215,56 @@ def delete_post_comments(db: Session, post_id: int):
 
     db.commit()
     return True
+
+
+""" counters reconciliation """
+
+
+# highest comment id
+def max_comment_id(db: Session):
+    return db.query(func.max(models.Comment.id)).scalar() or 0
+
+# recompute reply_count of comments with id in [from_id, to_id], return number of repaired comments
+def repair_reply_counts(db: Session, from_id: int, to_id: int):
+    replies = aliased(models.Comment)
+    counts = (
+        select(models.Comment.id, func.count(replies.id).label("reply_count"))
+        .outerjoin(replies, replies.parent_id == models.Comment.id)
+        .where(models.Comment.id.between(from_id, to_id))
+        .group_by(models.Comment.id)
+        .subquery()
+    )
+
+    # lock the range first, reply inserts/deletes (+1/-1 on the parent) wait for the repair to commit,
+    # and the count below runs on a newer snapshot that includes every reply whose +1/-1 already committed
+    db.execute(
+        select(models.Comment.id)
+        .where(models.Comment.id.between(from_id, to_id))
+        .order_by(models.Comment.id)
+        .with_for_update()
+    )
+
+    result = db.execute(
+        update(models.Comment)
+        .where(models.Comment.id == counts.c.id, models.Comment.reply_count != counts.c.reply_count)
+        .values(reply_count=counts.c.reply_count)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return result.rowcount
+
+# current database transaction time (start of the transaction, before any count it runs)
+def transaction_time(db: Session):
+    return db.execute(select(func.now())).scalar()
+
+# comment count of the next `limit` posts (that have comments) after after_post_id
+def count_comments_by_post(db: Session, after_post_id: int, limit: int):
+    rows = (
+        db.query(models.Comment.post_id, func.count(models.Comment.id))
+        .filter(models.Comment.post_id > after_post_id)
+        .group_by(models.Comment.post_id)
+        .order_by(models.Comment.post_id)
+        .limit(limit)
+        .all()
+    )
+    return [(post_id, count) for post_id, count in rows]
@@ -1,61 +1,29 @@
 from fastapi import HTTPException, Header, Depends, status
-from jose import JWTError, jwt
 from decouple import config
 
+from .auth import verifier, verify_identity, IDENTITY_SECRET
 
-""" dependencies and permission check """
 
+""" dependencies and permission check """
 
-# config secret key and algorithm based on .env file to prevent information hijack
-SECRET_KEY = config("SECRET_KEY")
-ALGORITHM = config("ALGORITHM")
 
 # config internal token for internal api calls
 INTERNAL_TOKEN = config("INTERNAL_SERVICE_TOKEN")
 
-# decode jwt token and return payload
-def get_current_user(authorization: str = Header(...)):
-    if not authorization.startswith("Bearer "):
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authorization header"
-        )
-
-    token = authorization.removeprefix("Bearer ")
+# verify jwt token and return its user claims
+async def get_current_user(authorization: str = Header(None), x_identity: str = Header(None)):
+    # identity signed by the gateway, the token was already verified there
+    if x_identity is not None and IDENTITY_SECRET:
+        return verify_identity(x_identity)
 
-    try:
-        payload = jwt.decode(
-            token,
-            SECRET_KEY,
-            algorithms=[ALGORITHM]
-        )
-    except JWTError:
+    if authorization is None or not authorization.startswith("Bearer "):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid or expired token"
-        )
-
-    required_claims = (
-        "id",
-        "sub",
-        "nickname",
-        "role",
-        "is_verified",
-    )
-
-    if not all(payload.get(claim) is not None for claim in required_claims):
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token payload"
+            detail="Invalid authorization header"
         )
 
-    return {
-        "user_id": payload["id"],
-        "username": payload["sub"],
-        "nickname": payload["nickname"],
-        "role": payload["role"],
-        "is_email_verified": payload["is_verified"],
-    }
+    # verified once per token, cached until it expires
+    return verifier.verify(authorization.removeprefix("Bearer "))
 
 # verified access permission check
 def verified_user_required(user = Depends(get_current_user)):
@@ -1,66 +1,33 @@
 from sqlalchemy.orm import Session
-import redis.asyncio as redis
-from decouple import config
 
-from ..database import SessionLocal
 from ..crud import comments
+from .runtime import StreamConsumer, by_field
 
 
 """ real_time reading redis stream events """
 
 
-r = redis.Redis(host=config("HOST"), port=config("PORT"), decode_responses=True)
+# post_deleted: delete every comment of the deleted post
+def handle_post_deleted(db: Session, data):
+    post_id = int(data["post_id"])
 
-# this definition wait for redis stream post_service events
-async def consume_post_events():
-
-    while True:
-        events = await r.xreadgroup(
-            groupname="comment_group",
-            consumername="comment_consumer",
-            streams={"post_events": ">"},
-            block=0
-        )
+    comments.delete_post_comments(db, post_id)
 
-        for stream, messages in events:
-            for message_id, data in messages:
+# user_updated: rewrite owner nickname on user comments
+def handle_user_updated(db: Session, data):
+    user_id = int(data["user_id"])
+    new_nickname = str(data["nickname"])
 
-                if data["event"] == "post_deleted":
-                    post_id = int(data["post_id"])
-
-                    db: Session = SessionLocal()
-                    try:
-                        comments.delete_post_comments(db, post_id)
-                    finally:
-                        db.close()
-
-                    # delete post_deleted event from redis steam pending list
-                    await r.xack("post_events", "comment_group", message_id)
+    comments.update_comments_nickname(db, user_id, new_nickname)
 
+# this definition wait for redis stream post_service events
+async def consume_post_events():
+    await StreamConsumer("post_events", "comment_group", "comment_consumer", {
+        "post_deleted": handle_post_deleted,
+    }, key=by_field("post_id")).run()
 
 # this definition wait for redis stream user_service events
 async def consume_user_events():
-
-    while True:
-        events = await r.xreadgroup(
-            groupname="comment_group",
-            consumername="comment_consumer",
-            streams={"user_events": ">"},
-            block=0
-        )
-
-        for stream, messages in events:
-            for message_id, data in messages:
-
-                if data["event"] == "user_updated":
-                    user_id = int(data["user_id"])
-                    new_nickname = str(data["nickname"])
-
-                    db: Session = SessionLocal()
-                    try:
-                        comments.update_comments_nickname(db, user_id, new_nickname)
-                    finally:
-                        db.close()
-
-                    # delete user_event from redis_steam pending list
-                    await r.xack("user_events", "comment_group", message_id)
+    await StreamConsumer("user_events", "comment_group", "comment_consumer", {
+        "user_updated": handle_user_updated,
+    }, key=by_field("user_id")).run()
@@ -1,5 +1,7 @@
 import redis.asyncio as redis
 from decouple import config
+from datetime import datetime
+import json
 
 
 """ pushing redis stream events """
@@ -35,12 +37,27 @@ async def publish_reply_created(comment_id: int, actor_id:int, nickname:str, par
         }
     )
 
-# publish redis stream comment_deleted event
-async def publish_comment_deleted(comment_id: int):
+# publish redis stream comment_deleted event (count = the comment and all of its deleted replies)
+async def publish_comment_deleted(comment_id: int, post_id: int, count: int):
     await r.xadd(
         "comment_events",
         {
             "event": "comment_deleted",
             "comment_id": int(comment_id),
+            "post_id": int(post_id),
+            "count": int(count),
+        }
+    )
+
+# publish redis stream comment_counts_snapshot event (authoritative comment counts of posts in [from_post_id, to_post_id] as of computed_at)
+async def publish_comment_counts_snapshot(from_post_id: int, to_post_id: int, counts: dict, computed_at: datetime):
+    await r.xadd(
+        "comment_events",
+        {
+            "event": "comment_counts_snapshot",
+            "from_post_id": int(from_post_id),
+            "to_post_id": int(to_post_id),
+            "counts": json.dumps(counts),
+            "computed_at": computed_at.isoformat(),
         }
     )
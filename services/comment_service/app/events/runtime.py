@@ -0,0 +1,278 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+from decouple import config
+import redis.asyncio as redis
+import asyncio
+import socket
+import uuid
+import os
+
+from ..database import batch_session
+
+
+""" batched redis stream consumer runtime """
+
+
+# max events read per xreadgroup call and how long to block waiting for them (milliseconds)
+CONSUMER_BATCH_SIZE = config("CONSUMER_BATCH_SIZE", default=100, cast=int)
+CONSUMER_BLOCK_MS = config("CONSUMER_BLOCK_MS", default=5000, cast=int)
+
+# worker threads per consumer, events of one batch run concurrently across partition keys
+CONSUMER_CONCURRENCY = config("CONSUMER_CONCURRENCY", default=4, cast=int)
+
+# pending events idle longer than CONSUMER_CLAIM_IDLE_MS are reclaimed every CONSUMER_CLAIM_INTERVAL seconds
+CONSUMER_CLAIM_IDLE_MS = config("CONSUMER_CLAIM_IDLE_MS", default=60000, cast=int)
+CONSUMER_CLAIM_INTERVAL = config("CONSUMER_CLAIM_INTERVAL", default=30, cast=float)
+
+# events delivered this many times without success are moved to the <stream>:dead stream instead of retried again
+CONSUMER_MAX_DELIVERIES = config("CONSUMER_MAX_DELIVERIES", default=5, cast=int)
+DEAD_LETTER_STREAM = "{}:dead"
+
+# seconds to wait for in-flight batches on shutdown (kept under docker stop grace period)
+CONSUMER_SHUTDOWN_TIMEOUT = config("CONSUMER_SHUTDOWN_TIMEOUT", default=8, cast=float)
+
+
+r = redis.Redis(host=config("HOST"), port=config("PORT"), decode_responses=True)
+
+# running consumers of this process (stopped together on shutdown)
+consumers = []
+
+# unique consumer identity per process, so replicas never share one pending list
+def consumer_name(name: str):
+    return f"{name}-{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+# partition key reading one event field, events with the same value keep their stream order
+def by_field(field: str):
+    return lambda data: data.get(field)
+
+# stop reading new events and wait for in-flight batches of every running consumer
+async def stop_consumers():
+    for consumer in consumers:
+        consumer.stopping.set()
+
+    try:
+        await asyncio.wait_for(
+            asyncio.gather(*(consumer.stopped.wait() for consumer in consumers)),
+            timeout=CONSUMER_SHUTDOWN_TIMEOUT
+        )
+    except asyncio.TimeoutError:
+        print("Consumer shutdown timed out, unacked events will be reclaimed by other replicas")
+
+# reads one stream in batches, runs every batch in one db transaction and acks it with one XACK
+class StreamConsumer:
+    def __init__(self, stream: str, group: str, consumer: str, handlers: Dict[str, Callable], key: Optional[Callable] = None):
+        self.stream = stream
+        self.group = group
+        self.consumer = consumer_name(consumer)
+        # event type -> handler(db, data), a handler may return awaitables to run after commit
+        self.handlers = handlers
+        # events are split by key(data), one partition runs in order on one worker (no key: whole batch in order,
+        # an event whose key is None runs alone between the partitions before and after it)
+        self.key = key
+        self.executor = ThreadPoolExecutor(max_workers=CONSUMER_CONCURRENCY, thread_name_prefix=self.stream)
+
+        self.stopping = asyncio.Event()
+        self.stopped = asyncio.Event()
+
+    async def run(self):
+        print(f"Waiting for {self.stream} events as {self.consumer}...")
+        consumers.append(self)
+        sweeper = asyncio.create_task(self.sweep())
+        try:
+            await self.read_loop()
+        finally:
+            self.stopping.set()
+            await sweeper
+            await self.leave_group()
+            consumers.remove(self)
+            self.executor.shutdown(wait=False)
+            self.stopped.set()
+
+    async def read_loop(self):
+        while not self.stopping.is_set():
+            try:
+                events = await r.xreadgroup(
+                    groupname=self.group,
+                    consumername=self.consumer,
+                    streams={self.stream: ">"},
+                    count=CONSUMER_BATCH_SIZE,
+                    block=CONSUMER_BLOCK_MS
+                )
+            except redis.RedisError as e:
+                print("Consumer read error:", e)
+                await asyncio.sleep(1)
+                continue
+
+            for stream, messages in events or []:
+                if messages:
+                    await self.process_batch(messages)
+
+    # reclaim events left pending by crashed or stopped consumers (XAUTOCLAIM) and process them here
+    async def sweep(self):
+        while not self.stopping.is_set():
+            try:
+                await asyncio.wait_for(self.stopping.wait(), timeout=CONSUMER_CLAIM_INTERVAL)
+                return
+            except asyncio.TimeoutError:
+                pass
+
+            start_id = "0-0"
+            try:
+                while not self.stopping.is_set():
+                    result = await r.xautoclaim(
+                        self.stream,
+                        self.group,
+                        self.consumer,
+                        min_idle_time=CONSUMER_CLAIM_IDLE_MS,
+                        start_id=start_id,
+                        count=CONSUMER_BATCH_SIZE
+                    )
+                    start_id, messages = result[0], result[1]
+
+                    # entries deleted from the stream come back without data (redis 6.2), just ack them
+                    deleted = [message_id for message_id, data in messages if message_id and data is None]
+                    if deleted:
+                        await r.xack(self.stream, self.group, *deleted)
+
+                    messages = [(message_id, data) for message_id, data in messages if data is not None]
+                    messages = await self.dead_letter(messages)
+                    if messages:
+                        print(f"Reclaimed {len(messages)} pending {self.stream} events")
+                        await self.process_batch(messages)
+
+                    if start_id == "0-0":
+                        break
+            except redis.RedisError as e:
+                print("Consumer claim error:", e)
+
+    # move reclaimed events delivered CONSUMER_MAX_DELIVERIES times (poison events) to the dead letter stream, return the rest
+    async def dead_letter(self, messages):
+        if not messages:
+            return messages
+
+        pending = await r.xpending_range(
+            self.stream,
+            self.group,
+            min=messages[0][0],
+            max=messages[-1][0],
+            count=len(messages),
+            consumername=self.consumer
+        )
+        deliveries = {entry["message_id"]: entry["times_delivered"] for entry in pending}
+
+        dead = [(message_id, data) for message_id, data in messages if deliveries.get(message_id, 0) > CONSUMER_MAX_DELIVERIES]
+        if not dead:
+            return messages
+
+        pipe = r.pipeline(transaction=True)
+        for message_id, data in dead:
+            pipe.xadd(DEAD_LETTER_STREAM.format(self.stream), {**data, "dead_message_id": message_id, "dead_group": self.group})
+        pipe.xack(self.stream, self.group, *(message_id for message_id, data in dead))
+        await pipe.execute()
+        print(f"Moved {len(dead)} {self.stream} events to {DEAD_LETTER_STREAM.format(self.stream)}")
+
+        dead_ids = {message_id for message_id, data in dead}
+        return [(message_id, data) for message_id, data in messages if message_id not in dead_ids]
+
+    # remove this consumer from the group unless it still owns pending events
+    async def leave_group(self):
+        try:
+            pending = await r.xpending_range(
+                self.stream,
+                self.group,
+                min="-",
+                max="+",
+                count=1,
+                consumername=self.consumer
+            )
+            if not pending:
+                await r.xgroup_delconsumer(self.stream, self.group, self.consumer)
+        except redis.RedisError as e:
+            print("Consumer leave error:", e)
+
+    # split a batch into rounds of partitions, events without a key (range snapshots) are a round of their own,
+    # so they run after every event read before them and never concurrently with a partition they overlap
+    def rounds(self, messages):
+        if not self.key:
+            return [[messages]]
+
+        rounds = []
+        partitions = {}
+        for message_id, data in messages:
+            partition_key = self.key(data)
+            if partition_key is None:
+                if partitions:
+                    rounds.append(list(partitions.values()))
+                    partitions = {}
+                rounds.append([[(message_id, data)]])
+                continue
+            partitions.setdefault(partition_key, []).append((message_id, data))
+
+        if partitions:
+            rounds.append(list(partitions.values()))
+        return rounds
+
+    # handle batch rounds one after another, then ack the handled events at once
+    async def process_batch(self, messages):
+        message_ids = []
+        for partitions in self.rounds(messages):
+            message_ids.extend(await self.process_round(partitions))
+
+        if message_ids:
+            await r.xack(self.stream, self.group, *message_ids)
+
+    # handle round partitions concurrently on the worker pool and run their after-commit work, return ids to ack
+    async def process_round(self, partitions):
+        loop = asyncio.get_running_loop()
+        results = await asyncio.gather(
+            *(loop.run_in_executor(self.executor, self.handle_batch, partition) for partition in partitions),
+            return_exceptions=True
+        )
+
+        message_ids = []
+        for partition, result in zip(partitions, results):
+            if isinstance(result, BaseException):
+                # partition transaction failed, its messages stay pending for redelivery
+                print("Consumer batch error:", result)
+                continue
+
+            deferred, failed = result
+            for awaitable in deferred:
+                try:
+                    await awaitable
+                except Exception as e:
+                    print("Consumer after-commit error:", e)
+
+            # failed events are not acked, they stay pending and are retried by the sweep
+            message_ids.extend(message_id for message_id, data in partition if message_id not in failed)
+
+        return message_ids
+
+    # one session and transaction per partition, crud commits become savepoints so a failed event only rolls back itself
+    # returns (after-commit awaitables, ids of failed events)
+    def handle_batch(self, messages):
+        deferred = []
+        failed = set()
+        try:
+            with batch_session() as db:
+                for message_id, data in messages:
+                    handler = self.handlers.get(data.get("event"))
+                    if handler is None:
+                        continue
+
+                    try:
+                        result = handler(db, data)
+                    except Exception as e:
+                        print("Consumer error:", e)
+                        db.rollback()
+                        failed.add(message_id)
+                        continue
+
+                    if result:
+                        deferred.extend(result)
+        except Exception:
+            # nothing was committed, drop after-commit work without running it
+            for awaitable in deferred:
+                awaitable.close()
+            raise
+        return deferred, failed
@@ -7,13 +7,16 @@ import redis.asyncio as redis
 import asyncio
 
 from .events.consumer import consume_user_events, consume_post_events
-from . import models, database
+from .events.runtime import stop_consumers
+from .services.counters_service import reconcile_forever
+from . import models, database, migrations
 from .routers import comments, replies
 
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
 
 models.Base.metadata.create_all(bind=database.engine)
+migrations.upgrade(database.engine)
 
 # FastAPI app config
 app = FastAPI(title="Comment Service",docs_url=None,swagger_ui_oauth2_redirect_url=None)
@@ -54,4 +57,12 @@ async def startup_event():
 
     # start consumer in background
     asyncio.create_task(consume_user_events())
-    asyncio.create_task(consume_post_events())
\ No newline at end of file
+    asyncio.create_task(consume_post_events())
+
+    # periodic counters reconciliation
+    asyncio.create_task(reconcile_forever())
+
+# stop consumers and let in-flight event batches finish before exit
+@app.on_event("shutdown")
+async def shutdown_event():
+    await stop_consumers()
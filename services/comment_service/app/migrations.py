@@ -0,0 +1,17 @@
+from sqlalchemy import text
+
+
+""" schema upgrades for existing databases (create_all only creates missing tables) """
+
+
+# idempotent statements, run in order on every startup
+UPGRADES = [
+    "ALTER TABLE comments ADD COLUMN IF NOT EXISTS reply_count INTEGER NOT NULL DEFAULT 0",
+    "CREATE INDEX IF NOT EXISTS ix_comments_post_created ON comments (post_id, created_at)",
+]
+
+# apply every upgrade in one transaction
+def upgrade(engine):
+    with engine.begin() as connection:
+        for statement in UPGRADES:
+            connection.execute(text(statement))
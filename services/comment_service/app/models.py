@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
@@ -18,6 +18,7 @@ class Comment(Base):
     post_id = Column(Integer, nullable=False)
     content = Column(String(255), nullable=False)
     parent_id = Column(Integer, ForeignKey("comments.id"), nullable=True)
+    reply_count = Column(Integer, nullable=False, default=0, server_default="0")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     parent = relationship(
@@ -31,3 +32,7 @@ class Comment(Base):
         back_populates="parent",
         cascade="all, delete-orphan"
     )
+
+    __table_args__ = (
+        Index("ix_comments_post_created", "post_id", "created_at"),
+    )
@@ -1,8 +1,9 @@
-from fastapi import FastAPI, Depends, HTTPException, APIRouter, status
+from fastapi import FastAPI, Depends, HTTPException, APIRouter, status, Query
+from typing import Optional
 from sqlalchemy.orm import Session
 
 from .. import schemas, database, dependencies
-from  ..services import comments_service
+from  ..services import comments_service, counters_service
 from ..crud import comments
 
 
@@ -11,6 +12,37 @@ from ..crud import comments
 
 router = APIRouter()
 
+# get one post nested comment tree (first level paged by skip/limit, bounded depth and replies per comment)
+@router.get("/comments/tree/{post_id}", response_model=list[schemas.CommentTreeNode])
+def read_comment_tree(
+        post_id:int,
+        parent_id: Optional[int] = None,
+        skip: int = Query(0, ge=0),
+        limit: int = Query(10, ge=1, le=100),
+        depth: int = Query(3, ge=1, le=10),
+        breadth: int = Query(5, ge=0, le=50),
+        db: Session = Depends(database.get_db)
+):
+    return comments.read_comment_tree(db, post_id, parent_id, skip, limit, depth, breadth)
+
+# repair reply_count drift and resend comment counts to post_service now (internal only)
+@router.post("/comments/counters/reconcile", dependencies=[Depends(dependencies.internal_service_required)])
+async def reconcile_counters():
+    result = await counters_service.reconcile()
+    if result is None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                            detail="reconciliation already running")
+    return result
+
+# get the first k comments of many posts in one call (list page previews)
+@router.get("/comments/batch", response_model=dict[int, list[schemas.CommentResponse]])
+def read_comments_batch(
+        post_ids: list[int] = Query(..., max_length=100),
+        k: int = Query(3, ge=1, le=20),
+        db: Session = Depends(database.get_db)
+):
+    return comments.read_comments_for_posts(db, list(dict.fromkeys(post_ids)), k)
+
 # get one post all comments limited list
 @router.get("/comments/{post_id}", response_model=list[schemas.CommentResponse])
 def read_comments(
@@ -35,7 +67,7 @@ def read_replies(
 @router.post("/comments", response_model=schemas.CommentResponse)
 async def create_comment(
         comment: schemas.CreateComment,
-        db: Session = Depends(database.get_db),
+        db: Session = Depends(database.get_async_db),
         user=Depends(dependencies.verified_user_required)
 ):
     owner_id = user["user_id"]
@@ -56,10 +88,10 @@ def update_comment(
 
 # delete one comment and its replies by id
 @router.delete("/comments/delete/id={comment_id}", status_code=status.HTTP_200_OK)
-def delete_comment(
+async def delete_comment(
         comment_id:int,
-        db: Session = Depends(database.get_db),
+        db: Session = Depends(database.get_async_db),
         user=Depends(dependencies.verified_user_required)
 ):
     owner_id = user["user_id"]
-    return comments.delete_my_comment(db, comment_id, owner_id)
+    return await comments_service.delete_comment(db, comment_id, owner_id)
@@ -18,7 +18,7 @@ router = APIRouter()
 )
 async def create_relpy(
         comment: schemas.CreateReply,
-        db: Session = Depends(database.get_db),
+        db: Session = Depends(database.get_async_db),
         user=Depends(dependencies.get_current_user)
 ):
     owner_id = user["user_id"]
@@ -32,5 +32,9 @@ class CommentResponse(BaseModel):
     post_id:int
     content:str
     parent_id:Optional[int] = None
+    reply_count:int = 0
     created_at:datetime
 
+# comment with its first replies, nested (output)
+class CommentTreeNode(CommentResponse):
+    replies:list["CommentTreeNode"] = []
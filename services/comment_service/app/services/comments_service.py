@@ -1,8 +1,9 @@
 from fastapi import HTTPException, status
 
 from ..crud import comments
+from ..database import run_db
 from ..schemas import CreateComment
-from ..events.publisher import publish_comment_created
+from ..events.publisher import publish_comment_created, publish_comment_deleted
 
 
 """ router and crud bridge """
@@ -10,10 +11,17 @@ from ..events.publisher import publish_comment_created
 
 # bridge between router and crud to publish_comment_created for other services
 async def create_comment(db, comment_data: CreateComment, owner_id, owner_nickname):
-    db_user = comments.create_comment(db, comment_data, owner_id, owner_nickname)
+    db_user = await run_db(db, comments.create_comment, comment_data, owner_id, owner_nickname)
     if not db_user:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
                             detail="something went wrong!")
 
     await publish_comment_created(db_user.id, db_user.owner_id, db_user.nickname, db_user.post_id)
     return db_user
+
+# bridge between router and crud to publish_comment_deleted so post_service can update its comment_count
+async def delete_comment(db, comment_id: int, owner_id: int):
+    post_id, deleted_count = await run_db(db, comments.delete_my_comment, comment_id, owner_id)
+
+    await publish_comment_deleted(comment_id, post_id, deleted_count)
+    return {"detail": "Your comment has been deleted"}
@@ -0,0 +1,86 @@
+from starlette.concurrency import run_in_threadpool
+from decouple import config
+import redis.asyncio as redis
+import asyncio
+
+from ..crud import comments
+from ..database import SessionLocal
+from ..events.publisher import publish_comment_counts_snapshot
+
+
+""" counters reconciliation (reply_count on comments, comment_count on posts) """
+
+
+# seconds between reconciliation runs and comments/posts handled per query
+COUNTER_RECONCILE_INTERVAL = config("COUNTER_RECONCILE_INTERVAL", default=3600, cast=int)
+COUNTER_RECONCILE_BATCH = config("COUNTER_RECONCILE_BATCH", default=1000, cast=int)
+
+# only one comment_service replica reconciles per interval
+LOCK_KEY = "comment_counters:reconcile_lock"
+
+# the last snapshot range is open ended (max postgres integer)
+MAX_POST_ID = 2**31 - 1
+
+
+r = redis.Redis(host=config("HOST"), port=config("PORT"), decode_responses=True)
+
+# run fn with a short lived session in the threadpool
+async def with_session(fn, *args):
+    def call():
+        with SessionLocal() as db:
+            return fn(db, *args)
+    return await run_in_threadpool(call)
+
+# recompute every stored reply_count in id ranges, return number of repaired comments
+async def reconcile_reply_counts():
+    repaired = 0
+    last_id = await with_session(comments.max_comment_id)
+
+    for from_id in range(1, last_id + 1, COUNTER_RECONCILE_BATCH):
+        repaired += await with_session(comments.repair_reply_counts, from_id, from_id + COUNTER_RECONCILE_BATCH - 1)
+    return repaired
+
+# counts of the next range and a time taken before counting (post_service skips posts changed after it)
+def count_range(db, after_post_id: int):
+    computed_at = comments.transaction_time(db)
+    return computed_at, comments.count_comments_by_post(db, after_post_id, COUNTER_RECONCILE_BATCH)
+
+# send authoritative comment counts to post_service range by range, posts missing from a range have no comments
+async def publish_comment_counts():
+    snapshots = 0
+    after_post_id = 0
+
+    while True:
+        computed_at, counts = await with_session(count_range, after_post_id)
+        last_range = len(counts) < COUNTER_RECONCILE_BATCH
+        to_post_id = MAX_POST_ID if last_range else counts[-1][0]
+
+        await publish_comment_counts_snapshot(after_post_id + 1, to_post_id, {post_id: count for post_id, count in counts}, computed_at)
+        snapshots += 1
+
+        if last_range:
+            return snapshots
+        after_post_id = to_post_id
+
+# one reconciliation run per COUNTER_RECONCILE_INTERVAL across replicas
+# the lock is never released, it expires with the interval so other replicas skip their runs until then
+async def reconcile():
+    if not await r.set(LOCK_KEY, 1, nx=True, ex=COUNTER_RECONCILE_INTERVAL):
+        return None
+
+    result = {
+        "repaired_reply_counts": await reconcile_reply_counts(),
+        "comment_count_snapshots": await publish_comment_counts(),
+    }
+
+    print(f"counters reconciled: {result}")
+    return result
+
+# reconcile counters on startup (fills counters of existing rows) and then every COUNTER_RECONCILE_INTERVAL seconds
+async def reconcile_forever():
+    while True:
+        try:
+            await reconcile()
+        except Exception as e:
+            print("counters reconciliation error:", e)
+        await asyncio.sleep(COUNTER_RECONCILE_INTERVAL)
@@ -1,6 +1,7 @@
 from fastapi import HTTPException, status
 
 from ..crud import comments
+from ..database import run_db
 from ..schemas import CreateReply
 from ..events.publisher import publish_reply_created
 
@@ -10,7 +11,7 @@ from ..events.publisher import publish_reply_created
 
 # bridge between router and crud to publish_reply_created for other services
 async def create_reply(db, reply_data: CreateReply, owner_id, owner_nickname):
-    db_reply, parent_owner_id = comments.create_reply_comment(db, reply_data, owner_id, owner_nickname)
+    db_reply, parent_owner_id = await run_db(db, comments.create_reply_comment, reply_data, owner_id, owner_nickname)
     if not db_reply:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
                             detail="something went wrong!")
@@ -0,0 +1,163 @@
+from fastapi import HTTPException, status
+from collections import OrderedDict
+from decouple import config
+import threading
+import hashlib
+import binascii
+import base64
+import hmac
+import json
+import time
+
+
+""" verified jwt claims (bounded lru of verified tokens, switchable jwt backend) """
+
+
+# config secret key and algorithm based on .env file to prevent information hijack
+SECRET_KEY = config("SECRET_KEY")
+ALGORITHM = config("ALGORITHM")
+
+# jwt library verifying tokens (jose or pyjwt) and max verified tokens kept in this process
+JWT_BACKEND = config("JWT_BACKEND", default="jose")
+AUTH_CACHE_SIZE = config("AUTH_CACHE_SIZE", default=10000, cast=int)
+
+# shared secret of the identity headers signed by the gateway (empty: bearer tokens only)
+IDENTITY_SECRET = config("IDENTITY_SECRET", default="")
+
+# claims every access token carries
+REQUIRED_CLAIMS = (
+    "id",
+    "sub",
+    "nickname",
+    "role",
+    "is_verified",
+)
+
+
+# python-jose decoder, None for an invalid or expired token
+def _jose_backend():
+    from jose import jwt, JWTError
+
+    def decode(token: str):
+        try:
+            return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        except JWTError:
+            return None
+    return decode
+
+# pyjwt decoder (less work per token than jose), None for an invalid or expired token
+def _pyjwt_backend():
+    import jwt
+
+    def decode(token: str):
+        try:
+            return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        except jwt.PyJWTError:
+            return None
+    return decode
+
+BACKENDS = {
+    "jose": _jose_backend,
+    "pyjwt": _pyjwt_backend,
+}
+
+# user claims of a verified token or identity, 401 when one is missing
+def _user(payload: dict):
+    if not all(payload.get(claim) is not None for claim in REQUIRED_CLAIMS):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid token payload"
+        )
+
+    return {
+        "user_id": payload["id"],
+        "username": payload["sub"],
+        "nickname": payload["nickname"],
+        "role": payload["role"],
+        "is_email_verified": payload["is_verified"],
+    }
+
+
+# verifies access tokens once, then answers from the cache until the token expires
+class TokenVerifier:
+    def __init__(self, backend: str, cache_size: int):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown JWT_BACKEND {backend!r}, expected one of {', '.join(BACKENDS)}")
+        self.decode = BACKENDS[backend]()
+        self.cache_size = cache_size
+        # sha256(token) -> (user claims, exp), the raw token is never kept
+        self.cache = OrderedDict()
+        # shared by every thread of the process (sync code may verify from the threadpool)
+        self.lock = threading.Lock()
+
+    def cached(self, key: bytes):
+        with self.lock:
+            entry = self.cache.get(key)
+            if entry is None:
+                return None
+            user, exp = entry
+            if exp <= time.time():
+                del self.cache[key]
+                return None
+            self.cache.move_to_end(key)
+            return user
+
+    def store(self, key: bytes, user: dict, exp: float):
+        if self.cache_size <= 0:
+            return
+        with self.lock:
+            self.cache[key] = (user, exp)
+            self.cache.move_to_end(key)
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+    # user claims of a valid token, 401 otherwise
+    def verify(self, token: str):
+        key = hashlib.sha256(token.encode()).digest()
+        user = self.cached(key)
+        if user is not None:
+            return dict(user)
+
+        payload = self.decode(token)
+        if payload is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid or expired token"
+            )
+
+        user = _user(payload)
+
+        # tokens without an expiry are verified every time
+        exp = payload.get("exp")
+        if isinstance(exp, (int, float)):
+            self.store(key, user, exp)
+        return dict(user)
+
+
+verifier = TokenVerifier(JWT_BACKEND, AUTH_CACHE_SIZE)
+
+
+def _unb64(data: str):
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+# user claims of an identity header signed by the gateway ("<payload>.<hmac sha256>"), 401 otherwise
+def verify_identity(header: str):
+    try:
+        payload, signature = header.split(".")
+        expected = hmac.new(IDENTITY_SECRET.encode(), payload.encode(), hashlib.sha256).digest()
+        if not hmac.compare_digest(_unb64(signature), expected):
+            raise ValueError("bad signature")
+        identity = json.loads(_unb64(payload))
+    except (ValueError, binascii.Error):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid identity header"
+        )
+
+    if not isinstance(identity.get("exp"), (int, float)) or identity["exp"] <= time.time():
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired token"
+        )
+
+    return _user(identity)
@@ -1,57 +1,33 @@
 from sqlalchemy.orm import Session
-import redis.asyncio as redis
-from decouple import config
+import asyncio
 
-from ..database import SessionLocal
 from ..crud import verification
 from ..tasks import system_email
+from .runtime import StreamConsumer, by_field
 
 
 """ real_time reading redis stream events """
 
 
-r = redis.Redis(host=config("HOST"), port=config("PORT"), decode_responses=True)
+# user_created: create database record for new users and send them verification email after commit
+def handle_user_created(db: Session, data):
+    user_id = int(data["user_id"])
+    email = str(data["email"])
+
+    db_email = verification.create_record(db, user_id, email)
+    return [asyncio.to_thread(system_email.send_verification_email.delay, db_email.email, db_email.token)]
+
+# change_email_request: change database record and send new verification link to new email after commit
+def handle_change_email_request(db: Session, data):
+    user_id = int(data["user_id"])
+    new_email = str(data["pending_email"])
+
+    db_email = verification.change_email(db, user_id, new_email)
+    return [asyncio.to_thread(system_email.send_verification_email.delay, db_email["email"], db_email["token"])]
 
 # this definition wait for redis stream user_service events
 async def consume_user_events():
-
-    while True:
-        events = await r.xreadgroup(
-            groupname="email_group",
-            consumername="email_consumer",
-            streams={"user_events": ">"},
-            block=0
-        )
-
-        for stream, messages in events:
-            for message_id, data in messages:
-
-                # user_created consumer
-                if data["event"] == "user_created":
-                    user_id = int(data["user_id"])
-                    email = str(data["email"])
-
-                    db: Session = SessionLocal()
-                    try:
-                        # create database record for new users and send them verification email
-                        db_email = verification.create_record(db, user_id, email)
-                        system_email.send_verification_email.delay(db_email.email, db_email.token)
-                    finally:
-                        db.close()
-
-                    await r.xack("user_events", "email_group", message_id)
-
-                # change_email_request consumer
-                if data["event"] == "change_email_request":
-                    user_id = int(data["user_id"])
-                    new_email = str(data["pending_email"])
-
-                    db: Session = SessionLocal()
-                    try:
-                        # change database record and send new verification link to new email
-                        db_email = verification.change_email(db, user_id, new_email)
-                        system_email.send_verification_email.delay(db_email["email"], db_email["token"])
-                    finally:
-                        db.close()
-
-                    await r.xack("user_events", "email_group", message_id)
+    await StreamConsumer("user_events", "email_group", "email_consumer", {
+        "user_created": handle_user_created,
+        "change_email_request": handle_change_email_request,
+    }, key=by_field("user_id")).run()
@@ -7,6 +7,7 @@ import redis.asyncio as redis
 import asyncio
 
 from .events.consumer import consume_user_events
+from .events.runtime import stop_consumers
 from . import models, database
 from .routers import email
 
@@ -52,4 +53,9 @@ async def startup_event():
     await ensure_groups()
 
     # start consumer in background
-    asyncio.create_task(consume_user_events())
\ No newline at end of file
+    asyncio.create_task(consume_user_events())
+
+# stop consumers and let in-flight event batches finish before exit
+@app.on_event("shutdown")
+async def shutdown_event():
+    await stop_consumers()
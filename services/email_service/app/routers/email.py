@@ -17,7 +17,7 @@ router = APIRouter()
 
 # verify email with verification link + token
 @router.get("/emails/verify", dependencies=[rate_limit.rate_limit(limit=20, window=300)])
-async def verify_email(token: str, db: Session = Depends(database.get_db)):
+async def verify_email(token: str, db: Session = Depends(database.get_async_db)):
     return await email_service.verify_email(db, token)
 
 # resend verify link to user email
@@ -1,6 +1,7 @@
 from fastapi import HTTPException
 
 from ..crud import verification as crud
+from ..database import run_db
 from ..events.publisher import publish_email_verified
 
 
@@ -9,7 +10,7 @@ from ..events.publisher import publish_email_verified
 
 # bridge between router and crud to publish_email_verified for other services
 async def verify_email(db, token: str):
-    db_user = crud.verify(db, token)
+    db_user = await run_db(db, crud.verify, token)
     if not db_user:
         raise HTTPException(status_code=400, detail="something went wrong!")
 
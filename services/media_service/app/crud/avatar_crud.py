@@ -1,9 +1,8 @@
-from fastapi import HTTPException, status, UploadFile
+from fastapi import HTTPException, status
 from sqlalchemy.orm import Session
-import uuid
-import os
 
 from .. import models
+from . import files
 
 
 """ Avatar crud """
@@ -51,7 +50,7 @@ def create_avatar_record(db: Session, owner_id: int):
     return avatar
 
 # set default avatar
-async def set_default(db: Session, owner_id: int):
+def set_default(db: Session, owner_id: int):
     db_avatar = db.query(models.Avatar).filter(
         models.Avatar.owner_id == owner_id
     ).first()
@@ -68,8 +67,8 @@ async def set_default(db: Session, owner_id: int):
 
     return db_avatar
 
-# update avatar to new avatar
-async def update_avatar(db: Session, owner_id: int, file: UploadFile):
+# point avatar record to an already saved file, return the record and the replaced file name
+def update_avatar(db: Session, owner_id: int, new_filename: str):
 
     avatar = db.query(models.Avatar).filter(
         models.Avatar.owner_id == owner_id
@@ -78,20 +77,7 @@ async def update_avatar(db: Session, owner_id: int, file: UploadFile):
     if not avatar:
         raise HTTPException(status_code=404, detail="Avatar not found")
 
-    # new file name
-    file_extension = file.filename.split(".")[-1]
-    new_filename = f"{uuid.uuid4()}.{file_extension}"
-    file_path = os.path.join(MEDIA_ROOT, new_filename)
-
-    # save new file
-    with open(file_path, "wb") as buffer:
-        buffer.write(await file.read())
-
-    # delete old file if it was not default avatar
-    if avatar.url and avatar.url != "default-avatar.jpg":
-        old_path = os.path.join(MEDIA_ROOT, avatar.url)
-        if os.path.exists(old_path):
-            os.remove(old_path)
+    old_filename = avatar.url
 
     # save new avatar file name to record
     avatar.url = new_filename
@@ -99,7 +85,7 @@ async def update_avatar(db: Session, owner_id: int, file: UploadFile):
     db.commit()
     db.refresh(avatar)
 
-    return avatar
+    return avatar, old_filename
 
 # delete avatar
 def delete_avatar(db: Session, owner_id: int):
@@ -115,9 +101,7 @@ def delete_avatar(db: Session, owner_id: int):
 
     # delete old file if it was not default avatar
     if db_avatar.url and db_avatar.url != "default-avatar.jpg":
-        file_path = os.path.join(MEDIA_ROOT, db_avatar.url)
-        if os.path.exists(file_path):
-            os.remove(file_path)
+        files.remove_file(MEDIA_ROOT, db_avatar.url)
 
     db.delete(db_avatar)
     db.commit()
@@ -0,0 +1,27 @@
+from fastapi import UploadFile
+import shutil
+import uuid
+import os
+
+
+""" media file storage """
+
+
+# save uploaded file to root with a new uuid file name and return the name
+def save_upload(file: UploadFile, root: str):
+    file_extension = file.filename.split(".")[-1]
+    new_filename = f"{uuid.uuid4()}.{file_extension}"
+
+    os.makedirs(root, exist_ok=True)
+
+    file.file.seek(0)
+    with open(os.path.join(root, new_filename), "wb") as buffer:
+        shutil.copyfileobj(file.file, buffer)
+
+    return new_filename
+
+# remove one stored file if it exists
+def remove_file(root: str, filename: str):
+    file_path = os.path.join(root, filename)
+    if os.path.exists(file_path):
+        os.remove(file_path)
@@ -1,9 +1,8 @@
 from fastapi import HTTPException, status, UploadFile
 from sqlalchemy.orm import Session
-import uuid
-import os
 
 from .. import models
+from . import files
 
 
 """ Media crud """
@@ -28,38 +27,24 @@ def read_medias(db: Session, post_id:int):
                             detail="there is no media for this post")
     return db_media
 
-# save and create media
-def create_media(db: Session, post_id: int, owner_id:int, file: UploadFile):
-
-    # check file type
-    content_type = file.content_type
+# media type of uploaded file (image or video)
+def media_type_of(file: UploadFile):
+    content_type = file.content_type or ""
 
     if content_type.startswith("image"):
-        media_type = "image"
+        return "image"
     elif content_type.startswith("video"):
-        media_type = "video"
-    else:
-        raise HTTPException(status_code=400, detail="Unsupported media type")
-
-    # create uuid file name
-    file_extension = file.filename.split(".")[-1]
-    new_filename = f"{uuid.uuid4()}.{file_extension}"
-
-    upload_dir = os.path.join(MEDIA_ROOT)
-    os.makedirs(upload_dir, exist_ok=True)
-
-    file_path = os.path.join(upload_dir, new_filename)
+        return "video"
+    raise HTTPException(status_code=400, detail="Unsupported media type")
 
+# create media record for an already saved file
+def create_media(db: Session, post_id: int, owner_id:int, url: str, media_type: str):
     try:
-        # save file
-        with open(file_path, "wb") as buffer:
-            buffer.write(file.file.read())
-
         # create database record
         db_media = models.Media(
             post_id=post_id,
             owner_id=owner_id,
-            url=new_filename,
+            url=url,
             media_type=media_type
         )
 
@@ -69,18 +54,12 @@ def create_media(db: Session, post_id: int, owner_id:int, file: UploadFile):
 
         return db_media
 
-    except Exception as e:
+    except Exception:
         db.rollback()
+        raise
 
-        # اگر فایل ذخیره شده بود، پاکش کن
-        if os.path.exists(file_path):
-            os.remove(file_path)
-
-        raise HTTPException(status_code=500, detail="Media creation failed")
-
-# update media
-async def update_media(db: Session, media_id: int, user_id:int, file: UploadFile):
-
+# read media by id and check its owner
+def read_own_media(db: Session, media_id: int, user_id:int):
     media = db.query(models.Media).filter(models.Media.id == media_id).first()
 
     if not media:
@@ -89,39 +68,20 @@ async def update_media(db: Session, media_id: int, user_id:int, file: UploadFile
     if media.owner_id != user_id:
         raise HTTPException(status_code=403, detail="You are not allowed to update this media")
 
-    # check file type
-    content_type = file.content_type
-
-    if content_type.startswith("image"):
-        media_type = "image"
-    elif content_type.startswith("video"):
-        media_type = "video"
-    else:
-        raise HTTPException(status_code=400, detail="Only image or video files are allowed")
-
-    # create new uuid file name
-    file_extension = file.filename.split(".")[-1]
-    new_filename = f"{uuid.uuid4()}.{file_extension}"
-    file_path = os.path.join(MEDIA_ROOT, new_filename)
-
-    # save new file
-    with open(file_path, "wb") as buffer:
-        buffer.write(await file.read())
+    return media
 
-    # remove old file
-    if media.url:
-        old_path = os.path.join(MEDIA_ROOT, media.url)
-        if os.path.exists(old_path):
-            os.remove(old_path)
+# point media record to an already saved file, return the record and the replaced file name
+def update_media(db: Session, media, url: str, media_type: str):
+    old_url = media.url
 
     # update database record
-    media.url = new_filename
+    media.url = url
     media.media_type = media_type
 
     db.commit()
     db.refresh(media)
 
-    return media
+    return media, old_url
 
 def delete_media(db: Session, media_id: int, user_id:int):
     db_media = db.query(models.Media).filter(models.Media.id == media_id).first()
@@ -137,10 +97,7 @@ def delete_media(db: Session, media_id: int, user_id:int):
 
     # remove file
     if db_media.url:
-        file_path = os.path.join(MEDIA_ROOT, db_media.url)
-
-        if os.path.exists(file_path):
-            os.remove(file_path)
+        files.remove_file(MEDIA_ROOT, db_media.url)
 
     # delete record
     db.delete(db_media)
@@ -1,75 +1,39 @@
-import redis.asyncio as redis
 from sqlalchemy.orm import Session
-from decouple import config
 
-from ..database import SessionLocal
 from ..crud import avatar_crud, media_crud
+from .runtime import StreamConsumer, by_field
 
 
 """ real_time reading redis stream events """
 
 
-r = redis.Redis(host=config("HOST"), port=config("PORT"), decode_responses=True)
+# user_created: create avatar record for the new user
+def handle_user_created(db: Session, data):
+    user_id = int(data["user_id"])
 
-# this definition wait for redis stream user_created event to create_avatar_record for it
-async def consume_user_events():
-    print("Waiting for user_created events...")
-    while True:
-        events = await r.xreadgroup(
-            groupname="media_group",
-            consumername="media_user_consumer",
-            streams={"user_events": ">"},
-            block=0
-        )
-
-        for stream, messages in events:
-            for message_id, data in messages:
-                print("consuming")
-                event_type = data.get("event")
-
-                db: Session = SessionLocal()
-                try:
-                    if event_type == "user_created":
-                        user_id = int(data["user_id"])
-                        avatar_crud.create_avatar_record(db, owner_id=user_id)
-                        print("created done")
+    avatar_crud.create_avatar_record(db, owner_id=user_id)
 
-                    elif event_type == "user_deleted":
-                        user_id = int(data["user_id"])
-                        avatar_crud.delete_avatar(db, user_id)
-                        print("deleted done")
+# user_deleted: delete user avatar
+def handle_user_deleted(db: Session, data):
+    user_id = int(data["user_id"])
 
-                    await r.xack("user_events", "media_group", message_id)
+    avatar_crud.delete_avatar(db, user_id)
 
-                except Exception as e:
-                    print("Consumer error:", e)
-                    db.rollback()
+# post_deleted: delete every media of the deleted post
+def handle_post_deleted(db: Session, data):
+    post_id = int(data["post_id"])
 
-                    await r.xack("user_events", "media_group", message_id)
+    media_crud.delete_post_medias(db, post_id)
 
-                finally:
-                    db.close()
+# this definition wait for redis stream user_created event to create_avatar_record for it
+async def consume_user_events():
+    await StreamConsumer("user_events", "media_group", "media_user_consumer", {
+        "user_created": handle_user_created,
+        "user_deleted": handle_user_deleted,
+    }, key=by_field("user_id")).run()
 
 # this definition wait for redis stream post_deleted event to delete its medias
 async def consume_post_deleted():
-    print("Waiting for post_deleted events...")
-    while True:
-        events = await r.xreadgroup(
-            groupname="media_group",
-            consumername="media_post_consumer",
-            streams={"post_events": ">"},
-            block=0
-        )
-        for stream, messages in events:
-            for message_id, data in messages:
-
-                if data["event"] == "post_deleted":
-                    post_id = int(data["post_id"])
-                    db: Session = SessionLocal()
-                    try:
-                        media_crud.delete_post_medias(db, post_id)
-                    finally:
-                        db.close()
-
-                    # delete post_deleted event from redis steam pending list
-                    await r.xack("post_events", "media_group", message_id)
\ No newline at end of file
+    await StreamConsumer("post_events", "media_group", "media_post_consumer", {
+        "post_deleted": handle_post_deleted,
+    }, key=by_field("post_id")).run()
@@ -8,6 +8,7 @@ import redis.asyncio as redis
 import asyncio
 
 from .events.consumer import consume_user_events, consume_post_deleted
+from .events.runtime import stop_consumers
 from . import models, database
 from .routers import avatar, media
 
@@ -54,4 +55,9 @@ async def ensure_groups():
 async def startup_event():
     await ensure_groups()
     asyncio.create_task(consume_user_events())
-    asyncio.create_task(consume_post_deleted())
\ No newline at end of file
+    asyncio.create_task(consume_post_deleted())
+
+# stop consumers and let in-flight event batches finish before exit
+@app.on_event("shutdown")
+async def shutdown_event():
+    await stop_consumers()
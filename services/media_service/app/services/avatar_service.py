@@ -1,6 +1,8 @@
 from fastapi import UploadFile
+from starlette.concurrency import run_in_threadpool
 
-from ..crud import avatar_crud
+from ..crud import avatar_crud, files
+from ..database import run_db
 from ..events.publisher import publish_avatar_updated
 
 
@@ -9,14 +11,24 @@ from ..events.publisher import publish_avatar_updated
 
 # bridge between router and crud to publish avatar_updated for other services
 async def avatar_updated(db, owner_id: int, file: UploadFile):
-    db_user = await avatar_crud.update_avatar(db, owner_id, file)
+    new_filename = await run_in_threadpool(files.save_upload, file, avatar_crud.MEDIA_ROOT)
+
+    try:
+        db_user, old_filename = await run_db(db, avatar_crud.update_avatar, owner_id, new_filename)
+    except Exception:
+        await run_in_threadpool(files.remove_file, avatar_crud.MEDIA_ROOT, new_filename)
+        raise
+
+    # delete old file if it was not default avatar
+    if old_filename and old_filename != "default-avatar.jpg":
+        await run_in_threadpool(files.remove_file, avatar_crud.MEDIA_ROOT, old_filename)
 
     await publish_avatar_updated(user_id=owner_id,url=db_user.url)
     return db_user
 
 # bridge between router and crud to publish avatar_updated for other services
 async def set_default(db, owner_id: int):
-    db_user = await avatar_crud.set_default(db, owner_id)
+    db_user = await run_db(db, avatar_crud.set_default, owner_id)
 
     await publish_avatar_updated(user_id=owner_id,url=db_user.url)
     return db_user
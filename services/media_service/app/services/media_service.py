@@ -0,0 +1,36 @@
+from fastapi import HTTPException, UploadFile
+from starlette.concurrency import run_in_threadpool
+
+from ..crud import media_crud, files
+from ..database import run_db
+
+
+""" router and crud bridge """
+
+
+# save uploaded file off the event loop and create its media record (file is removed if the record fails)
+async def create_media(db, post_id: int, owner_id: int, file: UploadFile):
+    media_type = media_crud.media_type_of(file)
+    new_filename = await run_in_threadpool(files.save_upload, file, media_crud.MEDIA_ROOT)
+
+    try:
+        return await run_db(db, media_crud.create_media, post_id, owner_id, new_filename, media_type)
+    except Exception:
+        await run_in_threadpool(files.remove_file, media_crud.MEDIA_ROOT, new_filename)
+        raise HTTPException(status_code=500, detail="Media creation failed")
+
+# replace media file and record, old file is removed after commit
+async def update_media(db, media_id: int, user_id: int, file: UploadFile):
+    media = await run_db(db, media_crud.read_own_media, media_id, user_id)
+    media_type = media_crud.media_type_of(file)
+    new_filename = await run_in_threadpool(files.save_upload, file, media_crud.MEDIA_ROOT)
+
+    try:
+        media, old_filename = await run_db(db, media_crud.update_media, media, new_filename, media_type)
+    except Exception:
+        await run_in_threadpool(files.remove_file, media_crud.MEDIA_ROOT, new_filename)
+        raise
+
+    if old_filename:
+        await run_in_threadpool(files.remove_file, media_crud.MEDIA_ROOT, old_filename)
+    return media
@@ -0,0 +1,92 @@
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from functools import wraps
+import asyncio
+
+from . import schemas, database, counters, push, coalesce
+from .crud import notifications
+
+
+""" consumer write buffer (notifications of one event are written together in its savepoint, counted and pushed once per batch) """
+
+
+# session.info keys (buffered plain notifications, work left for after commit)
+INSERTS_KEY = "notification_inserts"
+AFTER_COMMIT_KEY = "notification_after_commit"
+
+
+# buffer one notification instead of inserting it, written with the rest of the event
+def add(db: Session, notification: schemas.NotificationInput):
+    db.info.setdefault(INSERTS_KEY, []).append(notification)
+
+# write buffered notifications right before the session commits:
+# one multi-row INSERT ... RETURNING per table for plain ones, one merge per coalesced group
+def flush(db: Session):
+    inputs = db.info.pop(INSERTS_KEY, None)
+    created = notifications.insert_notifications(db, inputs) if inputs else []
+
+    merged = coalesce.flush(db)
+    if merged:
+        db.flush()
+
+    if not created and not merged:
+        return
+
+    after_commit = db.info.setdefault(AFTER_COMMIT_KEY, {"messages": [], "unread": [], "public": []})
+    for db_notification, new in [(row, True) for row in created] + merged:
+        after_commit["messages"].append(push.message(db_notification))
+        if not new:
+            continue
+        if db_notification.is_public:
+            after_commit["public"].append(db_notification.id)
+        else:
+            after_commit["unread"].append(db_notification.recipient_id)
+
+event.listen(database.SessionLocal, "before_commit", flush)
+
+# copy of every buffer of the session (lists and group entries are changed in place while buffering)
+def _snapshot(db: Session):
+    after_commit = db.info.get(AFTER_COMMIT_KEY)
+    return {
+        INSERTS_KEY: list(db.info.get(INSERTS_KEY, [])),
+        coalesce.BUFFER_KEY: {key: dict(entry) for key, entry in db.info.get(coalesce.BUFFER_KEY, {}).items()},
+        AFTER_COMMIT_KEY: after_commit and {key: list(value) for key, value in after_commit.items()},
+    }
+
+# handler whose notifications are written in its own savepoint (the commit flushes the buffer), so a bad row only
+# fails its event, and whose buffers are restored when it fails (no counter or push for rolled back rows)
+def atomic(handler):
+    @wraps(handler)
+    def run(db: Session, data):
+        saved = _snapshot(db)
+        result = None
+        try:
+            result = handler(db, data)
+            if db.info.get(INSERTS_KEY) or db.info.get(coalesce.BUFFER_KEY):
+                db.commit()
+            return result
+        except Exception:
+            # after-commit work of a handler whose rows failed to write is dropped unrun
+            for awaitable in result or []:
+                awaitable.close()
+            for key, value in saved.items():
+                db.info.pop(key, None)
+                if value:
+                    db.info[key] = value
+            raise
+    return run
+
+# unread counter changes of flushed notifications
+def _count(pending):
+    counters.add_public(*pending["public"])
+    for recipient_id in pending["unread"]:
+        counters.add_unread(recipient_id, 1)
+
+# counters and pushes of everything flushed, returned by handlers and run once after the batch commits
+async def after_commit(db: Session):
+    pending = db.info.pop(AFTER_COMMIT_KEY, None)
+    if not pending:
+        return
+
+    await asyncio.to_thread(_count, pending)
+    await push.publish(pending["messages"])
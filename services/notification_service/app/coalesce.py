@@ -0,0 +1,109 @@
+from sqlalchemy.orm import Session
+from decouple import config
+from datetime import datetime, timezone, timedelta
+
+from . import schemas
+from .crud import notifications
+
+
+""" coalescing notifications ("alice and 12 others commented on your post") """
+
+
+# unread notifications of the same group merge while their latest activity is younger than this (seconds), recent actors kept per notification
+NOTIFICATION_COALESCE_WINDOW = config("NOTIFICATION_COALESCE_WINDOW", default=3600, cast=int)
+NOTIFICATION_COALESCE_ACTORS = config("NOTIFICATION_COALESCE_ACTORS", default=3, cast=int)
+
+# message of one coalesced group kind (one actor, many actors)
+MESSAGES = {
+    "post": ("{nickname} leave a comment on your post!", "{nickname} and {others} others commented on your post!"),
+    "comment": ("{nickname} replied on your comment!", "{nickname} and {others} others replied on your comment!"),
+}
+
+# session.info key of buffered groups
+BUFFER_KEY = "notification_groups"
+
+
+# buffer one notification of a group (kind, object id) instead of inserting it, merged with the group on flush
+def add(db: Session, notification: schemas.NotificationInput, kind: str, object_id: int, nickname: str):
+    group_key = f"{notification.type}:{kind}:{object_id}"
+    buffer = db.info.setdefault(BUFFER_KEY, {})
+    entry = buffer.setdefault((notification.recipient_id, group_key), {"kind": kind, "actors": []})
+
+    # latest input wins for object and payload, actors newest first without duplicates
+    entry["notification"] = notification
+    actor = {"id": notification.actor_id, "nickname": nickname}
+    entry["actors"] = [actor] + [a for a in entry["actors"] if a["id"] != actor["id"]]
+
+# message of a group with actor_count actors, latest actor first
+def render(kind: str, actors, actor_count: int):
+    single, many = MESSAGES[kind]
+    if actor_count <= 1:
+        return single.format(nickname=actors[0]["nickname"])
+    return many.format(nickname=actors[0]["nickname"], others=actor_count - 1)
+
+# group kind of a stored comment notification (rows written before coalescing have no group key, replies carry parent_id)
+def kind_of(db_notification):
+    if db_notification.group_key:
+        return db_notification.group_key.split(":")[1]
+    return "comment" if "parent_id" in (db_notification.payload or {}) else "post"
+
+# rename one actor in the rows it acted in and rebuild each message from the row's own kind and actors (user_updated)
+def rename_actor(db: Session, user_id: int, nickname: str):
+    for db_notification in notifications.get_actor_notifications(db, user_id):
+        actors = db_notification.actors or [{"id": db_notification.actor_id, "nickname": nickname}]
+        actors = [{**actor, "nickname": nickname} if actor["id"] == user_id else actor for actor in actors]
+
+        if db_notification.actors is not None:
+            db_notification.actors = actors
+        db_notification.payload = {
+            **(db_notification.payload or {}),
+            "message": render(kind_of(db_notification), actors, db_notification.actor_count),
+        }
+
+# merge one buffered group into the unread row of its window or insert a new row, return (row, created)
+# a merged row moves to the top of the inbox with a new id (clients replace the older row of the same group_key),
+# created_at is the latest activity, so the window slides with it
+def merge(db: Session, recipient_id: int, group_key: str, entry):
+    notification = entry["notification"]
+    actors = entry["actors"]
+    since = datetime.now(timezone.utc) - timedelta(seconds=NOTIFICATION_COALESCE_WINDOW)
+
+    db_notification = notifications.get_coalescing_notification(db, recipient_id, group_key, since)
+    if db_notification is None:
+        db_notification = notifications.build_notification(notification)
+        db_notification.group_key = group_key
+        db_notification.actor_count = len(actors)
+        created = True
+        db.add(db_notification)
+    else:
+        # actors already in the recent list are not counted again
+        recent = db_notification.actors or []
+        recent_ids = {actor["id"] for actor in recent}
+        new_ids = {actor["id"] for actor in actors}
+        db_notification.actor_count += sum(1 for actor in actors if actor["id"] not in recent_ids)
+        actors = actors + [actor for actor in recent if actor["id"] not in new_ids]
+
+        latest = notifications.build_notification(notification)
+        db_notification.actor_id = latest.actor_id
+        db_notification.object_type = latest.object_type
+        db_notification.object_id = latest.object_id
+        db_notification.expires_at = latest.expires_at
+        # partition key, postgres moves the row to the partition of today
+        db_notification.created_at = datetime.now(timezone.utc)
+        # fresh id too, so sse resume (id > Last-Event-ID) and live pushes see the merge as the newest event
+        db_notification.id = notifications.next_notification_id(db)
+        created = False
+
+    db_notification.actors = actors[:NOTIFICATION_COALESCE_ACTORS]
+    db_notification.payload = {
+        **(notification.payload.dict() if notification.payload else {}),
+        "message": render(entry["kind"], db_notification.actors, db_notification.actor_count),
+    }
+    return db_notification, created
+
+# merge every buffered group of the session, return [(row, created)]
+def flush(db: Session):
+    buffer = db.info.pop(BUFFER_KEY, None)
+    if not buffer:
+        return []
+    return [merge(db, recipient_id, group_key, entry) for (recipient_id, group_key), entry in buffer.items()]
@@ -0,0 +1,143 @@
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+from datetime import datetime, timezone
+from decouple import config
+import redis
+
+from . import models
+
+
+""" unread notification counters in redis """
+
+
+# private counters expire and are recounted from the database, so any drift heals after this many seconds
+UNREAD_COUNTER_TTL = config("UNREAD_COUNTER_TTL", default=86400, cast=int)
+
+# counter keys (private unread per user, its change version, ids of live public notifications, public id last seen per user)
+UNREAD_KEY = "notifications:unread:{}"
+UNREAD_VERSION_KEY = "notifications:unread_version:{}"
+PUBLIC_KEY = "notifications:public"
+PUBLIC_SEEN_KEY = "notifications:public_seen_id:{}"
+
+
+r = redis.Redis(host=config("HOST"), port=config("PORT"), decode_responses=True)
+
+# change a counter only while it exists (a missing counter is recounted from the database on the next read)
+# and bump its version either way, so a recount running concurrently is not stored
+_incr_existing = r.register_script("""
+redis.call('INCR', KEYS[2])
+redis.call('EXPIRE', KEYS[2], ARGV[2])
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return redis.call('INCRBY', KEYS[1], ARGV[1])
+end
+return nil
+""")
+
+# store a recounted counter only if no change happened since its version was read before counting
+_seed = r.register_script("""
+if (redis.call('GET', KEYS[2]) or '') ~= ARGV[1] then
+    return nil
+end
+return redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3], 'NX')
+""")
+
+# private unread counter of one user changed by delta
+def add_unread(user_id: int, delta: int):
+    try:
+        _incr_existing(keys=[UNREAD_KEY.format(user_id), UNREAD_VERSION_KEY.format(user_id)], args=[delta, UNREAD_COUNTER_TTL])
+    except redis.RedisError as e:
+        print("Unread counter error:", e)
+
+# every live public notification so far is seen by the user (seen id is the newest live public id, 0 without any)
+_mark_seen = r.register_script("""
+local latest = redis.call('ZREVRANGE', KEYS[1], 0, 0)
+redis.call('SET', KEYS[2], latest[1] or '0')
+""")
+
+# public notifications newer than the last one the user saw, users start with every earlier one seen
+_public_unread = r.register_script("""
+local seen = redis.call('GET', KEYS[2])
+if not seen then
+    local latest = redis.call('ZREVRANGE', KEYS[1], 0, 0)
+    seen = latest[1] or '0'
+    redis.call('SET', KEYS[2], seen)
+end
+return redis.call('ZCOUNT', KEYS[1], '(' .. seen, '+inf')
+""")
+
+# new public notifications for everyone (ids scored by themselves, so unread is a count above the seen id)
+def add_public(*notification_ids: int):
+    if not notification_ids:
+        return
+    try:
+        r.zadd(PUBLIC_KEY, {notification_id: notification_id for notification_id in notification_ids})
+    except redis.RedisError as e:
+        print("Unread counter error:", e)
+
+# deleted or expired public notifications no longer count as unread for anyone
+def remove_public(*notification_ids: int):
+    if not notification_ids:
+        return
+    try:
+        r.zrem(PUBLIC_KEY, *notification_ids)
+    except redis.RedisError as e:
+        print("Unread counter error:", e)
+
+# add every live public notification of the database (startup, fills the set after upgrades or a redis flush)
+def sync_public(db: Session):
+    ids = (
+        db.query(models.PublicNotification.id)
+        .filter(or_(models.PublicNotification.expires_at.is_(None), models.PublicNotification.expires_at > datetime.now(timezone.utc)))
+        .all()
+    )
+    add_public(*(notification_id for notification_id, in ids))
+
+# every public notification so far is seen by the user
+def mark_public_seen(user_id: int):
+    try:
+        _mark_seen(keys=[PUBLIC_KEY, PUBLIC_SEEN_KEY.format(user_id)])
+    except redis.RedisError as e:
+        print("Unread counter error:", e)
+
+# forget the counters of one deleted user
+def drop(user_id: int):
+    try:
+        r.delete(UNREAD_KEY.format(user_id), UNREAD_VERSION_KEY.format(user_id), PUBLIC_SEEN_KEY.format(user_id))
+    except redis.RedisError as e:
+        print("Unread counter error:", e)
+
+# count unexpired private unread notifications of one user in the database (recipient/read_at index)
+def count_unread(db: Session, user_id: int):
+    return (
+        db.query(models.Notification)
+        .filter(
+            models.Notification.recipient_id == user_id,
+            models.Notification.is_public.is_(False),
+            models.Notification.read_at.is_(None),
+            or_(models.Notification.expires_at.is_(None), models.Notification.expires_at > datetime.now(timezone.utc)),
+        )
+        .count()
+    )
+
+# private and public unread counts of one user, the database is only hit when the private counter is missing
+def unread(db: Session, user_id: int):
+    try:
+        pipe = r.pipeline(transaction=False)
+        pipe.get(UNREAD_KEY.format(user_id))
+        _public_unread(keys=[PUBLIC_KEY, PUBLIC_SEEN_KEY.format(user_id)], client=pipe)
+        pipe.get(UNREAD_VERSION_KEY.format(user_id))
+        private, public, version = pipe.execute()
+
+        # a notification committed after the count would be missed by the stored counter (its add_unread found no counter),
+        # so the recount is only stored when the version read before counting is unchanged
+        if private is None:
+            private = count_unread(db, user_id)
+            _seed(keys=[UNREAD_KEY.format(user_id), UNREAD_VERSION_KEY.format(user_id)], args=[version or "", private, UNREAD_COUNTER_TTL])
+    except redis.RedisError as e:
+        print("Unread counter error:", e)
+        return {"private": count_unread(db, user_id), "public": 0}
+
+    return {
+        "private": int(private),
+        "public": int(public),
+    }
@@ -1,79 +1,127 @@
 from fastapi import HTTPException, status
-from sqlalchemy import func, desc, and_, or_
+from sqlalchemy import select, func, desc, and_, or_, insert, cast
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Session
 from datetime import datetime, timezone, timedelta
+from itertools import islice
+import heapq
 
-from .. import models, schemas
+from .. import models, schemas, counters
 
 
 """ notification crud """
 
 
-# get my notifications and its total number
+# rows that are not expired yet (the sweeper deletes expired rows with some delay)
+def _alive(model):
+    return or_(model.expires_at.is_(None), model.expires_at > datetime.now(timezone.utc))
+
+# newest first merge of already sorted notification lists (k-way merge on created_at), one page of it
+def _merge_page(sources, skip: int, limit: int):
+    merged = heapq.merge(*sources, key=lambda notification: notification.created_at, reverse=True)
+    return list(islice(merged, skip, skip + limit))
+
+# get my notifications and whether more pages exist (unread totals come from counters, not a count over the table)
+# private inbox and public broadcasts are two index range scans of the first skip + limit + 1 rows, merged in memory
 def get_notifications(db: Session, user_id: int, skip: int = 0, limit: int = 20):
-    query = (
+    window = skip + limit + 1
+
+    private = (
         db.query(models.Notification)
-        .filter(
-            or_(
-                models.Notification.is_public.is_(True),
-                and_(
-                    models.Notification.is_public.is_(False),
-                    models.Notification.recipient_id == user_id,
-                ),
-            )
-        )
+        .filter(models.Notification.recipient_id == user_id, _alive(models.Notification))
+        .order_by(models.Notification.created_at.desc())
+        .limit(window)
+        .all()
     )
 
-    total = query.count()
+    public = (
+        db.query(models.PublicNotification)
+        .filter(_alive(models.PublicNotification))
+        .order_by(models.PublicNotification.created_at.desc())
+        .limit(window)
+        .all()
+    )
 
-    items = (
-        query.order_by(models.Notification.created_at.desc())
-        .offset(skip)
-        .limit(limit)
+    items = _merge_page([private, public], skip, limit + 1)
+
+    # the first page shows the newest public notifications, so all of them count as seen
+    if skip == 0:
+        counters.mark_public_seen(user_id)
+
+    return items[:limit], len(items) > limit
+
+# notifications created after after_id (sse resume), oldest first, and whether more than limit were missed
+def get_notifications_after(db: Session, user_id: int, after_id: int, limit: int = 100):
+    private = (
+        db.query(models.Notification)
+        .filter(models.Notification.recipient_id == user_id, models.Notification.id > after_id, _alive(models.Notification))
+        .order_by(models.Notification.id)
+        .limit(limit + 1)
         .all()
     )
 
-    return items, total
+    public = (
+        db.query(models.PublicNotification)
+        .filter(models.PublicNotification.id > after_id, _alive(models.PublicNotification))
+        .order_by(models.PublicNotification.id)
+        .limit(limit + 1)
+        .all()
+    )
+
+    items = list(islice(heapq.merge(private, public, key=lambda notification: notification.id), limit + 1))
+    return items[:limit], len(items) > limit
 
 # get admin private notifications and all public notifications
 def get_admin_notifications(db: Session, user_id: int, skip: int = 0, limit: int = 20,):
-    query = (
-        db.query(models.Notification)
-        .filter(
-            models.Notification.type == "admin_message",
-            or_(
-                models.Notification.is_public.is_(True),
-                and_(
-                    models.Notification.is_public.is_(False),
-                    models.Notification.actor_id == user_id,
-                ),
-            ),
-        )
+    private_query = db.query(models.Notification).filter(
+        models.Notification.type == "admin_message",
+        models.Notification.actor_id == user_id,
+        _alive(models.Notification),
+    )
+    public_query = db.query(models.PublicNotification).filter(
+        models.PublicNotification.type == "admin_message",
+        _alive(models.PublicNotification),
     )
 
-    total = query.count()
+    total = private_query.count() + public_query.count()
 
-    items = (
-        query.order_by(models.Notification.created_at.desc())
-        .offset(skip)
-        .limit(limit)
-        .all()
-    )
+    private = private_query.order_by(models.Notification.created_at.desc()).limit(skip + limit).all()
+    public = public_query.order_by(models.PublicNotification.created_at.desc()).limit(skip + limit).all()
+
+    return _merge_page([private, public], skip, limit), total
 
-    return items, total
+# find one unexpired private or public notification by id (ids are unique across both tables)
+def _find_notification(db: Session, notification_id: int):
+    notification = db.query(models.Notification).filter(models.Notification.id == notification_id, _alive(models.Notification)).first()
+    if notification:
+        return notification
+    return db.query(models.PublicNotification).filter(models.PublicNotification.id == notification_id, _alive(models.PublicNotification)).first()
 
 # get one notification by owner
 def get_notification(db: Session, user_id: int, notification_id: int):
-    notification_db = db.query(models.Notification).filter(models.Notification.id == notification_id).first()
+    notification_db = _find_notification(db, notification_id)
     if not notification_db:
         raise HTTPException(status_code=404, detail="notification not found!")
     if notification_db.is_public == False and notification_db.recipient_id != user_id:
         raise HTTPException(status_code=403, detail="only the notification recipient can view this notification!")
 
+    # opening a private notification marks it as read, only the open whose update set read_at decrements
+    # (concurrent opens of the same notification wait on the row and then match nothing)
+    if not notification_db.is_public and notification_db.read_at is None:
+        marked = (
+            db.query(models.Notification)
+            .filter(models.Notification.id == notification_db.id, models.Notification.read_at.is_(None))
+            .update({models.Notification.read_at: datetime.now(timezone.utc)}, synchronize_session=False)
+        )
+        db.commit()
+        db.refresh(notification_db)
+        if marked:
+            counters.add_unread(user_id, -1)
+
     return notification_db
 
-# create public or private notification by admin
-def create_notification(db: Session, notification: schemas.NotificationInput):
+# validate one notification input, return its model (public or private table) and column values
+def notification_values(notification: schemas.NotificationInput):
     if notification.is_public and notification.recipient_id is not None:
         raise ValueError("public notifications must not have recipient_id")
 
@@ -87,30 +135,86 @@ def create_notification(db: Session, notification: schemas.NotificationInput):
         if notification.expire_days else None
     )
 
-    db_notification = models.Notification(
-        recipient_id=notification.recipient_id,
-        actor_id=notification.actor_id,
-        type=notification.type,
-        object_type=notification.object_type,
-        object_id=notification.object_id,
-        expires_at=expires_at,
-        payload=payload_data,
-        is_public=notification.is_public
-    )
+    values = {
+        "actor_id": notification.actor_id,
+        "type": notification.type,
+        "object_type": notification.object_type,
+        "object_id": notification.object_id,
+        "expires_at": expires_at,
+        "payload": payload_data,
+    }
+
+    if notification.is_public:
+        return models.PublicNotification, values
+    return models.Notification, {**values, "recipient_id": notification.recipient_id, "is_public": False}
+
+# validate one notification input and build its public or private row (not added to the session)
+def build_notification(notification: schemas.NotificationInput):
+    model, values = notification_values(notification)
+    return model(**values)
+
+# insert many notifications with one multi-row INSERT ... RETURNING per table, no commit, rows in input order
+def insert_notifications(db: Session, inputs: list[schemas.NotificationInput]):
+    tables = {}
+    for position, notification in enumerate(inputs):
+        model, values = notification_values(notification)
+        tables.setdefault(model, []).append((position, values))
+
+    rows = [None] * len(inputs)
+    for model, items in tables.items():
+        created = db.scalars(
+            insert(model).returning(model, sort_by_parameter_order=True),
+            [values for _, values in items]
+        ).all()
+        for (position, _), row in zip(items, created):
+            rows[position] = row
+    return rows
+
+# create public or private notification by admin
+def create_notification(db: Session, notification: schemas.NotificationInput):
+    db_notification = build_notification(notification)
 
     db.add(db_notification)
     db.commit()
     db.refresh(db_notification)
+
+    if db_notification.is_public:
+        counters.add_public(db_notification.id)
+    else:
+        counters.add_unread(db_notification.recipient_id, 1)
     return db_notification
 
-# delete one notification by admin
-def delete_notification(db: Session, notification_id:int):
-    notification = (
+# next id of the notification sequence shared by private and public notifications
+def next_notification_id(db: Session):
+    return db.execute(select(models.notification_id_seq.next_value())).scalar()
+
+# unread notification of one recipient and group created since `since`, locked until the coalescing merge commits
+def get_coalescing_notification(db: Session, recipient_id: int, group_key: str, since: datetime):
+    return (
         db.query(models.Notification)
-        .filter(models.Notification.id == notification_id)
+        .filter(
+            models.Notification.recipient_id == recipient_id,
+            models.Notification.group_key == group_key,
+            models.Notification.read_at.is_(None),
+            models.Notification.created_at >= since,
+            _alive(models.Notification),
+        )
+        .order_by(models.Notification.created_at.desc())
+        .with_for_update()
         .first()
     )
 
+# unread counter change when one notification is deleted (public ones stop counting for every user)
+def _unread_delta(notification):
+    if notification.is_public:
+        counters.remove_public(notification.id)
+    elif notification.read_at is None:
+        counters.add_unread(notification.recipient_id, -1)
+
+# delete one notification by admin
+def delete_notification(db: Session, notification_id:int):
+    notification = _find_notification(db, notification_id)
+
     if not notification:
         raise HTTPException(status_code=404, detail="notification not found!")
 
@@ -119,6 +223,7 @@ def delete_notification(db: Session, notification_id:int):
 
     db.delete(notification)
     db.commit()
+    _unread_delta(notification)
 
     return "notification successfully deleted!"
 
@@ -130,39 +235,59 @@ def delete_user_notifications(db: Session, user_id:int):
         db.delete(notification)
 
     db.commit()
+    counters.drop(user_id)
 
     return None
 
 # delete notification of one object (object_deleted)
 def delete_object_notification(db: Session, object_type:str, object_id:int):
-    notification = db.query(models.Notification).filter(models.Notification.object_type == object_type, models.Notification.object_id == object_id).first()
+    # user_created and post_created notifications are public broadcasts
+    notification = (
+        db.query(models.PublicNotification)
+        .filter(models.PublicNotification.object_type == object_type, models.PublicNotification.object_id == object_id)
+        .first()
+    ) or (
+        db.query(models.Notification)
+        .filter(models.Notification.object_type == object_type, models.Notification.object_id == object_id)
+        .first()
+    )
+    if not notification:
+        return None
 
     db.delete(notification)
     db.commit()
+    _unread_delta(notification)
 
     return notification
 
+# private comment notifications the user acted in (latest actor, or one of the recent actors of a coalesced row)
+def get_actor_notifications(db: Session, user_id: int):
+    return (
+        db.query(models.Notification)
+        .filter(
+            models.Notification.type == "comment_created",
+            or_(
+                models.Notification.actor_id == user_id,
+                cast(models.Notification.actors, JSONB).contains([{"id": user_id}]),
+            ),
+        )
+        .all()
+    )
+
 # update nickname for all user notifications (user_updated)
 def update_actor_nickname(db: Session, user_id:int, nickname:str):
-    db.query(models.Notification).filter(
-        models.Notification.type == "user_created",
-        models.Notification.actor_id == user_id
-    ).update(
-        {models.Notification.payload: {"message": f"{nickname} joined us!"}},
-        synchronize_session=False)
-
-    db.query(models.Notification).filter(
-        models.Notification.type == "post_created",
-        models.Notification.actor_id == user_id
+    db.query(models.PublicNotification).filter(
+        models.PublicNotification.type == "user_created",
+        models.PublicNotification.actor_id == user_id
     ).update(
-        {models.Notification.payload: {"message": f"{nickname} recently posted!"}},
+        {models.PublicNotification.payload: {"message": f"{nickname} joined us!"}},
         synchronize_session=False)
 
-    db.query(models.Notification).filter(
-        models.Notification.type == "comment_created",
-        models.Notification.actor_id == user_id
+    db.query(models.PublicNotification).filter(
+        models.PublicNotification.type == "post_created",
+        models.PublicNotification.actor_id == user_id
     ).update(
-        {models.Notification.payload: {"message": f"{nickname} replied on your comment!"}},
+        {models.PublicNotification.payload: {"message": f"{nickname} recently posted!"}},
         synchronize_session=False)
 
     db.commit()
@@ -171,11 +296,7 @@ def update_actor_nickname(db: Session, user_id:int, nickname:str):
 
 # update one notification by admin
 def update_notification(db: Session, notification_id: int, actor_id: int, message: str):
-    notification = (
-        db.query(models.Notification)
-        .filter(models.Notification.id == notification_id)
-        .first()
-    )
+    notification = _find_notification(db, notification_id)
 
     if not notification:
         raise HTTPException(
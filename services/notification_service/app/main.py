@@ -7,13 +7,20 @@ import redis.asyncio as redis
 import asyncio
 
 from .events.consumer import consume_user_events, consume_post_events, consume_comment_events
-from . import models, database
+from .events.runtime import stop_consumers
+from .services.expiry_service import sweep_forever
+from . import models, database, migrations, counters
 from .routers import notifications
 
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
 
 models.Base.metadata.create_all(bind=database.engine)
+migrations.upgrade(database.engine)
+
+# live public notifications are counted from a redis set, filled from the database on every startup
+with database.SessionLocal() as db:
+    counters.sync_public(db)
 
 # FastAPI app config
 app = FastAPI(title="Notification Service",docs_url=None,swagger_ui_oauth2_redirect_url=None)
@@ -51,4 +58,12 @@ async def startup_event():
     await ensure_groups()
     asyncio.create_task(consume_user_events())
     asyncio.create_task(consume_post_events())
-    asyncio.create_task(consume_comment_events())
\ No newline at end of file
+    asyncio.create_task(consume_comment_events())
+
+    # expired notifications sweeper
+    asyncio.create_task(sweep_forever())
+
+# stop consumers and let in-flight event batches finish before exit
+@app.on_event("shutdown")
+async def shutdown_event():
+    await stop_consumers()
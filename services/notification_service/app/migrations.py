@@ -0,0 +1,45 @@
+from sqlalchemy import text
+from datetime import datetime, timezone
+
+from . import partitions
+
+
+""" schema upgrades for existing databases (create_all only creates missing tables) """
+
+
+# one-time data moves, run only on the startup that converts their table to a partitioned one
+# (databases from before partitioning, later ones never hold such rows)
+ON_CONVERT = {
+    "notifications": [
+        # public rows written before public_notifications existed move out of the private inbox table
+        """
+        WITH moved AS (
+            DELETE FROM notifications WHERE is_public
+            RETURNING id, actor_id, type, object_type, object_id, created_at, expires_at, payload
+        )
+        INSERT INTO public_notifications (id, actor_id, type, object_type, object_id, created_at, expires_at, payload)
+        SELECT id, actor_id, type, object_type, object_id, created_at, expires_at, payload FROM moved
+        """,
+    ],
+}
+
+# idempotent statements, run in order on every startup
+UPGRADES = [
+    "ALTER TABLE notifications ADD COLUMN IF NOT EXISTS group_key VARCHAR",
+    "ALTER TABLE notifications ADD COLUMN IF NOT EXISTS actor_count INTEGER NOT NULL DEFAULT 1",
+    "ALTER TABLE notifications ADD COLUMN IF NOT EXISTS actors JSON",
+    "CREATE INDEX IF NOT EXISTS ix_notifications_recipient_group ON notifications (recipient_id, group_key, created_at)",
+]
+
+# apply every upgrade in one transaction (tables are partitioned and have partitions before rows are moved)
+def upgrade(engine):
+    with engine.begin() as connection:
+        converted = [table.name for table in partitions.PARTITIONED_TABLES if partitions.convert_table(connection, table)]
+        partitions.ensure_partitions(connection, datetime.now(timezone.utc).date())
+
+        for name in converted:
+            for statement in ON_CONVERT.get(name, []):
+                connection.execute(text(statement))
+
+        for statement in UPGRADES:
+            connection.execute(text(statement))
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, Boolean, Integer, Index, JSON
+from sqlalchemy import Column, String, DateTime, Boolean, Integer, Index, JSON, Sequence
 from sqlalchemy.dialects.postgresql import UUID as PG_UUID
 from datetime import datetime, timezone
 import uuid
@@ -9,11 +9,14 @@ from .database import Base
 """ Notification models """
 
 
-# notification base model (public and private)
+# one id sequence for private and public notifications, so a notification id is unique across both tables
+notification_id_seq = Sequence("notifications_id_seq")
+
+# private notification model (recipient inbox), range partitioned by day on created_at
 class Notification(Base):
     __tablename__ = "notifications"
 
-    id = Column(Integer, primary_key=True, autoincrement=True)
+    id = Column(Integer, notification_id_seq, primary_key=True)
 
     recipient_id = Column(Integer, nullable=True, index=True)
     actor_id = Column(Integer, nullable=True)
@@ -25,16 +28,58 @@ class Notification(Base):
 
     read_at = Column(DateTime(timezone=True), nullable=True)
 
-    created_at = Column(DateTime(timezone=True), nullable=False,default=lambda: datetime.now(timezone.utc))
+    # partition key, so part of the primary key
+    created_at = Column(DateTime(timezone=True), primary_key=True, nullable=False,default=lambda: datetime.now(timezone.utc))
     expires_at = Column(DateTime(timezone=True), nullable=True, index=True)
 
     payload = Column(JSON, nullable=True)
 
     is_public = Column(Boolean, nullable=False, default=False)
 
+    # coalesced notifications: what they are grouped on, how many actors and the most recent ones
+    group_key = Column(String, nullable=True)
+    actor_count = Column(Integer, nullable=False, default=1, server_default="1")
+    actors = Column(JSON, nullable=True)
+
     __table_args__ = (
         Index("ix_notifications_recipient_created", "recipient_id", "created_at"),
+        Index("ix_notifications_recipient_group", "recipient_id", "group_key", "created_at"),
         Index("ix_notifications_recipient_read", "recipient_id", "read_at"),
         Index("ix_notifications_type", "type"),
         Index("ix_notifications_object", "object_type", "object_id"),
-    )
\ No newline at end of file
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+
+# public broadcast notification model (shown to every user, merged with the private inbox on read), partitioned like notifications
+class PublicNotification(Base):
+    __tablename__ = "public_notifications"
+
+    id = Column(Integer, notification_id_seq, primary_key=True)
+
+    actor_id = Column(Integer, nullable=True)
+
+    type = Column(String, nullable=False)
+
+    object_type = Column(String, nullable=True)
+    object_id = Column(Integer, nullable=True)
+
+    # partition key, so part of the primary key
+    created_at = Column(DateTime(timezone=True), primary_key=True, nullable=False,default=lambda: datetime.now(timezone.utc))
+    expires_at = Column(DateTime(timezone=True), nullable=True, index=True)
+
+    payload = Column(JSON, nullable=True)
+
+    # same shape as private notifications in responses
+    recipient_id = None
+    read_at = None
+    is_public = True
+    actor_count = 1
+    actors = None
+    group_key = None
+
+    __table_args__ = (
+        Index("ix_public_notifications_created", "created_at"),
+        Index("ix_public_notifications_type", "type"),
+        Index("ix_public_notifications_object", "object_type", "object_id"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
@@ -0,0 +1,91 @@
+from sqlalchemy import text
+from decouple import config
+from datetime import date, timedelta
+import re
+
+from . import models
+
+
+""" daily range partitions of notification tables on created_at """
+
+
+# days of partitions created ahead of today (rows out of every range land in the default partition)
+NOTIFICATION_PARTITIONS_AHEAD = config("NOTIFICATION_PARTITIONS_AHEAD", default=7, cast=int)
+
+PARTITIONED_TABLES = [models.Notification.__table__, models.PublicNotification.__table__]
+
+# <table>_pYYYYMMDD holds rows created on that day
+PARTITION_NAME = "{}_p{:%Y%m%d}"
+PARTITION_DAY = re.compile(r"_p(\d{8})$")
+
+
+# day partition name of one table
+def partition_name(table_name: str, day: date):
+    return PARTITION_NAME.format(table_name, day)
+
+# day of a partition name, None for the default partition
+def partition_day(name: str):
+    match = PARTITION_DAY.search(name)
+    if not match:
+        return None
+    return date(int(match[1][:4]), int(match[1][4:6]), int(match[1][6:]))
+
+# rebuild a plain (pre partitioning) table as a partitioned one, existing rows go to the default partition
+# returns whether the table was converted (only once per database)
+def convert_table(connection, table):
+    relkind = connection.execute(
+        text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:name)"), {"name": table.name}
+    ).scalar()
+    if relkind != "r":
+        return False
+
+    old_name = f"{table.name}_unpartitioned"
+    connection.execute(text(f"ALTER TABLE {table.name} RENAME TO {old_name}"))
+
+    # the shared id sequence must survive the old table, index and constraint names must be free for the new one
+    connection.execute(text("ALTER SEQUENCE IF EXISTS notifications_id_seq OWNED BY NONE"))
+    connection.execute(text(f"ALTER TABLE {old_name} DROP CONSTRAINT IF EXISTS {table.name}_pkey"))
+    for index in table.indexes:
+        connection.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+
+    table.create(connection, checkfirst=True)
+    connection.execute(text(f"CREATE TABLE {table.name}_default PARTITION OF {table.name} DEFAULT"))
+
+    # columns added to the model later are left to their defaults
+    existing = set(connection.execute(
+        text("SELECT column_name FROM information_schema.columns WHERE table_name = :name"), {"name": old_name}
+    ).scalars())
+    columns = ", ".join(column.name for column in table.columns if column.name in existing)
+    connection.execute(text(f"INSERT INTO {table.name} ({columns}) SELECT {columns} FROM {old_name}"))
+    connection.execute(text(f"DROP TABLE {old_name}"))
+    print(f"{table.name} converted to a partitioned table")
+    return True
+
+# default partition and day partitions (utc days) from today to NOTIFICATION_PARTITIONS_AHEAD days ahead
+def ensure_partitions(connection, today: date):
+    for table in PARTITIONED_TABLES:
+        connection.execute(text(f"CREATE TABLE IF NOT EXISTS {table.name}_default PARTITION OF {table.name} DEFAULT"))
+
+        for offset in range(NOTIFICATION_PARTITIONS_AHEAD + 1):
+            day = today + timedelta(days=offset)
+            try:
+                with connection.begin_nested():
+                    connection.execute(text(
+                        f"CREATE TABLE IF NOT EXISTS {partition_name(table.name, day)} PARTITION OF {table.name} "
+                        f"FOR VALUES FROM ('{day} 00:00+00') TO ('{day + timedelta(days=1)} 00:00+00')"
+                    ))
+            except Exception as e:
+                # rows of that day already sit in the default partition, they stay there until they expire
+                print(f"partition {partition_name(table.name, day)} not created:", e)
+
+# day partitions of one table, oldest first
+def day_partitions(connection, table):
+    names = connection.execute(text(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE parent.relname = :name"
+    ), {"name": table.name}).scalars().all()
+
+    partitions = [(partition_day(name), name) for name in names]
+    return sorted((day, name) for day, name in partitions if day is not None)
@@ -0,0 +1,158 @@
+from starlette.concurrency import run_in_threadpool
+from redis.exceptions import RedisError
+from decouple import config
+import redis.asyncio as redis
+import asyncio
+import json
+
+from . import schemas, database
+from .crud import notifications
+
+
+""" real-time notification push over redis pub/sub (server-sent events) """
+
+
+# seconds between sse heartbeats and max undelivered notifications per connection before it is closed
+PUSH_HEARTBEAT = config("PUSH_HEARTBEAT", default=15, cast=int)
+PUSH_QUEUE_SIZE = config("PUSH_QUEUE_SIZE", default=100, cast=int)
+
+# max missed notifications sent on resume
+PUSH_REPLAY_LIMIT = config("PUSH_REPLAY_LIMIT", default=100, cast=int)
+
+# pub/sub channels (one per recipient, one for public broadcasts)
+USER_CHANNEL = "notifications:push:user:{}"
+PUBLIC_CHANNEL = "notifications:push:public"
+CHANNEL_PATTERN = "notifications:push:*"
+
+
+r = redis.Redis(host=config("HOST"), port=config("PORT"), decode_responses=True)
+
+# channel and json body of one created notification (built before the session goes away)
+def message(notification):
+    data = schemas.NotificationSchema.model_validate(notification).model_dump_json()
+    if notification.is_public:
+        return PUBLIC_CHANNEL, data
+    return USER_CHANNEL.format(notification.recipient_id), data
+
+# publish created notifications to every replica (a lost push is recovered by the client resume)
+async def publish(messages):
+    if not messages:
+        return
+    try:
+        pipe = r.pipeline(transaction=False)
+        for channel, data in messages:
+            pipe.publish(channel, data)
+        await pipe.execute()
+    except RedisError as e:
+        print("Notification push error:", e)
+
+# one sse connection: bounded queue of pushed notifications, closed when the client does not keep up
+class Listener:
+    def __init__(self, user_id: int):
+        self.user_id = user_id
+        self.queue = asyncio.Queue(maxsize=PUSH_QUEUE_SIZE)
+        self.overflowed = False
+
+    def put(self, notification):
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(notification)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+# one pattern subscription per process, dispatching pushed notifications to local connections
+class PushHub:
+    def __init__(self):
+        self.listeners = {}
+        self.task = None
+
+    def add(self, listener: Listener):
+        self.listeners.setdefault(listener.user_id, set()).add(listener)
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.run())
+
+    def remove(self, listener: Listener):
+        listeners = self.listeners.get(listener.user_id)
+        if listeners is None:
+            return
+        listeners.discard(listener)
+        if not listeners:
+            del self.listeners[listener.user_id]
+
+    def dispatch(self, channel: str, data: str):
+        notification = json.loads(data)
+
+        if channel == PUBLIC_CHANNEL:
+            targets = [listener for listeners in self.listeners.values() for listener in listeners]
+        else:
+            targets = self.listeners.get(int(channel.rsplit(":", 1)[1]), ())
+
+        for listener in list(targets):
+            listener.put(notification)
+
+    # read the pattern subscription while anyone is connected, resubscribe after redis errors
+    async def run(self):
+        while self.listeners:
+            pubsub = r.pubsub()
+            try:
+                await pubsub.psubscribe(CHANNEL_PATTERN)
+                while self.listeners:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if message is not None:
+                        self.dispatch(message["channel"], message["data"])
+            except RedisError as e:
+                print("Notification push subscription error:", e)
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+
+hub = PushHub()
+
+# sse frame of one notification (the id lets clients resume with Last-Event-ID)
+def event(notification: dict):
+    return f"id: {notification['id']}\nevent: notification\ndata: {json.dumps(notification)}\n\n"
+
+# notifications of one user created after last_id, loaded in the threadpool
+async def replay(user_id: int, last_id: int):
+    def load():
+        with database.SessionLocal() as db:
+            items, truncated = notifications.get_notifications_after(db, user_id, last_id, PUSH_REPLAY_LIMIT)
+            return [schemas.NotificationSchema.model_validate(item).model_dump(mode="json") for item in items], truncated
+    return await run_in_threadpool(load)
+
+# sse stream of one user: missed notifications after last_id (replay), then live pushes, heartbeats while idle
+async def stream(user_id: int, last_id, is_disconnected):
+    listener = Listener(user_id)
+
+    # listen before replaying so nothing created in between is lost, duplicates are skipped by id
+    hub.add(listener)
+    replayed = set()
+    try:
+        if last_id is not None:
+            missed, truncated = await replay(user_id, last_id)
+            if truncated:
+                # more was missed than one replay holds, the client reloads its notification list
+                yield "event: reset\ndata: {}\n\n"
+            for notification in missed:
+                yield event(notification)
+                replayed.add(notification["id"])
+
+        while not await is_disconnected():
+            if listener.overflowed:
+                # the client is too slow, it reconnects with Last-Event-ID and gets the rest from the replay
+                yield "event: overflow\ndata: {}\n\n"
+                return
+
+            try:
+                notification = await asyncio.wait_for(listener.queue.get(), timeout=PUSH_HEARTBEAT)
+            except asyncio.TimeoutError:
+                yield ": heartbeat\n\n"
+                continue
+
+            if notification["id"] in replayed:
+                continue
+            yield event(notification)
+    finally:
+        hub.remove(listener)
@@ -1,8 +1,11 @@
-from fastapi import FastAPI, Depends, HTTPException, APIRouter, status, Query
+from fastapi import FastAPI, Depends, HTTPException, APIRouter, status, Query, Header, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
+from typing import Optional
 
-from .. import schemas, database, dependencies
+from .. import schemas, database, dependencies, counters, push
 from ..crud import notifications
+from ..services import expiry_service
 
 
 """ comments routers """
@@ -18,7 +21,7 @@ def read_notifications(
     db: Session = Depends(database.get_db),
     user=Depends(dependencies.get_current_user),
 ):
-    items, total = notifications.get_notifications(
+    items, has_more = notifications.get_notifications(
         db=db,
         user_id=user["user_id"],
         skip=skip,
@@ -28,12 +31,21 @@ def read_notifications(
     return {
         "items": items,
         "meta": {
-            "total": total,
             "skip": skip,
             "limit": limit,
+            "has_more": has_more,
         },
     }
 
+# get my unread notifications count from redis counters
+@router.get("/notifications/unread_count", dependencies=[Depends(dependencies.get_current_user)], response_model=schemas.UnreadCountResponse)
+def read_unread_count(
+    db: Session = Depends(database.get_db),
+    user=Depends(dependencies.get_current_user),
+):
+    unread = counters.unread(db, user["user_id"])
+    return {**unread, "total": unread["private"] + unread["public"]}
+
 # get admin all private and public notifications paginated list
 @router.get("/admin/notifications/", dependencies=[Depends(dependencies.admin_required)], response_model=schemas.PaginatedNotificationResponse)
 def read_admin_notifications(
@@ -58,6 +70,28 @@ def read_admin_notifications(
         },
     }
 
+# stream my new notifications as server-sent events (reconnects resume after Last-Event-ID)
+@router.get("/notifications/stream")
+async def stream_notifications(
+    request: Request,
+    last_event_id: Optional[int] = Header(None),
+    user=Depends(dependencies.get_current_user),
+):
+    return StreamingResponse(
+        push.stream(user["user_id"], last_event_id, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# delete expired notifications now and report removed rows and partitions (internal only)
+@router.post("/notifications/sweep", dependencies=[Depends(dependencies.internal_service_required)])
+async def sweep_expired_notifications():
+    report = await expiry_service.run_sweep()
+    if report is None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                            detail="sweep already running")
+    return report
+
 # get one notification by owner
 @router.get("/notifications/{notification_id}", dependencies=[Depends(dependencies.get_current_user)], response_model=schemas.NotificationSchema)
 def read_notification(
@@ -71,9 +105,9 @@ def read_notification(
 
 # create notification by admin
 @router.post("/admin/notifications/", dependencies=[Depends(dependencies.admin_required)], response_model=schemas.NotificationSchema)
-def create_notification_by_admin(
+async def create_notification_by_admin(
     notif: schemas.CreateNotificationInput,
-    db: Session = Depends(database.get_db),
+    db: Session = Depends(database.get_async_db),
     user=Depends(dependencies.get_current_user)
 ):
     admin_id = user["user_id"]
@@ -90,10 +124,13 @@ def create_notification_by_admin(
     )
 
     try:
-        return notifications.create_notification(db, notification)
+        db_notification = await database.run_db(db, notifications.create_notification, notification)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+    await push.publish([push.message(db_notification)])
+    return db_notification
+
 # update notification by admin
 @router.patch("/admin/notifications/{notification_id}/", dependencies=[Depends(dependencies.admin_required)], response_model=schemas.NotificationSchema)
 def update_notification_by_admin(
@@ -48,16 +48,27 @@ class NotificationSchema(BaseModel):
     expires_at: datetime
     payload: Optional[Any] = None
     is_public: bool
+    actor_count: int = 1
+    actors: Optional[list[Any]] = None
+    # coalesced notifications: a newer notification of the same group replaces the older one
+    group_key: Optional[str] = None
 
     model_config = ConfigDict(from_attributes=True)
 
-# pagination meta schema (meta)
+# pagination meta schema (meta), user pages report has_more instead of a total
 class MetaSchema(BaseModel):
-    total: int
+    total: Optional[int] = None
     skip: int
     limit: int
+    has_more: Optional[bool] = None
 
 # pagination notification schema (output)
 class PaginatedNotificationResponse(BaseModel):
     items: list[NotificationSchema]
     meta: MetaSchema
+
+# unread notifications counters (output)
+class UnreadCountResponse(BaseModel):
+    private: int
+    public: int
+    total: int
@@ -0,0 +1,139 @@
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import text, select, delete, tuple_
+from decouple import config
+from datetime import datetime, timezone
+from collections import Counter
+import redis.asyncio as redis
+import asyncio
+
+from .. import partitions, counters, models
+from ..database import engine
+
+
+""" expired notifications sweeper """
+
+
+# seconds between sweeps, rows per delete batch and max delete batches per table and sweep
+NOTIFICATION_SWEEP_INTERVAL = config("NOTIFICATION_SWEEP_INTERVAL", default=60, cast=int)
+NOTIFICATION_SWEEP_BATCH = config("NOTIFICATION_SWEEP_BATCH", default=1000, cast=int)
+NOTIFICATION_SWEEP_MAX_BATCHES = config("NOTIFICATION_SWEEP_MAX_BATCHES", default=100, cast=int)
+
+# only one notification_service replica sweeps at a time
+LOCK_KEY = "notifications:sweep_lock"
+
+
+r = redis.Redis(host=config("HOST"), port=config("PORT"), decode_responses=True)
+
+# expired unread private notifications no longer count as unread
+def _forget_unread(rows):
+    for recipient_id, count in Counter(rows).items():
+        counters.add_unread(recipient_id, -count)
+
+# drop past day partitions whose rows are all expired, return (dropped partition names, dropped rows)
+def drop_expired_partitions(now: datetime):
+    dropped, dropped_rows = [], 0
+
+    for table in partitions.PARTITIONED_TABLES:
+        with engine.connect() as connection:
+            day_partitions = partitions.day_partitions(connection, table)
+
+        for day, name in day_partitions:
+            if day >= now.date():
+                break
+
+            with engine.begin() as connection:
+                alive = connection.execute(
+                    text(f"SELECT EXISTS (SELECT 1 FROM {name} WHERE expires_at IS NULL OR expires_at > :now)"),
+                    {"now": now}
+                ).scalar()
+                if alive:
+                    continue
+
+                unread, public = [], []
+                if table is models.Notification.__table__:
+                    unread = connection.execute(
+                        text(f"SELECT recipient_id FROM {name} WHERE read_at IS NULL")
+                    ).scalars().all()
+                else:
+                    public = connection.execute(text(f"SELECT id FROM {name}")).scalars().all()
+
+                dropped_rows += connection.execute(text(f"SELECT count(*) FROM {name}")).scalar()
+                connection.execute(text(f"DROP TABLE {name}"))
+
+            _forget_unread(unread)
+            counters.remove_public(*public)
+            dropped.append(name)
+
+    return dropped, dropped_rows
+
+# delete expired rows left in kept partitions (default partition, partitions with unexpired rows) in bounded batches
+def delete_expired_rows(now: datetime):
+    deleted = 0
+
+    for table in partitions.PARTITIONED_TABLES:
+        private = table is models.Notification.__table__
+        returning = [table.c.recipient_id, table.c.read_at] if private else [table.c.id]
+
+        for _ in range(NOTIFICATION_SWEEP_MAX_BATCHES):
+            expired = (
+                select(table.c.id, table.c.created_at)
+                .where(table.c.expires_at <= now)
+                .limit(NOTIFICATION_SWEEP_BATCH)
+            )
+
+            with engine.begin() as connection:
+                rows = connection.execute(
+                    delete(table)
+                    .where(tuple_(table.c.id, table.c.created_at).in_(expired))
+                    .returning(*returning)
+                ).all()
+
+            if private:
+                _forget_unread(row.recipient_id for row in rows if row.read_at is None)
+            else:
+                counters.remove_public(*(row.id for row in rows))
+
+            deleted += len(rows)
+            if len(rows) < NOTIFICATION_SWEEP_BATCH:
+                break
+
+    return deleted
+
+# one sweep: new partitions ahead, expired partitions dropped, remaining expired rows deleted
+def sweep():
+    now = datetime.now(timezone.utc)
+
+    with engine.begin() as connection:
+        partitions.ensure_partitions(connection, now.date())
+
+    dropped, dropped_rows = drop_expired_partitions(now)
+    deleted_rows = delete_expired_rows(now)
+
+    return {
+        "deleted_rows": deleted_rows,
+        "dropped_partitions": dropped,
+        "dropped_partition_rows": dropped_rows,
+    }
+
+# one sweep in the threadpool, skipped when another replica holds the lock
+async def run_sweep():
+    if not await r.set(LOCK_KEY, 1, nx=True, ex=max(NOTIFICATION_SWEEP_INTERVAL, 60)):
+        return None
+
+    try:
+        report = await run_in_threadpool(sweep)
+    finally:
+        await r.delete(LOCK_KEY)
+
+    if report["deleted_rows"] or report["dropped_partitions"]:
+        print(f"expired notifications swept: {report}")
+    return report
+
+# sweep on startup and then every NOTIFICATION_SWEEP_INTERVAL seconds
+async def sweep_forever():
+    while True:
+        try:
+            await run_sweep()
+        except Exception as e:
+            print("notification sweeper error:", e)
+        await asyncio.sleep(NOTIFICATION_SWEEP_INTERVAL)
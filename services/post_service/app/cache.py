@@ -0,0 +1,125 @@
+from decouple import config
+from typing import Optional, Tuple
+import redis.asyncio as aioredis
+import time
+import redis
+
+from . import schemas
+
+
+""" read-through redis cache for single posts """
+
+
+# cache ttl (seconds) and max cached posts before least recently used ones are evicted
+POST_CACHE_TTL = config("POST_CACHE_TTL", default=300, cast=int)
+POST_CACHE_MAX_ENTRIES = config("POST_CACHE_MAX_ENTRIES", default=10000, cast=int)
+
+# cache keys (version of a post bumped by every invalidation, kept POST_CACHE_TTL seconds)
+POST_KEY = "post_cache:post:{}"
+VERSION_KEY = "post_cache:version:{}"
+INDEX_KEY = "post_cache:index"
+HITS_KEY = "post_cache:hits"
+MISSES_KEY = "post_cache:misses"
+
+# session.info key of posts changed in the session, invalidated once the transaction really commits
+STALE_KEY = "stale_posts"
+
+
+r = redis.Redis(host=config("HOST"), port=config("PORT"), decode_responses=True)
+
+# invalidation runs from async code after commit (never inside run_sync on the event loop)
+ar = aioredis.Redis(host=config("HOST"), port=config("PORT"), decode_responses=True)
+
+# cache one post only while its version is still the one read before loading it, return cached posts count (0 when skipped)
+_fill = r.register_script("""
+if (redis.call('GET', KEYS[2]) or '') ~= ARGV[1] then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+redis.call('ZADD', KEYS[3], ARGV[4], ARGV[5])
+return redis.call('ZCARD', KEYS[3])
+""")
+
+# return (cached post or None, post version) (redis errors fall back to the database and skip the fill)
+# on a miss the version is read before the database load, set_post compares it to catch invalidations in between
+def get_post(post_id: int) -> Tuple[Optional[schemas.PostResponse], Optional[str]]:
+    try:
+        raw = r.get(POST_KEY.format(post_id))
+
+        pipe = r.pipeline(transaction=False)
+        if raw is None:
+            pipe.incr(MISSES_KEY)
+            pipe.get(VERSION_KEY.format(post_id))
+        else:
+            pipe.incr(HITS_KEY)
+            pipe.zadd(INDEX_KEY, {post_id: time.time()}, xx=True)
+        results = pipe.execute()
+    except redis.RedisError as e:
+        print("Post cache error:", e)
+        return None, None
+
+    if raw is None:
+        return None, results[1] or ""
+    return schemas.PostResponse.model_validate_json(raw), None
+
+# cache one post loaded after get_post returned `version` and evict least recently used posts above POST_CACHE_MAX_ENTRIES
+# skipped when the post was invalidated meanwhile (the load may have read it before the change committed)
+def set_post(db_post, version: Optional[str]):
+    if version is None:
+        return
+    data = schemas.PostResponse.model_validate(db_post).model_dump_json()
+
+    try:
+        size = _fill(
+            keys=[POST_KEY.format(db_post.id), VERSION_KEY.format(db_post.id), INDEX_KEY],
+            args=[version, data, POST_CACHE_TTL, time.time(), db_post.id]
+        )
+
+        if size > POST_CACHE_MAX_ENTRIES:
+            evicted = r.zpopmin(INDEX_KEY, size - POST_CACHE_MAX_ENTRIES)
+            if evicted:
+                r.delete(*(POST_KEY.format(post_id) for post_id, _ in evicted))
+    except redis.RedisError as e:
+        print("Post cache error:", e)
+
+# remember posts changed by crud in this session (crud commits may only release a savepoint of a stream batch)
+def mark_stale(db, *post_ids: int):
+    db.info.setdefault(STALE_KEY, set()).update(post_ids)
+
+# after-commit work dropping every post marked stale in the session so far (await it once the transaction committed)
+def after_commit(db):
+    return invalidate(*db.info.pop(STALE_KEY, ()))
+
+# drop cached posts after update or delete
+async def invalidate(*post_ids: int):
+    if not post_ids:
+        return
+    try:
+        pipe = ar.pipeline(transaction=False)
+        pipe.delete(*(POST_KEY.format(post_id) for post_id in post_ids))
+        pipe.zrem(INDEX_KEY, *post_ids)
+        for post_id in post_ids:
+            pipe.incr(VERSION_KEY.format(post_id))
+            pipe.expire(VERSION_KEY.format(post_id), POST_CACHE_TTL)
+        await pipe.execute()
+    except aioredis.RedisError as e:
+        print("Post cache error:", e)
+
+# cache hit/miss counters and size
+def stats():
+    pipe = r.pipeline(transaction=False)
+    pipe.get(HITS_KEY)
+    pipe.get(MISSES_KEY)
+    pipe.zcard(INDEX_KEY)
+    hits, misses, entries = pipe.execute()
+
+    hits, misses = int(hits or 0), int(misses or 0)
+    total = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": round(hits / total, 4) if total else 0.0,
+        "entries": entries,
+        "max_entries": POST_CACHE_MAX_ENTRIES,
+        "ttl": POST_CACHE_TTL,
+    }
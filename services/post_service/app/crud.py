@@ -1,30 +1,72 @@
 from fastapi import HTTPException, status
+from sqlalchemy import tuple_, func, values, column, or_, Integer
 from sqlalchemy.orm import Session
+from datetime import datetime
 
-from . import models, schemas
+from . import models, schemas, pagination, cache
 
 
 """ posts crud """
 
 
-# return limited list from all posts
-def get_posts(db: Session, skip: int = 0, limit: int = 10):
-    return db.query(models.Post).offset(skip).limit(limit).all()
+# return one page of posts (newest first) and the cursor of the next page
+def get_posts(db: Session, cursor: str = None, limit: int = 10):
+    return _paginate(db.query(models.Post), cursor, limit)
 
-# return limited list from all of my posts
-def get_my_posts(db: Session, owner_id: int, skip: int = 0, limit: int = 10):
-    return (
-        db.query(models.Post)
-        .filter(models.Post.owner_id == owner_id)
-        .offset(skip)
-        .limit(limit)
+# return one page of my posts (newest first) and the cursor of the next page
+def get_my_posts(db: Session, owner_id: int, cursor: str = None, limit: int = 10):
+    query = db.query(models.Post).filter(models.Post.owner_id == owner_id)
+    return _paginate(query, cursor, limit)
+
+# keyset pagination on (created_at, id): every page is one index range scan, however deep it is
+def _paginate(query, cursor: str, limit: int):
+    if cursor:
+        created_at, post_id = pagination.decode_cursor(cursor)
+        query = query.filter(
+            tuple_(models.Post.created_at, models.Post.id) < tuple_(created_at, post_id)
+        )
+
+    posts = (
+        query.order_by(models.Post.created_at.desc(), models.Post.id.desc())
+        .limit(limit + 1)
         .all()
     )
 
+    next_cursor = None
+    if len(posts) > limit:
+        posts = posts[:limit]
+        next_cursor = pagination.encode_cursor(posts[-1].created_at, posts[-1].id)
+
+    return posts, next_cursor
+
 # return one post by id
 def get_post(db: Session, post_id: int):
     return db.query(models.Post).filter(models.Post.id == post_id).first()
 
+# return many posts by id in one query, in the given ids order (missing posts are skipped)
+def get_posts_by_ids(db: Session, post_ids: list[int]):
+    if not post_ids:
+        return []
+    posts = {post.id: post for post in db.query(models.Post).filter(models.Post.id.in_(post_ids))}
+    return [posts[post_id] for post_id in post_ids if post_id in posts]
+
+# return newest post ids of one user
+def get_user_post_ids(db: Session, owner_id: int, limit: int):
+    rows = (
+        db.query(models.Post.id)
+        .filter(models.Post.owner_id == owner_id)
+        .order_by(models.Post.id.desc())
+        .limit(limit)
+    )
+    return [post_id for (post_id,) in rows]
+
+# return newest post ids of many users older than before (post id)
+def get_owners_post_ids(db: Session, owner_ids, before: int = None, limit: int = 10):
+    query = db.query(models.Post.id).filter(models.Post.owner_id.in_(list(owner_ids)))
+    if before:
+        query = query.filter(models.Post.id < before)
+    return [post_id for (post_id,) in query.order_by(models.Post.id.desc()).limit(limit)]
+
 # create one post and commit it to db
 def create_post(db: Session, post: schemas.PostCreate, owner_id:int, nickname:str):
     db_post = models.Post(
@@ -49,14 +91,18 @@ def update_post(db: Session, post_id: int, patch: schemas.PostUpdate):
     for field, value in patch.dict(exclude_unset=True).items():
         setattr(db_post, field, value)
 
+    cache.mark_stale(db, post_id)
     db.commit()
     db.refresh(db_post)
     return db_post
 
 # update user posts nickname
 def update_posts_nickname(db: Session, user_id: int, new_nickname: str):
+    post_ids = [post_id for (post_id,) in db.query(models.Post.id).filter(models.Post.owner_id == user_id)]
+
     db_post = db.query(models.Post).filter(models.Post.owner_id == user_id).update({"owner_nickname": new_nickname},synchronize_session="fetch")
 
+    cache.mark_stale(db, *post_ids)
     db.commit()
     return db_post
 
@@ -66,6 +112,7 @@ def delete_post(db: Session, post_id: int):
     if not db_post:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="post not found")
     db.delete(db_post)
+    cache.mark_stale(db, post_id)
     db.commit()
     return "post successfully deleted"
 
@@ -79,6 +126,127 @@ def delete_user_posts(db: Session, user_id: int):
         deleted_posts.append(post)
         db.delete(post)
 
+    cache.mark_stale(db, *(post.id for post in deleted_posts))
     db.commit()
 
     return deleted_posts
+
+
+""" comment counters crud """
+
+
+# add delta to one post comment_count (never below zero) in one atomic update
+def add_comment_count(db: Session, post_id: int, delta: int):
+    updated = db.query(models.Post).filter(models.Post.id == post_id).update(
+        {
+            models.Post.comment_count: func.greatest(models.Post.comment_count + delta, 0),
+            models.Post.comment_count_changed_at: func.now(),
+        },
+        synchronize_session=False
+    )
+
+    if updated:
+        cache.mark_stale(db, post_id)
+    db.commit()
+    return updated
+
+# overwrite comment_count of posts with id in [from_id, to_id] with authoritative counts (posts missing from counts have none)
+# posts that got a delta after changed_before are skipped, the snapshot may not include that comment yet
+def set_comment_counts(db: Session, from_id: int, to_id: int, counts: dict[int, int], changed_before: datetime):
+    changed = []
+    unchanged_since = or_(models.Post.comment_count_changed_at.is_(None), models.Post.comment_count_changed_at < changed_before)
+
+    if counts:
+        snapshot = values(
+            column("post_id", Integer), column("comment_count", Integer), name="snapshot"
+        ).data(list(counts.items()))
+
+        changed += db.execute(
+            models.Post.__table__.update()
+            .where(models.Post.id == snapshot.c.post_id, models.Post.comment_count != snapshot.c.comment_count, unchanged_since)
+            .values(comment_count=snapshot.c.comment_count)
+            .returning(models.Post.id)
+        ).scalars().all()
+
+    changed += db.execute(
+        models.Post.__table__.update()
+        .where(
+            models.Post.id.between(from_id, to_id),
+            models.Post.id.not_in(list(counts)),
+            models.Post.comment_count != 0,
+            unchanged_since
+        )
+        .values(comment_count=0)
+        .returning(models.Post.id)
+    ).scalars().all()
+
+    cache.mark_stale(db, *changed)
+    db.commit()
+    return changed
+
+
+""" follows crud """
+
+
+# follow one user
+def create_follow(db: Session, follower_id: int, followee_id: int):
+    if follower_id == followee_id:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="you can not follow yourself")
+
+    db_follow = db.get(models.Follow, (follower_id, followee_id))
+    if db_follow:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="already following")
+
+    db_follow = models.Follow(follower_id=follower_id, followee_id=followee_id)
+    db.add(db_follow)
+    db.commit()
+    return db_follow
+
+# unfollow one user
+def delete_follow(db: Session, follower_id: int, followee_id: int):
+    db_follow = db.get(models.Follow, (follower_id, followee_id))
+    if not db_follow:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="not following")
+
+    db.delete(db_follow)
+    db.commit()
+    return True
+
+# number of followers of one user
+def count_followers(db: Session, user_id: int):
+    return db.query(models.Follow).filter(models.Follow.followee_id == user_id).count()
+
+# follower ids of one user, chunk by chunk (keyset on follower_id)
+def iter_follower_ids(db: Session, user_id: int, chunk_size: int):
+    last_id = 0
+    while True:
+        rows = (
+            db.query(models.Follow.follower_id)
+            .filter(models.Follow.followee_id == user_id, models.Follow.follower_id > last_id)
+            .order_by(models.Follow.follower_id)
+            .limit(chunk_size)
+            .all()
+        )
+        if not rows:
+            return
+
+        follower_ids = [follower_id for (follower_id,) in rows]
+        yield follower_ids
+        last_id = follower_ids[-1]
+
+# which of the given users are followed by follower_id
+def get_followee_ids(db: Session, follower_id: int, user_ids):
+    rows = db.query(models.Follow.followee_id).filter(
+        models.Follow.follower_id == follower_id,
+        models.Follow.followee_id.in_(list(user_ids))
+    )
+    return [followee_id for (followee_id,) in rows]
+
+# delete every follow from or to one user
+def delete_user_follows(db: Session, user_id: int):
+    db.query(models.Follow).filter(
+        (models.Follow.follower_id == user_id) | (models.Follow.followee_id == user_id)
+    ).delete(synchronize_session=False)
+
+    db.commit()
+    return True
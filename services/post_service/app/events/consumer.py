@@ -1,112 +1,123 @@
-import redis.asyncio as redis
 from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
 from decouple import config
+import json
 
-from ..database import SessionLocal
-from ..crud import delete_user_posts, update_posts_nickname, get_post
+from ..crud import delete_user_posts, update_posts_nickname, get_post, delete_user_follows, add_comment_count, set_comment_counts
+from .. import feed, cache
 from ..schemas import NotificationInput
 from ..events.publisher import publish_post_deleted, publish_comment_created
+from .runtime import StreamConsumer, by_field
 
 
 """ real_time reading redis stream events """
 
 
-r = redis.Redis(host=config("HOST"), port=config("PORT"), decode_responses=True)
+# comment_count deltas this close before a snapshot (clock skew between comment and post databases) also protect the post from it
+COMMENT_COUNT_SNAPSHOT_MARGIN = config("COMMENT_COUNT_SNAPSHOT_MARGIN", default=60, cast=int)
 
-# this definition wait for redis stream user_events
-async def consume_user_events():
 
-    while True:
-        events = await r.xreadgroup(
-            groupname="post_group",
-            consumername="post_consumer",
-            streams={"user_events": ">"},
-            block=0
-        )
+# user_deleted: delete user posts and send post_deleted event for each deleted post after commit
+def handle_user_deleted(db: Session, data):
+    user_id = int(data["user_id"])
+
+    posts = delete_user_posts(db, user_id)
+    delete_user_follows(db, user_id)
+    feed.drop(user_id)
+    return [cache.after_commit(db)] + [publish_post_deleted(post.id) for post in posts]
+
+# user_updated: rewrite owner nickname on user posts (cached posts dropped after commit)
+def handle_user_updated(db: Session, data):
+    user_id = int(data["user_id"])
+    nickname = str(data["nickname"])
+
+    update_posts_nickname(db, user_id, nickname)
+    return [cache.after_commit(db)]
+
+# comment_created: count the comment, attach post owner to the event and forward it as comment_created_meta
+def handle_comment_created(db: Session, data):
+    comment_id = int(data["comment_id"])
+    actor_id = int(data["owner_id"])
+    nickname = str(data["nickname"])
+    post_id = int(data["post_id"])
+
+    db_post = get_post(db, post_id)
+    if not db_post:
+        return
+
+    add_comment_count(db, post_id, 1)
 
-        for stream, messages in events:
-            for message_id, data in messages:
+    db_notification = NotificationInput(
+        post_id = post_id,
+        post_owner = db_post.owner_id,
+        owner_id = actor_id,
+        owner_nickname = nickname,
+        comment_id = comment_id
+    )
 
-                if data["event"] == "user_deleted":
-                    user_id = int(data["user_id"])
+    return [cache.after_commit(db), publish_comment_created(
+        db_notification.post_id,
+        db_notification.post_owner,
+        db_notification.owner_id,
+        db_notification.owner_nickname,
+        db_notification.comment_id,
+    )]
 
-                    db: Session = SessionLocal()
-                    try:
-                        posts = delete_user_posts(db, user_id)
-                    finally:
-                        db.close()
+# reply_created: replies count as post comments too
+def handle_reply_created(db: Session, data):
+    post_id = int(data["post_id"])
 
-                    # sending event for each deleted post
-                    for post in posts:
-                        await publish_post_deleted(post.id)
+    add_comment_count(db, post_id, 1)
+    return [cache.after_commit(db)]
 
-                    # delete user_deleted event from redis steam pending list
-                    await r.xack("user_events", "post_group", message_id)
+# comment_deleted: subtract the deleted comment and its replies
+def handle_comment_deleted(db: Session, data):
+    post_id = int(data["post_id"])
+    count = int(data["count"])
 
-                if data["event"] == "user_updated":
-                    user_id = int(data["user_id"])
-                    nickname = str(data["nickname"])
+    add_comment_count(db, post_id, -count)
+    return [cache.after_commit(db)]
 
-                    db: Session = SessionLocal()
-                    try:
-                        update_posts_nickname(db, user_id, nickname)
-                    finally:
-                        db.close()
+# comment_counts_snapshot: repair comment_count drift with counts computed by comment_service
+# posts with a delta newer than the snapshot keep their count (fixed by the next snapshot if still off)
+def handle_comment_counts_snapshot(db: Session, data):
+    # snapshots of older publishers carry no computed_at and cannot be ordered against deltas
+    if "computed_at" not in data:
+        return
 
-                    # delete user_updated event from redis steam pending list
-                    await r.xack("user_events", "post_group", message_id)
+    from_post_id = int(data["from_post_id"])
+    to_post_id = int(data["to_post_id"])
+    counts = {int(post_id): int(count) for post_id, count in json.loads(data["counts"]).items()}
+    computed_at = datetime.fromisoformat(data["computed_at"])
+
+    set_comment_counts(db, from_post_id, to_post_id, counts, computed_at - timedelta(seconds=COMMENT_COUNT_SNAPSHOT_MARGIN))
+    return [cache.after_commit(db)]
+
+# post_created: push the new post id to follower feeds
+def handle_post_created(db: Session, data):
+    post_id = int(data["post_id"])
+    owner_id = int(data["owner_id"])
+
+    feed.fan_out(db, post_id, owner_id)
+
+# this definition wait for redis stream user_events
+async def consume_user_events():
+    await StreamConsumer("user_events", "post_group", "post_consumer", {
+        "user_deleted": handle_user_deleted,
+        "user_updated": handle_user_updated,
+    }, key=by_field("user_id")).run()
 
 # this definition wait for redis stream comment_events
 async def consume_comment_events():
-
-    while True:
-        events = await r.xreadgroup(
-            groupname="post_group",
-            consumername="post_consumer",
-            streams={"comment_events": ">"},
-            block=0
-        )
-
-        for stream, messages in events:
-            for message_id, data in messages:
-                print("consuming")
-                event_type = data.get("event")
-
-                db: Session = SessionLocal()
-                try:
-                    if event_type == "comment_created":
-                        comment_id = int(data["comment_id"])
-                        actor_id = int(data["owner_id"])
-                        nickname = str(data["nickname"])
-                        post_id = int(data["post_id"])
-
-                        db_post = get_post(db, post_id)
-
-                        db_notification = NotificationInput(
-                        post_id = post_id,
-                        post_owner = db_post.owner_id,
-                        owner_id = actor_id,
-                        owner_nickname = nickname,
-                        comment_id = comment_id
-                        )
-
-                        print(comment_id, actor_id, nickname, post_id, db_notification.post_owner)
-                        await publish_comment_created(
-                            db_notification.post_id,
-                            db_notification.post_owner,
-                            db_notification.owner_id,
-                            db_notification.owner_nickname,
-                            db_notification.comment_id,
-                        )
-
-                    await r.xack("comment_events", "notification_group", message_id)
-
-                except Exception as e:
-                    print("Consumer error:", e)
-                    db.rollback()
-
-                    await r.xack("comment_events", "notification_group", message_id)
-
-
-                # delete event from redis steam pending list
-                await r.xack("user_events", "post_group", message_id)
\ No newline at end of file
+    await StreamConsumer("comment_events", "post_group", "post_consumer", {
+        "comment_created": handle_comment_created,
+        "reply_created": handle_reply_created,
+        "comment_deleted": handle_comment_deleted,
+        "comment_counts_snapshot": handle_comment_counts_snapshot,
+    }, key=by_field("post_id")).run()
+
+# this definition wait for redis stream post_events (own events, feed fan-out)
+async def consume_post_events():
+    await StreamConsumer("post_events", "post_group", "post_consumer", {
+        "post_created": handle_post_created,
+    }, key=by_field("owner_id")).run()
@@ -0,0 +1,150 @@
+from sqlalchemy.orm import Session
+from fastapi import HTTPException
+from decouple import config
+from typing import Optional
+import redis
+
+from . import crud
+
+
+""" materialized home feeds (fan-out on write, fan-out on read for prolific authors) """
+
+
+# max post ids kept per feed, followers pushed per redis pipeline and posts copied into a feed on follow
+FEED_MAX_LENGTH = config("FEED_MAX_LENGTH", default=800, cast=int)
+FEED_FANOUT_CHUNK = config("FEED_FANOUT_CHUNK", default=1000, cast=int)
+FEED_BACKFILL = config("FEED_BACKFILL", default=50, cast=int)
+
+# authors above these limits stop being pushed to followers and are merged into feeds on read
+FEED_PULL_MIN_FOLLOWERS = config("FEED_PULL_MIN_FOLLOWERS", default=10000, cast=int)
+FEED_PULL_POSTS_PER_HOUR = config("FEED_PULL_POSTS_PER_HOUR", default=30, cast=int)
+
+# pull authors go back to fan-out on write under this many followers (below the pull limit, so one follow does not flap)
+FEED_PUSH_MAX_FOLLOWERS = config("FEED_PUSH_MAX_FOLLOWERS", default=8000, cast=int)
+
+# feed keys (sorted set of post ids scored by post id, newest first on read)
+FEED_KEY = "feed:{}"
+PULL_AUTHORS_KEY = "feed:pull_authors"
+POST_RATE_KEY = "feed:post_rate:{}"
+
+
+r = redis.Redis(host=config("HOST"), port=config("PORT"), decode_responses=True)
+
+# add post ids to the feeds of many users and trim every feed to FEED_MAX_LENGTH
+def push(user_ids, post_ids):
+    if not post_ids:
+        return
+
+    pipe = r.pipeline(transaction=False)
+    for user_id in user_ids:
+        key = FEED_KEY.format(user_id)
+        pipe.zadd(key, {post_id: post_id for post_id in post_ids})
+        pipe.zremrangebyrank(key, 0, -(FEED_MAX_LENGTH + 1))
+    pipe.execute()
+
+# remove post ids from one user feed
+def remove(user_id: int, post_ids):
+    if post_ids:
+        r.zrem(FEED_KEY.format(user_id), *post_ids)
+
+# drop one user feed
+def drop(user_id: int):
+    r.delete(FEED_KEY.format(user_id))
+
+# authors served by fan-out on read
+def pull_authors():
+    return {int(author_id) for author_id in r.smembers(PULL_AUTHORS_KEY)}
+
+# move a pull author back to fan-out on write once it is quiet and under FEED_PUSH_MAX_FOLLOWERS,
+# its recent posts are copied into follower feeds (they were only merged on read so far)
+def demote(db: Session, owner_id: int, follower_count: int, posts_last_hour: int):
+    if follower_count >= FEED_PUSH_MAX_FOLLOWERS or posts_last_hour > FEED_PULL_POSTS_PER_HOUR:
+        return False
+
+    # another replica may switch the same author
+    if not r.srem(PULL_AUTHORS_KEY, owner_id):
+        return False
+
+    recent_ids = crud.get_user_post_ids(db, owner_id, FEED_BACKFILL)
+    for follower_ids in crud.iter_follower_ids(db, owner_id, FEED_FANOUT_CHUNK):
+        push(follower_ids, recent_ids)
+    print(f"author {owner_id} switched back to fan-out on write")
+    return True
+
+# re-check a pull author after it lost a follower
+def reevaluate(db: Session, owner_id: int):
+    if not r.sismember(PULL_AUTHORS_KEY, owner_id):
+        return
+    posts_last_hour = int(r.get(POST_RATE_KEY.format(owner_id)) or 0)
+    demote(db, owner_id, crud.count_followers(db, owner_id), posts_last_hour)
+
+# count one new post of the author and move the author to fan-out on read when it is too popular or too prolific
+# (or back to fan-out on write when it is neither anymore)
+def is_pull_author(db: Session, owner_id: int, follower_count: int):
+    pipe = r.pipeline(transaction=False)
+    pipe.incr(POST_RATE_KEY.format(owner_id))
+    pipe.expire(POST_RATE_KEY.format(owner_id), 3600, nx=True)
+    pipe.sismember(PULL_AUTHORS_KEY, owner_id)
+    posts_last_hour, _, already_pull = pipe.execute()
+
+    if already_pull:
+        return not demote(db, owner_id, follower_count, posts_last_hour)
+
+    if follower_count >= FEED_PULL_MIN_FOLLOWERS or posts_last_hour > FEED_PULL_POSTS_PER_HOUR:
+        r.sadd(PULL_AUTHORS_KEY, owner_id)
+        print(f"author {owner_id} switched to fan-out on read")
+        return True
+    return False
+
+# post_created fan-out: push the post id to every follower feed unless the author is read on demand
+def fan_out(db: Session, post_id: int, owner_id: int):
+    # authors always see their own posts
+    push([owner_id], [post_id])
+
+    if is_pull_author(db, owner_id, crud.count_followers(db, owner_id)):
+        return
+
+    for follower_ids in crud.iter_follower_ids(db, owner_id, FEED_FANOUT_CHUNK):
+        push(follower_ids, [post_id])
+
+# copy recent posts of a followed author into the follower feed
+def backfill(db: Session, follower_id: int, followee_id: int):
+    if followee_id in pull_authors():
+        return
+    push([follower_id], crud.get_user_post_ids(db, followee_id, FEED_BACKFILL))
+
+# remove posts of an unfollowed author from the follower feed (only the feed window can hold them)
+def unfill(db: Session, follower_id: int, followee_id: int):
+    remove(follower_id, crud.get_user_post_ids(db, followee_id, FEED_MAX_LENGTH))
+
+# one feed page: one sorted set range, posts of followed pull authors, then one batch post lookup
+def read(db: Session, user_id: int, cursor: Optional[str], limit: int):
+    try:
+        before = int(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="invalid cursor")
+
+    post_ids = [
+        int(post_id) for post_id in r.zrevrangebyscore(
+            FEED_KEY.format(user_id),
+            max=f"({before}" if before else "+inf",
+            min="-inf",
+            start=0,
+            num=limit + 1
+        )
+    ]
+
+    pulled = pull_authors()
+    if pulled:
+        followed = crud.get_followee_ids(db, user_id, pulled)
+        if followed:
+            post_ids += crud.get_owners_post_ids(db, followed, before, limit + 1)
+
+    post_ids = sorted(set(post_ids), reverse=True)[:limit + 1]
+
+    next_cursor = None
+    if len(post_ids) > limit:
+        post_ids = post_ids[:limit]
+        next_cursor = str(post_ids[-1])
+
+    return crud.get_posts_by_ids(db, post_ids), next_cursor
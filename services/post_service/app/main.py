@@ -6,26 +6,29 @@ from fastapi_swagger import patch_fastapi
 import redis.asyncio as redis
 import asyncio
 
-from .events.consumer import consume_user_events, consume_comment_events
-from . import models, database
-from .routers import posts
+from .events.consumer import consume_user_events, consume_comment_events, consume_post_events
+from .events.runtime import stop_consumers
+from . import models, database, migrations
+from .routers import posts, feed
 
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
 
 models.Base.metadata.create_all(bind=database.engine)
+migrations.upgrade(database.engine)
 
 app = FastAPI(title="Post Service",docs_url=None,swagger_ui_oauth2_redirect_url=None)
 patch_fastapi(app)
 
 app.include_router(posts.router)
+app.include_router(feed.router)
 
 
 r = redis.Redis(host=config("HOST"), port=config("PORT"), decode_responses=True)
 
 # Ensure the Redis Stream consumer group exists before starting the consumer
 async def ensure_groups():
-    streams = ["user_events", "media_events", "comment_events"]
+    streams = ["user_events", "media_events", "comment_events", "post_events"]
 
     for stream in streams:
         try:
@@ -50,3 +53,9 @@ async def startup_event():
     # start consumer in background
     asyncio.create_task(consume_user_events())
     asyncio.create_task(consume_comment_events())
+    asyncio.create_task(consume_post_events())
+
+# stop consumers and let in-flight event batches finish before exit
+@app.on_event("shutdown")
+async def shutdown_event():
+    await stop_consumers()
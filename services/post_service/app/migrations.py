@@ -0,0 +1,20 @@
+from sqlalchemy import text
+
+
+""" schema upgrades for existing databases (create_all only creates missing tables) """
+
+
+# idempotent statements, run in order on every startup
+UPGRADES = [
+    "CREATE INDEX IF NOT EXISTS ix_posts_created_id ON posts (created_at, id)",
+    "CREATE INDEX IF NOT EXISTS ix_posts_owner_created_id ON posts (owner_id, created_at, id)",
+    "ALTER TABLE posts ADD COLUMN IF NOT EXISTS comment_count INTEGER NOT NULL DEFAULT 0",
+    "CREATE INDEX IF NOT EXISTS ix_posts_owner_id ON posts (owner_id, id)",
+    "ALTER TABLE posts ADD COLUMN IF NOT EXISTS comment_count_changed_at TIMESTAMPTZ",
+]
+
+# apply every upgrade in one transaction
+def upgrade(engine):
+    with engine.begin() as connection:
+        for statement in UPGRADES:
+            connection.execute(text(statement))
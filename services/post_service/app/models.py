@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, func, ARRAY
+from sqlalchemy import Column, Integer, String, Text, DateTime, Index, func, ARRAY
 
 from .database import Base
 
@@ -16,4 +16,26 @@ class Post(Base):
     owner_id = Column(Integer, nullable=False)
     owner_nickname = Column(String(50), nullable=False)
     media_urls = Column(ARRAY(String), nullable=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    comment_count = Column(Integer, nullable=False, default=0, server_default="0")
+    # last comment_count delta, snapshots computed before it never overwrite the count
+    comment_count_changed_at = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_posts_created_id", "created_at", "id"),
+        Index("ix_posts_owner_created_id", "owner_id", "created_at", "id"),
+        # newest post ids per author (feed backfill and fan-out on read)
+        Index("ix_posts_owner_id", "owner_id", "id"),
+    )
+
+# follow graph (follower -> followee) for home feeds
+class Follow(Base):
+    __tablename__ = "follows"
+
+    follower_id = Column(Integer, primary_key=True)
+    followee_id = Column(Integer, primary_key=True)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_follows_followee_follower", "followee_id", "follower_id"),
+    )
@@ -0,0 +1,22 @@
+from fastapi import HTTPException, status
+from datetime import datetime
+import base64
+import json
+
+
+""" opaque keyset cursors for posts listing """
+
+
+# encode last post (created_at, id) of one page as the next page cursor
+def encode_cursor(created_at: datetime, post_id: int) -> str:
+    raw = json.dumps([created_at.isoformat(), post_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+# decode next page cursor back to (created_at, id)
+def decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, post_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(post_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="invalid cursor")
@@ -0,0 +1,37 @@
+from fastapi import Depends, APIRouter, Query
+from sqlalchemy.orm import Session
+from typing import Optional
+
+from .. import schemas, crud, database, dependencies, feed
+
+
+""" feed and follow routers """
+
+
+router = APIRouter()
+
+# get my home feed page by page (newest first)
+@router.get("/feed", response_model=schemas.PaginatedPostResponse)
+def read_feed(
+    cursor: Optional[str] = None,
+    limit: int = Query(10, ge=1, le=100),
+    db: Session = Depends(database.get_db),
+    user=Depends(dependencies.get_current_user)
+):
+    items, next_cursor = feed.read(db, user["user_id"], cursor, limit)
+    return {"items": items, "next_cursor": next_cursor}
+
+# follow one user (recent posts of that user are copied into my feed)
+@router.post("/follows/{user_id}", dependencies=[Depends(dependencies.verified_user_required)])
+def follow_user(user_id: int, db: Session = Depends(database.get_db), user=Depends(dependencies.get_current_user)):
+    crud.create_follow(db, user["user_id"], user_id)
+    feed.backfill(db, user["user_id"], user_id)
+    return {"detail": "user followed"}
+
+# unfollow one user (posts of that user are removed from my feed, a pull author may go back to fan-out on write)
+@router.delete("/follows/{user_id}")
+def unfollow_user(user_id: int, db: Session = Depends(database.get_db), user=Depends(dependencies.get_current_user)):
+    crud.delete_follow(db, user["user_id"], user_id)
+    feed.unfill(db, user["user_id"], user_id)
+    feed.reevaluate(db, user_id)
+    return {"detail": "user unfollowed"}
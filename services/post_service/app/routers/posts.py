@@ -1,7 +1,8 @@
-from fastapi import FastAPI, Depends, HTTPException, APIRouter, status
+from fastapi import FastAPI, Depends, HTTPException, APIRouter, status, Query
 from sqlalchemy.orm import Session
+from typing import Optional
 
-from .. import schemas, crud, database, dependencies
+from .. import schemas, crud, database, dependencies, cache
 from ..services import post_service
 
 
@@ -10,47 +11,62 @@ from ..services import post_service
 
 router = APIRouter()
 
-# get all posts limited list
-@router.get("/posts", response_model=list[schemas.PostResponse])
-def read_posts(skip: int = 0, limit: int = 10, db: Session = Depends(database.get_db)):
-    return crud.get_posts(db, skip, limit)
+# get all posts page by page (newest first)
+@router.get("/posts", response_model=schemas.PaginatedPostResponse)
+def read_posts(
+    cursor: Optional[str] = None,
+    limit: int = Query(10, ge=1, le=100),
+    db: Session = Depends(database.get_db)
+):
+    items, next_cursor = crud.get_posts(db, cursor, limit)
+    return {"items": items, "next_cursor": next_cursor}
 
-# get all my posts limited list
-@router.get("/myposts/", dependencies=[Depends(dependencies.verified_user_required)], response_model=list[schemas.PostResponse])
-def read_my_posts(skip: int = 0, limit: int = 10, db: Session = Depends(database.get_db), user=Depends(dependencies.get_current_user)):
+# get all my posts page by page (newest first)
+@router.get("/myposts/", dependencies=[Depends(dependencies.verified_user_required)], response_model=schemas.PaginatedPostResponse)
+def read_my_posts(
+    cursor: Optional[str] = None,
+    limit: int = Query(10, ge=1, le=100),
+    db: Session = Depends(database.get_db),
+    user=Depends(dependencies.get_current_user)
+):
     owner_id = user["user_id"]
-    return crud.get_my_posts(db, owner_id, skip, limit)
+    items, next_cursor = crud.get_my_posts(db, owner_id, cursor, limit)
+    return {"items": items, "next_cursor": next_cursor}
+
+# get post cache hit/miss counters (internal only)
+@router.get("/posts/cache/stats", dependencies=[Depends(dependencies.internal_service_required)])
+def read_post_cache_stats():
+    return cache.stats()
 
 # get one post by id
 @router.get("/posts/{post_id}", response_model=schemas.PostResponse)
 def read_post(post_id: int, db: Session = Depends(database.get_db)):
-    db_post = crud.get_post(db, post_id)
+    db_post = post_service.read_post(db, post_id)
     if not db_post:
         raise HTTPException(status_code=404, detail="Post not found")
     return db_post
 
 # create my post
 @router.post("/posts", dependencies=[Depends(dependencies.get_current_user), Depends(dependencies.verified_user_required)], response_model=schemas.PostResponse)
-async def create_post(post: schemas.PostCreate, db: Session = Depends(database.get_db), user=Depends(dependencies.get_current_user)):
+async def create_post(post: schemas.PostCreate, db: Session = Depends(database.get_async_db), user=Depends(dependencies.get_current_user)):
     owner_id = user["user_id"]
     nickname = user["nickname"]
     return await post_service.create_post(db, post, owner_id, nickname)
 
 # update one of my posts by id
 @router.patch("/posts/{post_id}", response_model=schemas.PostResponse)
-def update_post(patch: schemas.PostUpdate, post_id: int, db : Session = Depends(database.get_db), user=Depends(dependencies.get_current_user)):
-    post = crud.get_post(db, post_id)
+async def update_post(patch: schemas.PostUpdate, post_id: int, db : Session = Depends(database.get_async_db), user=Depends(dependencies.get_current_user)):
+    post = await database.run_db(db, crud.get_post, post_id)
     if not post:
         raise HTTPException(status_code=404, detail="post not found")
     if post.owner_id != user["user_id"]:
         raise HTTPException(status_code=403, detail="only post owner can update that")
-    db_post = crud.update_post(db, post_id, patch)
-    return db_post
+    return await post_service.update_post(db, post_id, patch)
 
 # delete one of my posts by id
 @router.delete("/posts/{post_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_post(post_id: int, db : Session = Depends(database.get_db), user=Depends(dependencies.get_current_user)):
-    post = crud.get_post(db, post_id)
+async def delete_post(post_id: int, db : Session = Depends(database.get_async_db), user=Depends(dependencies.get_current_user)):
+    post = await database.run_db(db, crud.get_post, post_id)
     if not post:
         raise HTTPException(status_code=404, detail="post not found")
     if post.owner_id != user["user_id"]:
@@ -59,8 +75,8 @@ async def delete_post(post_id: int, db : Session = Depends(database.get_db), use
 
 # delete one post by id (admin and superadmin only)
 @router.delete("/admin/posts/{post_id}", status_code=status.HTTP_200_OK)
-async def delete_post_by_admin(post_id: int, db : Session = Depends(database.get_db), user=Depends(dependencies.get_current_user)):
-    post = crud.get_post(db, post_id)
+async def delete_post_by_admin(post_id: int, db : Session = Depends(database.get_async_db), user=Depends(dependencies.get_current_user)):
+    post = await database.run_db(db, crud.get_post, post_id)
     if not post:
         raise HTTPException(status_code=404, detail="post not found")
     if user["role"] not in ("admin", "superadmin"):
@@ -37,8 +37,14 @@ class PostResponse(BaseModel):
     owner_id: int
     owner_nickname: str
     media_urls: Optional[List[str]] = None
+    comment_count: int = 0
     created_at: datetime
 
     model_config = ConfigDict(
         from_attributes=True
     )
+
+# one keyset page of posts (output)
+class PaginatedPostResponse(BaseModel):
+    items: list[PostResponse]
+    next_cursor: Optional[str] = None
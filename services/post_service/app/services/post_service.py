@@ -1,24 +1,43 @@
 from fastapi import HTTPException
 
-from .. import crud, schemas
+from .. import crud, schemas, cache
+from ..database import run_db
 from ..events import publisher
 
 
 """ router and crud bridge """
 
 
+# read-through post cache, database is only queried on cache miss
+def read_post(db, post_id: int):
+    cached_post, version = cache.get_post(post_id)
+    if cached_post:
+        return cached_post
+
+    db_post = crud.get_post(db, post_id)
+    if db_post:
+        cache.set_post(db_post, version)
+    return db_post
+
 # create post service for publishing post_created
 async def create_post(db, post: schemas.PostCreate, owner_id:int, nickname:str):
-    db_post = crud.create_post(db, post, owner_id, nickname)
+    db_post = await run_db(db, crud.create_post, post, owner_id, nickname)
     if not db_post:
         raise HTTPException(status_code=400, detail="bad request")
     await publisher.publish_post_created(db_post.id, db_post.owner_id, db_post.title, db_post.owner_nickname)
     print("published")
     return db_post
 
+# update post service dropping the cached post after commit
+async def update_post(db, post_id: int, patch: schemas.PostUpdate):
+    db_post = await run_db(db, crud.update_post, post_id, patch)
+    await cache.after_commit(db)
+    return db_post
+
 # bridge between router and crud to publish post_deleted for other services
 async def delete_post(db, post_id: int):
-    crud.delete_post(db, post_id)
+    await run_db(db, crud.delete_post, post_id)
+    await cache.after_commit(db)
 
     await publisher.publish_post_deleted(post_id)
 
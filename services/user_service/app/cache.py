@@ -0,0 +1,93 @@
+from collections import OrderedDict
+from decouple import config
+import threading
+import time
+
+from . import schemas
+
+
+""" per-process lru cache of hot public user profiles (batch lookups) """
+
+
+# cache ttl (seconds, bounds staleness on other replicas) and max cached profiles before least recently used ones are evicted
+USER_CACHE_TTL = config("USER_CACHE_TTL", default=60, cast=int)
+USER_CACHE_MAX_ENTRIES = config("USER_CACHE_MAX_ENTRIES", default=5000, cast=int)
+
+
+# session.info key of users changed in the session, invalidated once the transaction really commits
+STALE_KEY = "stale_users"
+
+
+# user id -> (expires at, public profile)
+_users = OrderedDict()
+
+# invalidation counter and user id -> generation of its last invalidation (most recent USER_CACHE_MAX_ENTRIES kept)
+_generation = 0
+_invalidated = OrderedDict()
+
+# services invalidate from the event loop and the stream consumers
+_lock = threading.Lock()
+
+
+# cached public profiles of the given ids as {id: profile}, missing and expired ids left out
+def get_users(user_ids):
+    now = time.monotonic()
+    found = {}
+    with _lock:
+        for user_id in user_ids:
+            entry = _users.get(user_id)
+            if entry is None:
+                continue
+            expires_at, profile = entry
+            if expires_at <= now:
+                del _users[user_id]
+                continue
+            _users.move_to_end(user_id)
+            found[user_id] = profile
+    return found
+
+# current generation, read before loading users from the database and passed to set_users
+def generation():
+    with _lock:
+        return _generation
+
+# cache public profiles of loaded users and evict least recently used ones above USER_CACHE_MAX_ENTRIES
+# users invalidated after `generation` are skipped, the load may have read them before the change committed
+def set_users(profiles, generation: int):
+    if USER_CACHE_MAX_ENTRIES <= 0:
+        return
+    expires_at = time.monotonic() + USER_CACHE_TTL
+    with _lock:
+        for profile in profiles:
+            if _invalidated.get(profile.id, 0) > generation:
+                continue
+            _users[profile.id] = (expires_at, profile)
+            _users.move_to_end(profile.id)
+        while len(_users) > USER_CACHE_MAX_ENTRIES:
+            _users.popitem(last=False)
+
+# remember users changed by crud in this session (crud commits may only release a savepoint of a stream batch)
+def mark_stale(db, *user_ids: int):
+    db.info.setdefault(STALE_KEY, set()).update(user_ids)
+
+# after-commit work dropping every user marked stale in the session so far (await it once the transaction committed)
+async def after_commit(db):
+    invalidate(*db.info.pop(STALE_KEY, ()))
+
+# drop users after they changed or were deleted
+def invalidate(*user_ids: int):
+    global _generation
+    if not user_ids:
+        return
+    with _lock:
+        _generation += 1
+        for user_id in user_ids:
+            _users.pop(user_id, None)
+            _invalidated[user_id] = _generation
+            _invalidated.move_to_end(user_id)
+        while len(_invalidated) > USER_CACHE_MAX_ENTRIES:
+            _invalidated.popitem(last=False)
+
+# public profile of a loaded user (built while its session is still open)
+def profile(db_user) -> schemas.PublicUserResponse:
+    return schemas.PublicUserResponse.model_validate(db_user)
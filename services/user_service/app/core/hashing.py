@@ -0,0 +1,85 @@
+from concurrent.futures import ProcessPoolExecutor
+from passlib.context import CryptContext
+from decouple import config
+import multiprocessing
+import asyncio
+import os
+
+
+""" password hashing off the event loop (bounded bcrypt process pool) """
+
+
+# bcrypt is cpu bound, one worker process per cpu by default
+PASSWORD_HASH_WORKERS = config("PASSWORD_HASH_WORKERS", default=os.cpu_count() or 1, cast=int)
+
+# encrypt passwords to hashed passwords (also built in every worker process)
+bcrypt_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+# worker side hash (top level so the process pool can pickle it)
+def _hash(password: str):
+    return bcrypt_context.hash(password)
+
+# worker side verify
+def _verify(plain: str, hashed: str):
+    return bcrypt_context.verify(plain, hashed)
+
+# no-op task that makes a worker process start
+def _ping():
+    return True
+
+
+# process pool with in-flight accounting for the queue depth metric
+class HashingPool:
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.executor = None
+        self.in_flight = 0
+        self.completed = 0
+
+    # spawn (not fork) so workers do not inherit the event loop, sockets and threads of the server process
+    def start(self):
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self.executor
+
+    async def run(self, fn, *args):
+        executor = self.start()
+        self.in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+
+    # start every worker process now, so the first logins do not pay the process start up
+    async def warm_up(self):
+        await asyncio.gather(*(self.run(_ping) for _ in range(self.workers)))
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    # queue depth: calls waiting for a free worker, in_flight also counts the running ones
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "in_flight": self.in_flight,
+            "queued": max(self.in_flight - self.workers, 0),
+            "completed": self.completed,
+        }
+
+
+pool = HashingPool(PASSWORD_HASH_WORKERS)
+
+# hash one password in the pool
+async def hash_password_async(password: str):
+    return await pool.run(_hash, password)
+
+# verify one password against its hash in the pool
+async def verify_password_async(plain: str, hashed: str):
+    return await pool.run(_verify, plain, hashed)
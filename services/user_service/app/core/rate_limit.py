@@ -1,29 +1,106 @@
 from fastapi import Depends, HTTPException, Request
-from collections import defaultdict
+from collections import OrderedDict
+from typing import NamedTuple
+from decouple import config
+import redis.asyncio as redis
+import math
 import time
 
 
 """ we have to limit our api calls to prevent the spam attacks or abuse """
 
 
-# rate limiter class for calculate limit and is_allowed for api calls
-class RateLimiter:
-    def __init__(self):
-        self.storage = defaultdict(list)
+# hot denied keys answered locally until their retry time (max keys kept in this process)
+RATE_LIMIT_LOCAL_CACHE_SIZE = config("RATE_LIMIT_LOCAL_CACHE_SIZE", default=10000, cast=int)
+
+# counter keys (one per key and fixed window, expiring after the next window)
+RATE_LIMIT_KEY = "ratelimit:{}:{}"
+
+# sliding window counter: previous window weighted by its overlap plus the current window, in one atomic step
+# KEYS[1] current window counter, KEYS[2] previous window counter
+# ARGV[1] limit, ARGV[2] window seconds, ARGV[3] elapsed part of the current window (0..1)
+SLIDING_WINDOW_SCRIPT = """
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+local previous = tonumber(redis.call('GET', KEYS[2]) or '0')
+local limit = tonumber(ARGV[1])
+
+if previous * (1 - tonumber(ARGV[3])) + current >= limit then
+    return {0, current, previous}
+end
+
+current = redis.call('INCR', KEYS[1])
+if current == 1 then
+    redis.call('EXPIRE', KEYS[1], tonumber(ARGV[2]) * 2)
+end
+return {1, current, previous}
+"""
+
 
-    def is_allowed(self, key: str, limit: int, window: int) -> bool:
+r = redis.Redis(host=config("HOST"), port=config("PORT"), decode_responses=True)
 
+
+# outcome of one rate limited call (remaining calls, seconds until the quota frees up and until the next call is allowed)
+class RateLimitResult(NamedTuple):
+    allowed: bool
+    limit: int
+    remaining: int
+    reset: int
+    retry_after: int
+
+
+# distributed rate limiter shared by every replica (redis sliding window counter, O(1) memory per key)
+class RateLimiter:
+    def __init__(self, cache_size: int = RATE_LIMIT_LOCAL_CACHE_SIZE):
+        self.script = r.register_script(SLIDING_WINDOW_SCRIPT)
+        self.cache_size = cache_size
+        self.denied = OrderedDict()
+
+    # seconds until the sliding estimate drops below the limit again
+    @staticmethod
+    def retry_after(limit: int, window: int, elapsed: float, current: int, previous: int):
+        if current >= limit or previous == 0:
+            return max(1, math.ceil(window * (1 - elapsed)))
+        # previous * (1 - t) + current < limit  ->  t > 1 - (limit - current) / previous
+        free_at = 1 - (limit - current) / previous
+        return max(1, math.ceil(window * (free_at - elapsed)))
+
+    async def hit(self, key: str, limit: int, window: int) -> RateLimitResult:
         now = time.time()
-        timestamps = self.storage[key]
 
-        # clear old calls
-        self.storage[key] = [t for t in timestamps if now - t < window]
+        # local fast path: a key denied recently stays denied without a redis round trip
+        denied_until = self.denied.get(key)
+        if denied_until is not None:
+            if now < denied_until:
+                retry_after = math.ceil(denied_until - now)
+                return RateLimitResult(False, limit, 0, retry_after, retry_after)
+            del self.denied[key]
+
+        window_index, offset = divmod(now, window)
+        elapsed = offset / window
+
+        try:
+            allowed, current, previous = await self.script(
+                keys=[RATE_LIMIT_KEY.format(key, int(window_index)), RATE_LIMIT_KEY.format(key, int(window_index) - 1)],
+                args=[limit, window, elapsed]
+            )
+        except redis.RedisError as e:
+            # limiter outage must not take the api down, fail open
+            print("Rate limiter error:", e)
+            return RateLimitResult(True, limit, limit, 0, 0)
+
+        estimate = previous * (1 - elapsed) + current
+        if allowed:
+            return RateLimitResult(True, limit, max(0, math.floor(limit - estimate)), math.ceil(window * (1 - elapsed)), 0)
 
-        if len(self.storage[key]) >= limit:
-            return False
+        retry_after = self.retry_after(limit, window, elapsed, current, previous)
+        self.denied[key] = now + retry_after
+        self.denied.move_to_end(key)
+        if len(self.denied) > self.cache_size:
+            self.denied.popitem(last=False)
+        return RateLimitResult(False, limit, 0, retry_after, retry_after)
 
-        self.storage[key].append(now)
-        return True
+    async def is_allowed(self, key: str, limit: int, window: int) -> bool:
+        return (await self.hit(key, limit, window)).allowed
 
 
 # rate limit definition for dependencies usage to limit api calls
@@ -40,10 +117,12 @@ def rate_limit(limit: int, window: int):
             else f"ip:{ip}:{method}:{request.url.path}"
         )
 
-        if not rate_limiter.is_allowed(key, limit, window):
+        result = await rate_limiter.hit(key, limit, window)
+        if not result.allowed:
             raise HTTPException(
                 status_code=429,
-                detail="Too many requests"
+                detail="Too many requests",
+                headers={"Retry-After": str(result.retry_after)}
             )
 
     return Depends(dependency)
@@ -1,11 +1,12 @@
 from sqlalchemy.orm import Session
 from fastapi import HTTPException
 from datetime import timedelta, datetime
-from passlib.context import CryptContext
 from decouple import config
 from jose import jwt
 
 from .. import models
+from ..database import run_db
+from .hashing import bcrypt_context, verify_password_async
 
 
 """ authentication and authorization definitions"""
@@ -15,17 +16,14 @@ from .. import models
 SECRET_KEY = config("SECRET_KEY")
 ALGORITHM = config("ALGORITHM")
 
-# encrypt passwords to hashed passwords
-bcrypt_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
-
-# check user username and password for login
-def authenticate_user(username: str, password: str, db):
-    user = db.query(models.User).filter(models.User.username == username).first()
+# check user username and password for login (bcrypt runs in the hashing process pool, not on the event loop)
+async def authenticate_user(username: str, password: str, db):
+    user = await run_db(db, lambda session: session.query(models.User).filter(models.User.username == username).first())
     if not user:
         return None
     # check the hashed received password with database hashed password
-    if not bcrypt_context.verify(password, user.hashed_password):
+    if not await verify_password_async(password, user.hashed_password):
         return None
     return user
 
@@ -64,7 +62,7 @@ def refresh_user_access_token(db: Session, user_id: int):
         expire_delta=timedelta(minutes=60)
     )
 
-# encrypting normal password into hashed password
+# encrypting normal password into hashed password (sync callers, async ones use hashing.hash_password_async)
 def hash_password(password: str):
     return bcrypt_context.hash(password)
 
@@ -1,17 +1,16 @@
 from fastapi import Depends, HTTPException
-from sqlalchemy import or_
+from sqlalchemy import or_, any_, bindparam, Integer
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.orm import Session
-from passlib.context import CryptContext
 from typing import Annotated
 
-from .. import models, schemas, database
+from .. import models, schemas, database, cache
 
 
 """ users crud """
 
 
 # config dependencies
-bcrypt_context = CryptContext(schemes=['bcrypt'], deprecated='auto')
 db_dependency = Annotated[Session, Depends(database.get_db)]
 
 
@@ -23,6 +22,15 @@ def get_users(db: Session, skip: int = 0, limit: int = 10):
 def get_user_by_id(db: Session, user_id: int):
     return db.query(models.User).filter(models.User.id == user_id).first()
 
+# public profiles of many users in one query (one array parameter, so one statement for any number of ids)
+def get_users_by_ids(db: Session, user_ids):
+    db_users = (
+        db.query(models.User)
+        .filter(models.User.id == any_(bindparam("user_ids", value=list(user_ids), type_=ARRAY(Integer))))
+        .all()
+    )
+    return [cache.profile(db_user) for db_user in db_users]
+
 # get user by username
 def get_user_by_username(db: Session, username: str):
     return db.query(models.User).filter(models.User.username == username).first()
@@ -31,15 +39,15 @@ def get_user_by_username(db: Session, username: str):
 def profile(db: Session, user_id: int):
     return db.query(models.User).filter(models.User.id == user_id).first()
 
-# register and create new user
-def create_user(db: Session, user: schemas.CreateUserRequest):
+# register and create new user (password is hashed by the caller, off the event loop)
+def create_user(db: Session, user: schemas.CreateUserRequest, hashed_password: str):
     db_user = db.query(models.User).filter(models.User.username == user.username).first()
     if db_user:
         raise HTTPException(status_code=400, detail="user is already registered!")
 
     db_user = models.User(
         username = user.username,
-        hashed_password = bcrypt_context.hash(user.password),
+        hashed_password = hashed_password,
         nickname=user.nickname,
         email=user.email,
         image_url = "default-avatar.jpg"
@@ -60,6 +68,7 @@ def update_user(db: Session, user_id: int, patch: schemas.UpdateUserRequest):
     for field, value in patch.dict(exclude_unset=True).items():
         setattr(db_user, field, value)
 
+    cache.mark_stale(db, user_id)
     db.commit()
     db.refresh(db_user)
     return db_user
@@ -101,6 +110,7 @@ def verify_email(db: Session, user_id: int, email: str):
 
     db_user.email = email
     db_user.is_email_verified = True
+    cache.mark_stale(db, user_id)
     db.commit()
 
     return {"details": "user verified email changed successfully"}
@@ -111,5 +121,6 @@ def delete_user(db: Session, user_id: int) -> bool:
     if not db_user:
         return False
     db.delete(db_user)
+    cache.mark_stale(db, user_id)
     db.commit()
     return True
@@ -1,5 +1,9 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
+from starlette.concurrency import run_in_threadpool
+from contextlib import contextmanager
 from decouple import config
 
 
@@ -8,9 +12,23 @@ from decouple import config
 
 DATABASE_URL = config("DATABASE_URL")
 
+# async endpoints use an asyncpg engine when DB_ASYNC is on (sync endpoints and stream consumers keep psycopg2)
+DB_ASYNC = config("DB_ASYNC", default=False, cast=bool)
+
+# connection pool settings (per engine)
+DB_POOL_SIZE = config("DB_POOL_SIZE", default=5, cast=int)
+DB_MAX_OVERFLOW = config("DB_MAX_OVERFLOW", default=10, cast=int)
+DB_POOL_RECYCLE = config("DB_POOL_RECYCLE", default=1800, cast=int)
+
+# asyncpg prepared statement cache size per connection (0 behind pgbouncer transaction pooling)
+DB_STATEMENT_CACHE_SIZE = config("DB_STATEMENT_CACHE_SIZE", default=100, cast=int)
+
 engine = create_engine(
     DATABASE_URL,
-    pool_pre_ping=True
+    pool_pre_ping=True,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_recycle=DB_POOL_RECYCLE
 )
 
 SessionLocal = sessionmaker(
@@ -19,6 +37,31 @@ SessionLocal = sessionmaker(
     bind=engine
 )
 
+# same database through the asyncpg driver
+def async_database_url(url: str):
+    return make_url(url).set(drivername="postgresql+asyncpg").update_query_dict(
+        {"prepared_statement_cache_size": str(DB_STATEMENT_CACHE_SIZE)}
+    )
+
+async_engine = None
+AsyncSessionLocal = None
+
+if DB_ASYNC:
+    async_engine = create_async_engine(
+        async_database_url(DATABASE_URL),
+        pool_pre_ping=True,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_recycle=DB_POOL_RECYCLE
+    )
+
+    # objects stay loaded after commit, lazy refresh is not possible outside the session greenlet
+    AsyncSessionLocal = async_sessionmaker(
+        async_engine,
+        autoflush=False,
+        expire_on_commit=False
+    )
+
 Base = declarative_base()
 
 
@@ -29,3 +72,39 @@ def get_db():
         yield db
     finally:
         db.close()
+
+# FastAPI dependency for async endpoints (AsyncSession in DB_ASYNC mode, sync Session otherwise)
+async def get_async_db():
+    if AsyncSessionLocal is None:
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            await run_in_threadpool(db.close)
+        return
+
+    async with AsyncSessionLocal() as db:
+        yield db
+
+# run a sync crud function from async code without blocking the event loop
+# (AsyncSession: sync session on the asyncpg connection, Session: worker thread)
+async def run_db(db, fn, *args, **kwargs):
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(fn, *args, **kwargs)
+    return await run_in_threadpool(fn, db, *args, **kwargs)
+
+# one connection and transaction for a batch of stream events, crud commits inside it become savepoints
+@contextmanager
+def batch_session():
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        db = SessionLocal(bind=connection, join_transaction_mode="create_savepoint")
+        try:
+            yield db
+            db.commit()
+            transaction.commit()
+        except Exception:
+            transaction.rollback()
+            raise
+        finally:
+            db.close()
@@ -1,9 +1,9 @@
 from fastapi import Depends, HTTPException, Header, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
-from jose import jwt, JWTError
 from decouple import config
 
+from .auth import verifier, verify_identity, IDENTITY_SECRET
 from .database import get_db
 from .models import User
 
@@ -11,10 +11,6 @@ from .models import User
 """ basic dependencies like access permission rules """
 
 
-# config secret key and algorithm based on .env file to prevent information hijack
-SECRET_KEY = config("SECRET_KEY")
-ALGORITHM = config("ALGORITHM")
-
 # config oauth2 token url path
 oauth2_bearer = OAuth2PasswordBearer(tokenUrl="/auth/token")
 
@@ -23,48 +19,19 @@ INTERNAL_TOKEN = config("INTERNAL_SERVICE_TOKEN")
 
 
 # login access permission check
-def get_current_user(authorization: str = Header(...)):
-    if not authorization.startswith("Bearer "):
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authorization header"
-        )
-
-    token = authorization.removeprefix("Bearer ")
+async def get_current_user(authorization: str = Header(None), x_identity: str = Header(None)):
+    # identity signed by the gateway, the token was already verified there
+    if x_identity is not None and IDENTITY_SECRET:
+        return verify_identity(x_identity)
 
-    try:
-        payload = jwt.decode(
-            token,
-            SECRET_KEY,
-            algorithms=[ALGORITHM]
-        )
-    except JWTError:
+    if authorization is None or not authorization.startswith("Bearer "):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid or expired token"
-        )
-
-    required_claims = (
-        "id",
-        "sub",
-        "nickname",
-        "role",
-        "is_verified",
-    )
-
-    if not all(payload.get(claim) is not None for claim in required_claims):
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token payload"
+            detail="Invalid authorization header"
         )
 
-    return {
-        "user_id": payload["id"],
-        "username": payload["sub"],
-        "nickname": payload["nickname"],
-        "role": payload["role"],
-        "is_email_verified": payload["is_verified"],
-    }
+    # verified once per token, cached until it expires
+    return verifier.verify(authorization.removeprefix("Bearer "))
 
 # internal access permission check
 def internal_service_required(x_internal_token: str = Header(...)):
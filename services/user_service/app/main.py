@@ -7,10 +7,12 @@ import asyncio
 
 from .middleware.rate_limit import RateLimitMiddleware
 from .events.consumer import consume_avatar_events, consume_email_events
+from .events.runtime import stop_consumers
 from . import models, database
 from .routers import auth, user, account, admin
 from .database import SessionLocal
 from .services.admin_service import create_superadmin
+from .core import hashing
 
 
 # sqlalchemy engine setting
@@ -69,9 +71,18 @@ async def startup_event():
     finally:
         db.close()
 
+    # start password hashing worker processes
+    await hashing.pool.warm_up()
+
     # Ensure Redis group exists
     await ensure_group()
 
     # Start consumer in background
     asyncio.create_task(consume_avatar_events())
     asyncio.create_task(consume_email_events())
+
+# stop consumers and let in-flight event batches finish before exit
+@app.on_event("shutdown")
+async def shutdown_event():
+    await stop_consumers()
+    hashing.pool.shutdown()
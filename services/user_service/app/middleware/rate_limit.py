@@ -1,5 +1,6 @@
-from fastapi import Request, HTTPException
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send, Message
+from decouple import config
 
 from ..core.rate_limit import rate_limiter
 
@@ -7,27 +8,50 @@ from ..core.rate_limit import rate_limiter
 """ limit entire APIs max request per minutes by configure this middleware """
 
 
-# limit entire APIs max request per minutes
-class RateLimitMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        ip = request.client.host if request.client else "unknown"
-        path = request.url.path
+# max requests of one ip per window (seconds) over the entire api
+GLOBAL_RATE_LIMIT = config("GLOBAL_RATE_LIMIT", default=1000, cast=int)
+GLOBAL_RATE_LIMIT_WINDOW = config("GLOBAL_RATE_LIMIT_WINDOW", default=60, cast=int)
 
-        # bypassing swagger or openapi to use our APIs limitless
-        if path.startswith("/docs") or path.startswith("/openapi"):
-            return await call_next(request)
+# bypassing swagger or openapi to use our APIs limitless
+BYPASS_PATHS = ("/docs", "/openapi")
 
-        allowed = rate_limiter.is_allowed(
-            key=f"global:{ip}",
-            limit=1000,
-            window=60
-        )
 
-        if not allowed:
-            raise HTTPException(
-                status_code=429,
-                detail="Too many requests (global limit)"
-            )
+# limit entire APIs max request per minutes (raw asgi, no extra task or body streaming per request)
+class RateLimitMiddleware:
+    def __init__(self, app: ASGIApp, limiter=rate_limiter, limit: int = GLOBAL_RATE_LIMIT, window: int = GLOBAL_RATE_LIMIT_WINDOW):
+        self.app = app
+        self.limiter = limiter
+        self.limit = limit
+        self.window = window
 
-        return await call_next(request)
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["path"].startswith(BYPASS_PATHS):
+            await self.app(scope, receive, send)
+            return
 
+        client = scope.get("client")
+        ip = client[0] if client else "unknown"
+        result = await self.limiter.hit(f"global:{ip}", self.limit, self.window)
+
+        # standard quota headers on every limited response
+        headers = {
+            "RateLimit-Limit": str(result.limit),
+            "RateLimit-Remaining": str(result.remaining),
+            "RateLimit-Reset": str(result.reset),
+        }
+
+        # short circuit, the app is never called
+        if not result.allowed:
+            headers["Retry-After"] = str(result.retry_after)
+            response = JSONResponse({"detail": "Too many requests (global limit)"}, status_code=429, headers=headers)
+            await response(scope, receive, send)
+            return
+
+        raw_headers = [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers.items()]
+
+        async def send_with_headers(message: Message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + raw_headers
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
@@ -18,7 +18,7 @@ router = APIRouter(prefix="/settings", tags=["settings"])
 @router.post("/change-email", dependencies=[rate_limit.rate_limit(limit=6, window=259200)])
 async def change_email_request(
     data: schemas.ChangeEmailRequest,
-    db: Session = Depends(database.get_db),
+    db: Session = Depends(database.get_async_db),
     current_user = Depends(dependencies.get_current_user)
 ):
     user_id = current_user["user_id"]
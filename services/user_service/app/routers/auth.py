@@ -5,7 +5,7 @@ from datetime import timedelta
 from typing import Annotated
 
 from .. import database, schemas, dependencies
-from ..core import rate_limit
+from ..core import rate_limit, hashing
 from ..core.security import authenticate_user, create_access_token, refresh_user_access_token
 
 
@@ -16,7 +16,7 @@ from ..core.security import authenticate_user, create_access_token, refresh_user
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 # config dependencies
-db_dependency = Annotated[Session, Depends(database.get_db)]
+db_dependency = Annotated[Session, Depends(database.get_async_db)]
 
 
 # login API for authentication users and return token if it was valid
@@ -29,7 +29,7 @@ async def login_for_access_token(
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
     db: db_dependency
 ):
-    user = authenticate_user(form_data.username, form_data.password, db)
+    user = await authenticate_user(form_data.username, form_data.password, db)
 
     if not user:
         raise HTTPException(
@@ -73,3 +73,8 @@ def refresh_user_token(
         "access_token": access_token,
         "token_type": "bearer"
     }
+
+# password hashing pool queue depth (internal only)
+@router.get("/password-hashing/stats", dependencies=[Depends(dependencies.internal_service_required)])
+def read_password_hashing_stats():
+    return hashing.pool.stats()
@@ -1,8 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
 from typing import List
 
-from .. import database, schemas
+from .. import database, schemas, cache
 from ..services import user_service
 from ..dependencies import admin_required, internal_service_required, get_current_user
 from ..core import rate_limit
@@ -29,6 +29,11 @@ def get_user_by_username(username: str, db: Session = Depends(database.get_db)):
         raise HTTPException(status_code=404, detail="username not found")
     return db_user
 
+# get many users by id in one call (requested order, unknown ids listed in missing)
+@router.get("/batch", dependencies=[Depends(internal_service_required)], response_model=schemas.UsersBatchResponse)
+async def get_users_batch(ids: List[int] = Query(..., max_length=100), db: Session = Depends(database.get_async_db)):
+    return await user_service.get_users_batch(db, ids)
+
 # get user by id
 @router.get("/id={user_id}", dependencies=[Depends(internal_service_required)], response_model=schemas.PublicUserResponse)
 def get_user_by_id(user_id: int, db: Session = Depends(database.get_db)):
@@ -43,43 +48,45 @@ def get_profile(db: Session = Depends(database.get_db), current_user: schemas.Pr
 
 # create user
 @router.post("/", dependencies=[rate_limit.rate_limit(limit=30, window=3600)], status_code=status.HTTP_201_CREATED, response_model=schemas.UserResponse)
-async def create_user(user: schemas.CreateUserRequest,db: Session = Depends(database.get_db)):
+async def create_user(user: schemas.CreateUserRequest,db: Session = Depends(database.get_async_db)):
     return await user_service.create_user(db, user)
 
 # delete user by id
 @router.delete("/admin/users/{user_id}", dependencies=[rate_limit.rate_limit(limit=20, window=60), Depends(admin_required)], status_code=status.HTTP_200_OK)
-def admin_delete_user(
+async def admin_delete_user(
     user_id: int,
-    db: Session = Depends(database.get_db)
+    db: Session = Depends(database.get_async_db)
 ):
-    db_user = user_crud.get_user_by_id(db, user_id)
+    db_user = await database.run_db(db, user_crud.get_user_by_id, user_id)
     if not db_user:
         raise HTTPException(404, "User not found")
 
     if db_user.role in ("admin", "superadmin"):
         raise HTTPException(403, "Cannot delete admin or superadmin")
 
-    if user_crud.delete_user(db, user_id):
+    if await database.run_db(db, user_crud.delete_user, user_id):
+        await cache.after_commit(db)
         return {"detail": "user has been deleted"}
 
 # Update user (Admin)
 @router.patch("/admin/users/{user_id}", dependencies=[rate_limit.rate_limit(limit=20, window=60)], response_model=schemas.UserResponse)
-def admin_update_user(
+async def admin_update_user(
     patch: schemas.UpdateUserRequest,
     user_id: int,
-    db: Session = Depends(database.get_db),
+    db: Session = Depends(database.get_async_db),
     admin: schemas.UserResponse = Depends(admin_required)
 ):
-    db_user = user_crud.update_user(db, user_id, patch)
+    db_user = await database.run_db(db, user_crud.update_user, user_id, patch)
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
+    await cache.after_commit(db)
     return db_user
 
 # Delete own account
 @router.delete("/me", status_code=status.HTTP_200_OK)
 async def delete_self(
     current_user: schemas.UserResponse = Depends(get_current_user),
-    db: Session = Depends(database.get_db)
+    db: Session = Depends(database.get_async_db)
 ):
     return await user_service.delete_user(db, current_user.id)
 
@@ -88,6 +95,6 @@ async def delete_self(
 async def update_self(
     patch: schemas.UpdateUserRequest,
     current_user: schemas.UserResponse = Depends(get_current_user),
-    db: Session = Depends(database.get_db)
+    db: Session = Depends(database.get_async_db)
 ):
     return await user_service.update_user(db, current_user["user_id"], patch)
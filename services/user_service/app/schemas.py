@@ -1,6 +1,6 @@
 from pydantic import BaseModel, ConfigDict, EmailStr
 from datetime import datetime
-from typing import Optional
+from typing import Optional, List
 
 """ input schemas """
 
@@ -64,6 +64,11 @@ class PublicUserResponse(BaseModel):
 
     model_config = ConfigDict(from_attributes=True)
 
+# users batch, in requested id order (output)
+class UsersBatchResponse(BaseModel):
+    users: List[PublicUserResponse]
+    missing: List[int]
+
 # token (output)
 class Token(BaseModel):
     access_token: str
@@ -2,24 +2,50 @@ from fastapi import HTTPException
 
 from ..schemas import CreateUserRequest, UpdateUserRequest
 from ..crud import user
+from ..database import run_db
+from .. import cache
 from ..events import publisher
+from ..core.hashing import hash_password_async
 
 
 """ router and crud bridge """
 
 
+# public profiles of many users in requested order (first occurrence of each id), hot ones from the cache
+async def get_users_batch(db, user_ids):
+    user_ids = list(dict.fromkeys(user_ids))
+
+    found = cache.get_users(user_ids)
+    misses = [user_id for user_id in user_ids if user_id not in found]
+    if misses:
+        generation = cache.generation()
+        loaded = await run_db(db, user.get_users_by_ids, misses)
+        cache.set_users(loaded, generation)
+        found.update((profile.id, profile) for profile in loaded)
+
+    return {
+        "users": [found[user_id] for user_id in user_ids if user_id in found],
+        "missing": [user_id for user_id in user_ids if user_id not in found],
+    }
+
 # bridge between router and crud to publish user_deleted for other services
 async def delete_user(db, user_id: int):
-    db_user = user.delete_user(db, user_id)
+    db_user = await run_db(db, user.delete_user, user_id)
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
+    await cache.after_commit(db)
 
     await publisher.publish_user_deleted(user_id)
     return {"detail": "User deleted successfully"}
 
 # bridge between router and crud to publish user_created for other services
 async def create_user(db, user_data: CreateUserRequest):
-    db_user = user.create_user(db, user_data)
+    # taken usernames are rejected before paying for the password hash (crud checks again inside the insert transaction)
+    if await run_db(db, user.get_user_by_username, user_data.username):
+        raise HTTPException(status_code=400, detail="user is already registered!")
+
+    hashed_password = await hash_password_async(user_data.password)
+    db_user = await run_db(db, user.create_user, user_data, hashed_password)
     if not db_user:
         raise HTTPException(status_code=400, detail="bad request")
 
@@ -28,16 +54,17 @@ async def create_user(db, user_data: CreateUserRequest):
 
 # bridge between router and crud to publish user_updated for other services
 async def update_user(db, user_id: int, user_data: UpdateUserRequest):
-    db_user = user.update_user(db, user_id, user_data)
+    db_user = await run_db(db, user.update_user, user_id, user_data)
     if not db_user:
         raise HTTPException(status_code=400, detail="bad request")
+    await cache.after_commit(db)
 
     await publisher.publish_user_updated(db_user.id, db_user.nickname)
     return db_user
 
 # bridge between router and crud to publish change_email_request for other services
 async def change_email(db, user_id: int, new_email: str):
-    db_user = user.change_email(db, user_id, new_email)
+    db_user = await run_db(db, user.change_email, user_id, new_email)
     if not db_user:
         raise HTTPException(status_code=400, detail="bad request")
 
@@ -0,0 +1,70 @@
+"""
+benchmark per-request auth overhead: jose decode on every request (before) against
+app.auth.TokenVerifier with the verified token cache, for every installed jwt backend
+
+usage (from services/user_service/):
+    python -m benchmarks.auth_overhead --requests 100000 --users 1000
+"""
+
+import argparse
+import random
+import time
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# the benchmark signs its own tokens, a service .env is not needed
+os.environ.setdefault("SECRET_KEY", "benchmark-secret-key")
+os.environ.setdefault("ALGORITHM", "HS256")
+
+from jose import jwt
+
+from app.auth import TokenVerifier, BACKENDS, AUTH_CACHE_SIZE, SECRET_KEY, ALGORITHM
+
+
+# one access token per user, shaped like security.create_access_token ones
+def tokens(users: int):
+    exp = int(time.time()) + 3600
+    return [
+        jwt.encode(
+            {"id": i, "sub": f"user{i}", "nickname": f"user {i}", "role": "user", "is_verified": True, "exp": exp},
+            SECRET_KEY,
+            algorithm=ALGORITHM,
+        )
+        for i in range(1, users + 1)
+    ]
+
+
+def run(label, verifier, requests):
+    started = time.perf_counter()
+    for token in requests:
+        verifier.verify(token)
+    elapsed = time.perf_counter() - started
+
+    print(f"{label:<24} per request={elapsed / len(requests) * 1e6:8.2f}us requests/s={len(requests) / elapsed:11.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=100000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--cache-size", type=int, default=AUTH_CACHE_SIZE)
+    args = parser.parse_args()
+
+    # every user sends many requests with the same token (one page view fans out to several services)
+    pool = tokens(args.users)
+    requests = [random.choice(pool) for _ in range(args.requests)]
+
+    for backend in BACKENDS:
+        try:
+            uncached = TokenVerifier(backend, 0)
+        except ImportError:
+            print(f"{backend:<24} not installed")
+            continue
+        run(f"{backend} (no cache)", uncached, requests)
+        run(f"{backend} (cache)", TokenVerifier(backend, args.cache_size), requests)
+
+
+if __name__ == "__main__":
+    main()
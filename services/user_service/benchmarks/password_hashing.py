@@ -0,0 +1,94 @@
+"""
+benchmark concurrent logins: bcrypt verify on the event loop (before)
+against app.core.hashing process pool (after), with event loop lag measured meanwhile
+
+usage (from services/user_service/):
+    python -m benchmarks.password_hashing --logins 64 --concurrency 16 --workers 4
+"""
+
+import argparse
+import statistics
+import asyncio
+import time
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.hashing import HashingPool, bcrypt_context, _verify
+
+
+PASSWORD = "correct horse battery staple"
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+# how late a 10ms ticker wakes up while logins run (what every other request on the worker would feel)
+async def loop_lag(stop: asyncio.Event, samples: list):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.01)
+        samples.append((time.perf_counter() - start - 0.01) * 1000)
+
+
+async def run(label, verify, hashed, total, concurrency, cores):
+    semaphore = asyncio.Semaphore(concurrency)
+    stop = asyncio.Event()
+    lag = []
+    ticker = asyncio.create_task(loop_lag(stop, lag))
+
+    async def login():
+        async with semaphore:
+            start = time.perf_counter()
+            assert await verify(PASSWORD, hashed)
+            return (time.perf_counter() - start) * 1000
+
+    started = time.perf_counter()
+    samples = await asyncio.gather(*(login() for _ in range(total)))
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await ticker
+
+    print(
+        f"{label:<22} p50={percentile(samples, 50):8.1f}ms "
+        f"p99={percentile(samples, 99):8.1f}ms "
+        f"logins/s={total / elapsed:7.1f} "
+        f"per core={total / elapsed / cores:6.1f} "
+        f"loop lag max={max(lag or [0]):8.1f}ms mean={statistics.mean(lag or [0]):7.1f}ms"
+    )
+
+
+# the pre-pool behaviour: verify called directly inside the async login endpoint
+async def inline_verify(plain, hashed):
+    return _verify(plain, hashed)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    hashed = bcrypt_context.hash(PASSWORD)
+
+    pool = HashingPool(args.workers)
+    await pool.warm_up()
+
+    async def pooled_verify(plain, hashed):
+        return await pool.run(_verify, plain, hashed)
+
+    # the inline path can only ever use one core
+    await run("inline (event loop)", inline_verify, hashed, args.logins, args.concurrency, 1)
+    await run(f"process pool ({args.workers})", pooled_verify, hashed, args.logins, args.concurrency, args.workers)
+
+    pool.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
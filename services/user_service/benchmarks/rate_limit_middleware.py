@@ -0,0 +1,137 @@
+"""
+benchmark the global rate limit middleware: requests/s of a trivial endpoint with no middleware,
+the previous BaseHTTPMiddleware version and app.middleware.rate_limit raw asgi version
+
+requests are driven straight through the asgi app (no server, no sockets) so only the middleware cost differs,
+--limiter local answers the limiter in process to leave out the redis round trip, --limiter redis uses the real one
+
+usage (from services/user_service/):
+    python -m benchmarks.rate_limit_middleware --requests 20000 --concurrency 50 --limiter local
+"""
+
+import argparse
+import asyncio
+import time
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI, Request, HTTPException
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from app.core.rate_limit import RateLimitResult, rate_limiter
+from app.middleware.rate_limit import RateLimitMiddleware
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+# in process limiter that allows everything (middleware overhead only)
+class LocalLimiter:
+    async def hit(self, key: str, limit: int, window: int):
+        return RateLimitResult(True, limit, limit, window, 0)
+
+
+# the pre-asgi behaviour: BaseHTTPMiddleware dispatch around every request
+def legacy_middleware(limiter, limit, window):
+    class LegacyRateLimitMiddleware(BaseHTTPMiddleware):
+        async def dispatch(self, request: Request, call_next):
+            ip = request.client.host if request.client else "unknown"
+            result = await limiter.hit(f"global:{ip}", limit, window)
+            if not result.allowed:
+                raise HTTPException(status_code=429, detail="Too many requests (global limit)")
+            return await call_next(request)
+    return LegacyRateLimitMiddleware
+
+
+def build_app(middleware=None, **options):
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    if middleware is not None:
+        app.add_middleware(middleware, **options)
+    return app
+
+
+# one GET /ping through the asgi app, returns the response status
+async def call(app, client):
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/ping",
+        "raw_path": b"/ping",
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"host", b"bench")],
+        "client": client,
+        "server": ("bench", 80),
+    }
+    status = None
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+
+async def run(label, app, total, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    statuses = {}
+
+    # every request from its own ip so the real limiter never denies
+    async def request(i):
+        async with semaphore:
+            start = time.perf_counter()
+            status = await call(app, (f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}", 1234))
+            statuses[status] = statuses.get(status, 0) + 1
+            return (time.perf_counter() - start) * 1000
+
+    # warm up routing and the middleware stack
+    await asyncio.gather(*(request(i) for i in range(min(total, 200))))
+    statuses.clear()
+
+    started = time.perf_counter()
+    samples = await asyncio.gather(*(request(i) for i in range(total)))
+    elapsed = time.perf_counter() - started
+
+    print(
+        f"{label:<22} req/s={total / elapsed:9.1f} "
+        f"p50={percentile(samples, 50):7.3f}ms "
+        f"p99={percentile(samples, 99):7.3f}ms "
+        f"statuses={statuses}"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--limiter", choices=["local", "redis"], default="local")
+    args = parser.parse_args()
+
+    limiter = LocalLimiter() if args.limiter == "local" else rate_limiter
+    limit, window = args.requests * 10, 60
+
+    await run("no middleware", build_app(), args.requests, args.concurrency)
+    await run("BaseHTTPMiddleware", build_app(legacy_middleware(limiter, limit, window)), args.requests, args.concurrency)
+    await run("raw asgi", build_app(RateLimitMiddleware, limiter=limiter, limit=limit, window=window), args.requests, args.concurrency)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())